@@ -1,25 +1,55 @@
 """
 Main bot application entry point.
 """
+import asyncio
+import contextlib
+import functools
 import logging
-import os
-import requests
-from telegram import Update
+import signal
+import socket
+from telegram import Bot, Update
 from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, filters
-from config import BOT_TOKEN, LOGGING_FORMAT, LOGGING_LEVEL
-from handlers.basic_handlers import start, help_command, cancel_command
-from handlers.url_shortener import shorten_command
-from handlers.web_monitor import webmonitor_command
-from handlers.panel import panel_command, handle_panel_callback
-from handlers.message_handler import handle_message
-
-# Enable logging
-logging.basicConfig(
-    format=LOGGING_FORMAT,
-    level=getattr(logging, LOGGING_LEVEL)
+from telegram.request import BaseRequest
+from config import (
+    BOT_TOKEN, TELEGRAM_API_URL, WEBHOOK_TUNNEL_NAME,
+    USE_WEBHOOK, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_SECRET_TOKEN, WEBHOOK_WORKERS, PORT,
+    UPDATE_DEDUP_WINDOW,
+    METRICS_PATH, METRICS_PORT, UPDATE_CONCURRENCY, UPDATE_MAX_PENDING,
+    RATE_GLOBAL_PER_SECOND, RATE_CHAT_PER_SECOND, RATE_CHAT_BURST,
+    RATE_GROUP_PER_SECOND, RATE_GROUP_BURST, RATE_MAX_RETRIES, MONITOR_ENABLED,
+    PANEL_ALERTS_ENABLED, SHORT_LINKS_LOCAL, SHORT_LINK_BASE_URL
 )
+from handlers.lazy import lazy_callback, loaded_module
+from utils.http_client import http_client
+from utils.logging_pipeline import log_pipeline
+from utils.metrics import metrics, MetricsHandler
+from utils.rate_limiter import OutboundRateLimiter
+from utils.state_manager import state_manager
+from utils.tunnel_registry import tunnel_registry
+from utils.update_processor import OrderedUpdateProcessor
+from utils.web_server import web_server, TelegramWebhookHandler, UpdateIdWindow
+
+# Enable logging: records are queued here and written by a background thread
+log_pipeline.start()
 logger = logging.getLogger(__name__)
 
+# Feature modules are imported on the first update that needs them
+start = lazy_callback('handlers.basic_handlers', 'start')
+help_command = lazy_callback('handlers.basic_handlers', 'help_command')
+cancel_command = lazy_callback('handlers.basic_handlers', 'cancel_command')
+shorten_command = lazy_callback('handlers.url_shortener', 'shorten_command')
+webmonitor_command = lazy_callback('handlers.web_monitor', 'webmonitor_command')
+watch_command = lazy_callback('handlers.web_monitor', 'watch_command')
+unwatch_command = lazy_callback('handlers.web_monitor', 'unwatch_command')
+watches_command = lazy_callback('handlers.web_monitor', 'watches_command')
+panel_command = lazy_callback('handlers.panel', 'panel_command')
+handle_panel_callback = lazy_callback('handlers.panel', 'handle_panel_callback')
+logs_command = lazy_callback('handlers.panel_logs', 'logs_command')
+follow_command = lazy_callback('handlers.panel_logs', 'follow_command')
+restart_command = lazy_callback('handlers.panel_logs', 'restart_command')
+handle_logs_callback = lazy_callback('handlers.panel_logs', 'handle_logs_callback')
+handle_message = lazy_callback('handlers.message_handler', 'handle_message')
+
 def setup_handlers(application: Application) -> None:
     """Set up all command and message handlers."""
     # Command handlers
@@ -27,43 +57,293 @@ def setup_handlers(application: Application) -> None:
     application.add_handler(CommandHandler("help", help_command))
     application.add_handler(CommandHandler("shorten", shorten_command))
     application.add_handler(CommandHandler("webmonitor", webmonitor_command))
+    application.add_handler(CommandHandler("watch", watch_command))
+    application.add_handler(CommandHandler("unwatch", unwatch_command))
+    application.add_handler(CommandHandler("watches", watches_command))
     application.add_handler(CommandHandler("panel", panel_command))
     application.add_handler(CommandHandler("cancel", cancel_command))
+    application.add_handler(CommandHandler("logs", logs_command))
+    application.add_handler(CommandHandler("follow", follow_command))
+    application.add_handler(CommandHandler("restart", restart_command))
     
-    # Callback query handler for inline keyboards
+    # Callback query handlers for inline keyboards
+    application.add_handler(CallbackQueryHandler(handle_logs_callback, pattern="^logs_stop$"))
     application.add_handler(CallbackQueryHandler(handle_panel_callback))
     
     # Message handler for text messages
     application.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_message))
 
-def main() -> None:
-    """Start the bot."""
-    # Create the Application
-    application = Application.builder().token(BOT_TOKEN).build()
+def setup_metrics(application: Application, rate_limiter: OutboundRateLimiter) -> None:
+    """Time every handler and expose queue/state gauges on the metrics route."""
+    if not metrics.enabled:
+        return
+    for group in application.handlers.values():
+        for handler in group:
+            handler.callback = metrics.instrument_handler(handler.callback)
+    metrics.gauge(
+        'telebot_pending_updates', 'Updates received but not yet processed',
+        application.update_queue.qsize
+    )
+    metrics.gauge(
+        'telebot_updates_in_flight', 'Updates being handled or waiting for an earlier update of the same user',
+        lambda: application.update_processor.current_concurrent_updates
+    )
+    metrics.gauge(
+        'telebot_state_entries', 'Users with an active conversation state',
+        lambda: state_manager.stats()['size']
+    )
+    metrics.gauge(
+        'telebot_state_pending_writes', 'State changes not yet flushed to the backend',
+        lambda: state_manager.stats()['pending_writes']
+    )
+    metrics.gauge(
+        'telebot_outbound_queue_depth', 'Bot API calls waiting for a rate-limit slot',
+        lambda: rate_limiter.stats()['queue_depth']
+    )
+    web_server.add_route(METRICS_PATH, MetricsHandler, registry=metrics)
+
+async def post_init(application: Application) -> None:
+    """Open shared resources once the Application is initialized."""
+    await http_client.start()
+    await state_manager.start()
+    await tunnel_registry.start()
+    worker_index = application.bot_data.get('worker_index')
+    if MONITOR_ENABLED:
+        from handlers.web_monitor import monitor_engine
+        # A webhook worker polls only the watches of the users routed to it
+        shard = (worker_index, WEBHOOK_WORKERS) if worker_index is not None else (0, 1)
+        await monitor_engine.start(application.bot, shard)
+    if PANEL_ALERTS_ENABLED and not worker_index:
+        # One process watches the panel, or every worker would send each alert
+        from handlers.panel_alerts import panel_alerts
+        panel_alerts.start(application.bot)
+    if not (USE_WEBHOOK and WEBHOOK_WORKERS > 1):
+        # Work off a large backlog in batches before updates arrive the normal way
+        from utils.catch_up import catch_up, process_in_application
+        await catch_up(application.bot, functools.partial(process_in_application, application))
+    if USE_WEBHOOK:
+        if WEBHOOK_WORKERS <= 1:
+            # With several workers the front process registers the webhook
+            await register_webhook(application.bot)
+    elif metrics.enabled or SHORT_LINKS_LOCAL:
+        # Polling mode has no web server of its own; serve /metrics and short links on a side port
+        try:
+            await web_server.start(WEBHOOK_LISTEN, METRICS_PORT)
+        except OSError as e:
+            logger.error(f"Could not start the web server on port {METRICS_PORT}: {e}")
+
+async def register_webhook(bot: Bot) -> None:
+    """Point Telegram at our webhook."""
+    from webhook_manager import set_webhook
+    webhook_url = WEBHOOK_URL or tunnel_registry.get(WEBHOOK_TUNNEL_NAME)
+    if not webhook_url:
+        logger.error(f"No WEBHOOK_URL set and no '{WEBHOOK_TUNNEL_NAME}' tunnel found; webhook not registered")
+        return
+    try:
+        if await set_webhook(bot, webhook_url):
+            logger.info(f"Webhook registered at {webhook_url}")
+        else:
+            logger.error("Telegram refused the webhook registration")
+    except Exception as e:
+        logger.error(f"Error registering webhook: {e}")
+
+async def post_stop(application: Application) -> None:
+    """Stop background tasks that still use the bot."""
+    # Only modules that were actually used can have tasks running
+    panel_live = loaded_module('handlers.panel_live')
+    if panel_live is not None:
+        await panel_live.stop_all_live_sessions()
+    panel_logs = loaded_module('handlers.panel_logs')
+    if panel_logs is not None:
+        await panel_logs.stop_all_followers()
+    panel_alerts = loaded_module('handlers.panel_alerts')
+    if panel_alerts is not None:
+        await panel_alerts.panel_alerts.stop()
+    web_monitor = loaded_module('handlers.web_monitor')
+    if web_monitor is not None:
+        await web_monitor.monitor_engine.stop()
+
+async def post_shutdown(application: Application) -> None:
+    """Release shared resources after the Application has shut down."""
+    url_shortener = loaded_module('handlers.url_shortener')
+    if url_shortener is not None:
+        url_shortener.close_url_shortener()
+    short_links = loaded_module('utils.short_links')
+    if short_links is not None:
+        short_links.short_links.close()
+    await web_server.stop()
+    await tunnel_registry.stop()
+    await state_manager.stop()
+    await http_client.close()
+
+@contextlib.asynccontextmanager
+async def running_application(application: Application):
+    """Initialize and start the Application (with our hooks); stop and shut it down on exit."""
+    await application.initialize()
+    try:
+        await post_init(application)
+        await application.start()
+        yield application
+    finally:
+        if application.running:
+            await application.stop()
+            await post_stop(application)
+        await application.shutdown()
+        await post_shutdown(application)
+
+def stop_event_on_signals(*signals: int) -> asyncio.Event:
+    """Return an event that is set when one of ``signals`` arrives."""
+    stop_event = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in signals:
+        loop.add_signal_handler(sig, stop_event.set)
+    return stop_event
+
+async def serve_webhook(application: Application) -> None:
+    """Run the Application behind the embedded web server until SIGINT/SIGTERM."""
+    stop_event = stop_event_on_signals(signal.SIGINT, signal.SIGTERM)
+    web_server.add_route(
+        f"/{BOT_TOKEN}/?",
+        TelegramWebhookHandler,
+        bot=application.bot,
+        update_queue=application.update_queue,
+        secret_token=WEBHOOK_SECRET_TOKEN,
+        update_processor=application.update_processor,
+        update_window=UpdateIdWindow(UPDATE_DEDUP_WINDOW)
+    )
+    try:
+        # Listen before post_init registers the webhook so Telegram's first delivery succeeds
+        await web_server.start(WEBHOOK_LISTEN, PORT)
+        async with running_application(application):
+            try:
+                await stop_event.wait()
+            finally:
+                # Stop taking updates before the Application stops handling them
+                await web_server.stop()
+    finally:
+        await web_server.stop()
+
+async def serve_front(pool) -> None:
+    """Front process of multi-worker webhook mode: receive, deduplicate and route updates."""
+    from utils.workers import FrontWebhookHandler, FrontMetricsHandler
+    stop_event = stop_event_on_signals(signal.SIGINT, signal.SIGTERM)
+    # A dead worker would silently lose its users' updates; stop so the supervisor restarts us
+    await pool.connect(on_worker_exit=stop_event.set)
+    web_server.add_route(
+        f"/{BOT_TOKEN}/?",
+        FrontWebhookHandler,
+        pool=pool,
+        secret_token=WEBHOOK_SECRET_TOKEN,
+        update_window=UpdateIdWindow(UPDATE_DEDUP_WINDOW)
+    )
+    if metrics.enabled:
+        web_server.add_route(METRICS_PATH, FrontMetricsHandler, pool=pool)
+    if SHORT_LINKS_LOCAL:
+        # Workers create the links; the front serves the redirects
+        from utils.short_links import add_short_link_route, short_links
+        add_short_link_route(web_server)
+    try:
+        await http_client.start()
+        await tunnel_registry.start()
+        await web_server.start(WEBHOOK_LISTEN, PORT)
+        async with Bot(BOT_TOKEN, base_url=TELEGRAM_API_URL) as bot:
+            from utils.catch_up import catch_up
+            await catch_up(bot, pool.forward)
+            await register_webhook(bot)
+        await stop_event.wait()
+    finally:
+        await web_server.stop()
+        await pool.stop()
+        await tunnel_registry.stop()
+        await http_client.close()
+        if SHORT_LINKS_LOCAL:
+            short_links.close()
+
+def run_worker(index: int, updates: socket.socket, control: socket.socket) -> None:
+    """Entry point of a forked webhook worker: the normal bot, fed by the front process."""
+    from utils.workers import serve_worker_channels
+    # Ctrl-C reaches the whole process group; workers stop when the front disconnects
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    async def serve() -> None:
+        application = build_application()
+        application.bot_data['worker_index'] = index
+        stop_event = stop_event_on_signals(signal.SIGTERM)
+        async with running_application(application):
+            channels = asyncio.create_task(serve_worker_channels(application, updates, control))
+            stopped = asyncio.create_task(stop_event.wait())
+            await asyncio.wait((channels, stopped), return_when=asyncio.FIRST_COMPLETED)
+            for task in (channels, stopped):
+                task.cancel()
+            await asyncio.gather(channels, stopped, return_exceptions=True)
+
+    logger.info(f"Webhook worker {index} starting")
+    try:
+        asyncio.run(serve())
+    finally:
+        # Forked processes exit without running atexit handlers
+        log_pipeline.stop()
+
+def build_application(request: BaseRequest = None) -> Application:
+    """Create the Application with all handlers registered.
+
+    ``request`` replaces the Bot API transport (benchmarks use a stand-in).
+    """
+    rate_limiter = OutboundRateLimiter(
+        global_rate=RATE_GLOBAL_PER_SECOND,
+        chat_rate=RATE_CHAT_PER_SECOND,
+        chat_burst=RATE_CHAT_BURST,
+        group_rate=RATE_GROUP_PER_SECOND,
+        group_burst=RATE_GROUP_BURST,
+        max_retries=RATE_MAX_RETRIES
+    )
+    builder = (
+        Application.builder()
+        .token(BOT_TOKEN)
+        .base_url(TELEGRAM_API_URL)
+        .rate_limiter(rate_limiter)
+        .concurrent_updates(OrderedUpdateProcessor(UPDATE_CONCURRENCY, UPDATE_MAX_PENDING))
+        .post_init(post_init)
+        .post_stop(post_stop)
+        .post_shutdown(post_shutdown)
+    )
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    if USE_WEBHOOK:
+        # Updates arrive through our own web server instead of PTB's Updater
+        builder = builder.updater(None)
+    application = builder.build()
     
     # Setup handlers
     setup_handlers(application)
+    setup_metrics(application, rate_limiter)
+    if SHORT_LINKS_LOCAL and not (USE_WEBHOOK and WEBHOOK_WORKERS > 1):
+        from utils.short_links import add_short_link_route
+        add_short_link_route(web_server)
+    return application
+
+def main() -> None:
+    """Start the bot."""
+    if SHORT_LINKS_LOCAL and not SHORT_LINK_BASE_URL:
+        # The redirect route is not always served where the webhook points (polling serves it on METRICS_PORT)
+        logger.error("SHORTEN_PROVIDERS=local needs SHORT_LINK_BASE_URL, the public address of the redirect route")
+        raise SystemExit(1)
+    if USE_WEBHOOK and WEBHOOK_WORKERS > 1:
+        from utils.workers import WorkerPool
+        logger.info(f"Starting bot with webhook on port {PORT} and {WEBHOOK_WORKERS} workers...")
+        # Fork before any event loop exists; each worker builds its own Application
+        pool = WorkerPool(WEBHOOK_WORKERS, run_worker)
+        pool.spawn()
+        asyncio.run(serve_front(pool))
+        if pool.failed:
+            raise SystemExit(1)
+        return
+
+    application = build_application()
     
-    # Check if we should use webhook or polling
-    port = int(os.getenv('PORT', 8443))
-    use_webhook = os.getenv('USE_WEBHOOK', 'false').lower() == 'true'
-    
-    if use_webhook:
-        res = requests.get('http://172.17.0.1:4040/api/tunnels').json()
-        webhook_url = ""
-        for tunnel in res["tunnels"]:
-            if tunnel['name'] == 'telebot':
-                webhook_url = tunnel['public_url']
-        os.system(f"python webhook_manager.py set {webhook_url}")
-        logger.info(f"Starting bot with webhook on port {port}...")
-        # Run with webhook
-        application.run_webhook(
-            listen="0.0.0.0",
-            port=port,
-            url_path=BOT_TOKEN,
-            webhook_url=f"{webhook_url}/{BOT_TOKEN}",
-            allowed_updates=Update.ALL_TYPES
-        )
+    if USE_WEBHOOK:
+        logger.info(f"Starting bot with webhook on port {PORT}...")
+        asyncio.run(serve_webhook(application))
     else:
         # Run with polling (default for development)
         logger.info("Starting bot with polling...")
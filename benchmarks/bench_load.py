@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Offline load test: the real bot in webhook mode against local stand-ins.
+
+Starts the fake Bot API, ngrok and panel services from fake_services.py,
+launches app.py pointed at them, and drives it with virtual users that POST
+synthetic updates to the webhook endpoint. Each user works through a mixed
+script of commands, keyboard buttons, panel callbacks and a URL to shorten,
+and waits for the bot's final Bot API call for an update before sending
+the next one.
+
+Reports updates/sec and p50/p99 end-to-end latency (webhook POST until the
+bot's last Bot API call for that update), overall and per step.
+
+With --backlog N the fake Bot API holds N pending updates when the bot
+starts, spread over the last few minutes and full of repeated button
+presses, and the time until the bot has worked them off (catch-up mode)
+and registered its webhook is reported first.
+
+The URL step goes to the real shortening providers; use --local-links to
+shorten with the bot's own links instead, or --no-urls to skip it, when
+running without internet access.
+
+Usage:
+    python benchmarks/bench_load.py [--users 200] [--rounds 3] [--think 0.2] [--workers 4]
+                                    [--panel-latency 0.05] [--panel-failure-rate 0.1] ...
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import socket
+import sys
+import tempfile
+import time
+
+import httpx
+
+from fake_services import add_arguments, build_services
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+TOKEN = '123456:load-test'
+SECRET = 'load-test'
+FIRST_USER_ID = 100000
+
+# (label, update kind, text or callback data, Bot API method that completes the update);
+# 'button:<prefix>' presses the first button with that prefix in the last keyboard the user got
+SCRIPT = [
+    ('/start', 'command', '/start', 'sendMessage'),
+    ('Help button', 'text', 'Help', 'sendMessage'),
+    ('/panel', 'command', '/panel', 'sendMessage'),
+    ('app_status', 'callback', 'app_status', 'editMessageText'),
+    ('toggle', 'callback', 'button:toggle_', 'editMessageText'),
+    ('/shorten', 'command', '/shorten', 'sendMessage'),
+    ('url', 'text', 'https://example.com/page/{user_id}', 'sendMessage'),
+    ('/help', 'command', '/help', 'sendMessage'),
+]
+URL_STEPS = ('/shorten', 'url')
+
+_update_ids = itertools.count(1)
+
+
+def make_update(kind: str, payload: str, user_id: int) -> dict:
+    """Build the JSON Telegram would POST for one step."""
+    update_id = next(_update_ids)
+    user = {'id': user_id, 'is_bot': False, 'first_name': f'User{user_id}'}
+    chat = {'id': user_id, 'type': 'private'}
+    if kind == 'callback':
+        return {'update_id': update_id, 'callback_query': {
+            'id': str(update_id), 'from': user, 'chat_instance': str(user_id), 'data': payload,
+            'message': {'message_id': 1, 'date': int(time.time()), 'chat': chat, 'text': 'panel',
+                        'from': {'id': 1, 'is_bot': True, 'first_name': 'Fake'}},
+        }}
+    text = payload.format(user_id=user_id)
+    message = {'message_id': update_id, 'date': int(time.time()), 'chat': chat, 'from': user, 'text': text}
+    if kind == 'command':
+        message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text.split()[0])}]
+    return {'update_id': update_id, 'message': message}
+
+
+def make_backlog(count: int, user_ids: range) -> list:
+    """Updates left over from downtime: every user chats and presses buttons repeatedly."""
+    steps = [('command', '/start'), ('text', 'Help'), ('command', '/panel')] + [('callback', 'app_status')] * 3
+    now = time.time()
+    backlog = []
+    for index in range(count):
+        user_id = user_ids[index % len(user_ids)]
+        kind, payload = steps[(index // len(user_ids)) % len(steps)]
+        update = make_update(kind, payload, user_id)
+        if 'message' in update:
+            # The oldest updates are a few minutes old, the newest just arrived
+            update['message']['date'] = int(now - (count - index) * 0.2)
+        backlog.append(update)
+    return backlog
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class Results:
+    def __init__(self, labels: list):
+        self.latencies = {label: [] for label in labels}
+        self.errors = {label: 0 for label in labels}
+        self.timeouts = {label: 0 for label in labels}
+
+
+async def virtual_user(client, webhook, bot_api, user_id: int, script: list, args, results: Results) -> None:
+    for _ in range(args.rounds):
+        for label, kind, payload, method in script:
+            if payload.startswith('button:'):
+                payload = bot_api.button(user_id, payload[len('button:'):]) or payload
+            done = bot_api.wait_for(user_id, method)
+            started = time.perf_counter()
+            try:
+                response = await client.post(
+                    webhook, json=make_update(kind, payload, user_id),
+                    headers={'X-Telegram-Bot-Api-Secret-Token': SECRET}
+                )
+                response.raise_for_status()
+            except httpx.HTTPError:
+                results.errors[label] += 1
+                done.cancel()
+                continue
+            try:
+                finished = await asyncio.wait_for(done, args.timeout)
+            except asyncio.TimeoutError:
+                results.timeouts[label] += 1
+                continue
+            results.latencies[label].append(finished - started)
+            if args.think:
+                await asyncio.sleep(args.think)
+
+
+def percentile(values: list, fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def report(results: Results, elapsed: float, bot_api, panel) -> None:
+    every = [value for values in results.latencies.values() for value in values]
+    print(f"\n{len(every)} updates in {elapsed:.2f}s: {len(every) / elapsed:.1f} updates/sec")
+    print(f"\n{'step':<14}{'count':>8}{'p50 ms':>10}{'p99 ms':>10}{'max ms':>10}{'errors':>8}{'timeouts':>10}")
+    rows = list(results.latencies.items()) + [('all', every)]
+    for label, values in rows:
+        errors = sum(results.errors.values()) if label == 'all' else results.errors[label]
+        timeouts = sum(results.timeouts.values()) if label == 'all' else results.timeouts[label]
+        if values:
+            print(f"{label:<14}{len(values):>8}{percentile(values, 0.5) * 1000:>10.1f}"
+                  f"{percentile(values, 0.99) * 1000:>10.1f}{max(values) * 1000:>10.1f}{errors:>8}{timeouts:>10}")
+        else:
+            print(f"{label:<14}{0:>8}{'-':>10}{'-':>10}{'-':>10}{errors:>8}{timeouts:>10}")
+    print(f"\nBot API calls: {dict(sorted(bot_api.calls.items()))}")
+    print(f"Panel requests: {panel.requests}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    port = free_port()
+    webhook_base = f"http://127.0.0.1:{port}"
+    bot_api, ngrok, panel = build_services(args, webhook_base)
+    for service in (bot_api, ngrok, panel):
+        await service.start()
+
+    user_ids = range(FIRST_USER_ID, FIRST_USER_ID + args.users)
+    data_dir = tempfile.mkdtemp(prefix='bench_load_')
+    env = dict(
+        os.environ,
+        TELEGRAM_TOKEN=TOKEN,
+        TELEGRAM_API_URL=f"{bot_api.url}/bot",
+        USE_WEBHOOK='true',
+        WEBHOOK_URL=webhook_base,
+        WEBHOOK_LISTEN='127.0.0.1',
+        WEBHOOK_SECRET_TOKEN=SECRET,
+        PORT=str(port),
+        NGROK_API_URL=ngrok.url,
+        PANEL_API_URL=panel.url,
+        APPROVE_ID=','.join(str(user_id) for user_id in user_ids),
+        STATE_BACKEND='memory',
+        SHORTEN_CACHE_PATH=os.path.join(data_dir, 'url_cache.json'),
+        MONITOR_DB_PATH=os.path.join(data_dir, 'monitor.db'),
+        PANEL_ALERTS_ENABLED='false',  # alerts to every approved user would mix with the measured replies
+        WEBHOOK_WORKERS=str(args.workers),
+    )
+    if args.local_links:
+        env.update(
+            SHORTEN_PROVIDERS='local', SHORT_LINK_BASE_URL=webhook_base,
+            SHORT_LINK_DB_PATH=os.path.join(data_dir, 'short_links.db')
+        )
+    if not args.real_rate_limits:
+        # Measure the bot, not Telegram's flood limits
+        env.update(RATE_GLOBAL_PER_SECOND='1000000', RATE_CHAT_PER_SECOND='1000000', RATE_CHAT_BURST='1000000')
+
+    bot_api.pending = make_backlog(args.backlog, user_ids)
+    log_path = args.bot_log or os.path.join(data_dir, 'bot.log')
+    bot_started = time.perf_counter()
+    with open(log_path, 'w') as log:
+        bot = await asyncio.create_subprocess_exec(
+            sys.executable, 'app.py', cwd=ROOT, env=env, stdout=log, stderr=asyncio.subprocess.STDOUT
+        )
+    try:
+        try:
+            await asyncio.wait_for(bot_api.webhook_set.wait(), 60 + args.backlog / 10)
+        except asyncio.TimeoutError:
+            sys.exit(f"Bot did not register its webhook in time; see {log_path}")
+        if args.backlog:
+            print(f"Worked off a backlog of {args.backlog} updates and registered the webhook "
+                  f"{time.perf_counter() - bot_started:.2f}s after starting; Bot API calls: "
+                  f"{dict(sorted(bot_api.calls.items()))}")
+        print(f"Bot ready on {webhook_base} (log: {log_path}); {args.users} users x {args.rounds} rounds, "
+              f"{args.workers} worker(s)")
+
+        script = [step for step in SCRIPT if not (args.no_urls and step[0] in URL_STEPS)]
+        results = Results([step[0] for step in script])
+        limits = httpx.Limits(max_connections=args.users, max_keepalive_connections=args.users)
+        webhook = f"{webhook_base}/{TOKEN}"
+        async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+            started = time.perf_counter()
+            users = []
+            for index, user_id in enumerate(user_ids):
+                users.append(asyncio.create_task(virtual_user(client, webhook, bot_api, user_id, script, args, results)))
+                if args.ramp:
+                    await asyncio.sleep(args.ramp / args.users)
+            await asyncio.gather(*users)
+            elapsed = time.perf_counter() - started
+        report(results, elapsed, bot_api, panel)
+    finally:
+        if bot.returncode is None:
+            bot.terminate()
+            await bot.wait()
+        for service in (bot_api, ngrok, panel):
+            await service.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=100, help="concurrent virtual users")
+    parser.add_argument('--rounds', type=int, default=3, help="times each user runs the script")
+    parser.add_argument('--think', type=float, default=0.0, help="seconds a user waits between steps")
+    parser.add_argument('--ramp', type=float, default=1.0, help="seconds over which users start")
+    parser.add_argument('--timeout', type=float, default=30.0, help="seconds to wait for the bot's reply")
+    parser.add_argument('--no-urls', action='store_true', help="skip the steps that call the shortening providers")
+    parser.add_argument('--backlog', type=int, default=0, help="updates pending when the bot starts")
+    parser.add_argument('--local-links', action='store_true', help="shorten URLs locally (SHORTEN_PROVIDERS=local)")
+    parser.add_argument('--workers', type=int, default=1, help="bot worker processes (WEBHOOK_WORKERS)")
+    parser.add_argument('--real-rate-limits', action='store_true', help="keep the outbound Telegram rate limits")
+    parser.add_argument('--bot-log', help="write the bot's output here")
+    add_arguments(parser)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for per-message dispatch overhead.
+
+Compares the precompiled MessageRouter against the previous if/elif chain
+(which re-read APPROVE_ID from the environment on every message). Handlers
+are no-ops, so the numbers are pure routing cost.
+
+Usage:
+    python benchmarks/bench_router.py [iterations]
+"""
+import asyncio
+import os
+import sys
+import time
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from telegram import Chat, Message, Update, User
+from handlers.router import MessageRouter
+
+USER_ID = 1000
+WAITING_FOR_URL = 'waiting_for_url'
+os.environ['APPROVE_ID'] = ','.join(str(i) for i in range(USER_ID - 20, USER_ID + 1))
+
+states = {USER_ID: WAITING_FOR_URL}
+
+
+async def noop(update, context):
+    pass
+
+
+def make_update(text: str) -> Update:
+    user = User(USER_ID, 'Bench', False)
+    chat = Chat(USER_ID, Chat.PRIVATE)
+    message = Message(1, datetime.now(timezone.utc), chat, from_user=user, text=text)
+    return Update(1, message=message)
+
+
+async def legacy_dispatch(update, context):
+    """The if/elif chain the router replaced."""
+    user_id = update.effective_user.id
+    user_message = update.message.text
+    approve_ID = os.environ.get('APPROVE_ID', '').split(',')
+    if str(user_id) in approve_ID:
+        if user_message == "Shorten URL":
+            await noop(update, context)
+            return
+        elif user_message == "Help":
+            await noop(update, context)
+            return
+        elif user_message == "WebMonitor":
+            await noop(update, context)
+            return
+        elif user_message.lower() == "monit":
+            await noop(update, context)
+            return
+        elif user_message == "Panel":
+            await noop(update, context)
+            return
+        elif user_message == "Cancel":
+            await noop(update, context)
+            return
+        user_state = states.get(user_id)
+        if user_state == WAITING_FOR_URL:
+            await noop(update, context)
+        else:
+            await noop(update, context)
+    else:
+        await noop(update, context)
+
+
+def build_router() -> MessageRouter:
+    approved = {int(i) for i in os.environ['APPROVE_ID'].split(',')}
+    router = MessageRouter(approved, states.get, default=noop)
+    for label in ("Shorten URL", "Help", "WebMonitor", "Panel", "Cancel"):
+        router.add_button(label, noop)
+    router.add_alias("monit", noop)
+    router.add_state(WAITING_FOR_URL, noop)
+    return router
+
+
+async def measure(dispatch, updates, iterations: int) -> float:
+    """Return the mean nanoseconds per dispatched update."""
+    start = time.perf_counter_ns()
+    for _ in range(iterations):
+        for update in updates:
+            await dispatch(update, None)
+    return (time.perf_counter_ns() - start) / (iterations * len(updates))
+
+
+async def main(iterations: int) -> None:
+    router = build_router()
+    cases = {
+        'first button': [make_update("Shorten URL")],
+        'last button': [make_update("Cancel")],
+        'alias': [make_update("MONIT")],
+        'state': [make_update("https://example.com")],
+    }
+    print(f"{'case':<14}{'legacy ns':>12}{'router ns':>12}{'speedup':>10}")
+    for name, updates in cases.items():
+        legacy = await measure(legacy_dispatch, updates, iterations)
+        routed = await measure(router.dispatch, updates, iterations)
+        print(f"{name:<14}{legacy:>12.0f}{routed:>12.0f}{legacy / routed:>9.1f}x")
+
+
+if __name__ == '__main__':
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Self-hosted short link benchmark.
+
+Times ShortLinkStore.code_for() for new and already shortened URLs, then
+serves the redirect route from a forked process and measures redirects per
+second over keep-alive connections, for hot codes (answered from memory)
+and for codes read from SQLite.
+
+Usage:
+    python benchmarks/bench_short_links.py [--links 20000] [--requests 20000] [--connections 50]
+"""
+import argparse
+import asyncio
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+DATA_DIR = tempfile.mkdtemp(prefix='bench_short_links_')
+os.environ.setdefault('SHORT_LINK_DB_PATH', os.path.join(DATA_DIR, 'short_links.db'))
+os.environ.setdefault('SHORT_LINK_BASE_URL', 'http://127.0.0.1')
+os.environ.setdefault('LOG_LEVEL', 'WARNING')
+
+from utils.short_links import ShortLinkStore, ShortLinkHandler  # noqa: E402
+
+
+def time_shortening(store: ShortLinkStore, count: int) -> list:
+    urls = [f"https://example.com/articles/{index}?ref={random.random()}" for index in range(count)]
+    started = time.perf_counter()
+    codes = [store.code_for(url) for url in urls]
+    created = time.perf_counter() - started
+    started = time.perf_counter()
+    for url in urls:
+        store.code_for(url)
+    repeated = time.perf_counter() - started
+    print(f"new link:        {created / count * 1e6:8.1f} us")
+    print(f"existing link:   {repeated / count * 1e6:8.1f} us")
+    return codes
+
+
+def serve(port: int, cache_size: int, ready) -> None:
+    import tornado.httpserver
+    import tornado.ioloop
+    import tornado.web
+    store = ShortLinkStore(os.environ['SHORT_LINK_DB_PATH'], cache_size)
+    application = tornado.web.Application(
+        [(r"/s/([0-9A-Za-z]+)", ShortLinkHandler, {'store': store})], log_function=lambda handler: None
+    )
+    server = tornado.httpserver.HTTPServer(application)
+    server.listen(port, address='127.0.0.1')
+    ready.set()
+    tornado.ioloop.IOLoop.current().start()
+
+
+async def fetch_all(port: int, codes: list, connections: int) -> float:
+    """Send a GET per code over ``connections`` keep-alive connections; return requests/sec."""
+    queue = iter(codes)
+
+    async def client() -> None:
+        reader, writer = await asyncio.open_connection('127.0.0.1', port)
+        for code in queue:
+            writer.write(f"GET /s/{code} HTTP/1.1\r\nHost: bench\r\n\r\n".encode())
+            head = await reader.readuntil(b"\r\n\r\n")
+            if not head.startswith(b"HTTP/1.1 301"):
+                raise RuntimeError(f"Unexpected response for {code}: {head[:40]!r}")
+            length = 0
+            for line in head.split(b"\r\n"):
+                if line.lower().startswith(b"content-length:"):
+                    length = int(line.split(b":")[1])
+            if length:
+                await reader.readexactly(length)
+        writer.close()
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(connections)))
+    return len(codes) / (time.perf_counter() - started)
+
+
+def time_redirects(codes: list, requests: int, connections: int) -> None:
+    hot = [random.choice(codes[:100]) for _ in range(requests)]
+    cold = random.sample(codes, min(requests, len(codes)))
+    for label, sample, cache_size in (('hot codes', hot, 100000), ('uncached codes', cold, 1)):
+        ready = multiprocessing.get_context('fork').Event()
+        port = 18000 + random.randrange(1000)
+        process = multiprocessing.get_context('fork').Process(target=serve, args=(port, cache_size, ready))
+        process.start()
+        try:
+            ready.wait(10)
+            rate = asyncio.run(fetch_all(port, sample, connections))
+            print(f"redirects, {label + ':':<16}{rate:8.0f} /s")
+        finally:
+            process.terminate()
+            process.join()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--links', type=int, default=20000, help="links to create")
+    parser.add_argument('--requests', type=int, default=20000, help="redirects to request per run")
+    parser.add_argument('--connections', type=int, default=50, help="concurrent keep-alive connections")
+    args = parser.parse_args()
+    store = ShortLinkStore(os.environ['SHORT_LINK_DB_PATH'], 100000)
+    codes = time_shortening(store, args.links)
+    store.close()
+    time_redirects(codes, args.requests, args.connections)
+
+
+if __name__ == '__main__':
+    main()
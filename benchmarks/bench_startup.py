@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Startup-time benchmark.
+
+Reports the import cost of each module app.py pulls in, and the time from
+process start until the first command and the first text message have been
+handled. The child processes talk to a stand-in Bot API transport, so no
+token or network is needed.
+
+Usage:
+    python benchmarks/bench_startup.py [runs]
+"""
+import asyncio
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+CHILD_ENV = dict(
+    os.environ,
+    TELEGRAM_TOKEN='123456:bench',
+    USE_WEBHOOK='false',
+    STATE_BACKEND='memory',
+    NGROK_API_URL='http://127.0.0.1:9',  # refused at once: no tunnel lookups
+    APPROVE_ID='1000',
+    MONITOR_DB_PATH=os.path.join(tempfile.mkdtemp(prefix='bench_startup_'), 'monitor.db'),
+)
+PROJECT_PREFIXES = ('app', 'config', 'webhook_manager', 'handlers', 'utils')
+
+
+def run_child(args: list) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable] + args, cwd=ROOT, env=CHILD_ENV,
+        capture_output=True, text=True, check=True
+    )
+
+
+def import_times() -> list:
+    """Return (module, depth, self_us, cumulative_us) for ``import app``."""
+    output = run_child(['-X', 'importtime', '-c', 'import app']).stderr
+    rows = []
+    for line in output.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_field, cumulative_field, name = line.split('|')
+        self_us = int(self_field.split(':')[1])
+        cumulative_us = int(cumulative_field)
+        depth = (len(name) - len(name.lstrip(' ')) - 1) // 2
+        rows.append((name.strip(), depth, self_us, cumulative_us))
+    return rows
+
+
+def report_imports() -> None:
+    rows = import_times()
+    # importtime lists a module's imports right before the module itself
+    end = next(index for index, row in enumerate(rows) if row[0] == 'app' and row[1] == 0)
+    start = end
+    while start > 0 and rows[start - 1][1] > 0:
+        start -= 1
+    rows = rows[start:end + 1]
+    print(f"import app: {rows[-1][3] / 1000:.1f} ms")
+    print(f"\n{'direct import of app':<40}{'cumulative ms':>14}")
+    direct = sorted((row for row in rows if row[1] == 1), key=lambda row: -row[3])
+    for name, _, _, cumulative in direct:
+        print(f"{name:<40}{cumulative / 1000:>14.1f}")
+    print(f"\n{'project module':<40}{'self ms':>10}{'cumulative ms':>14}")
+    for name, _, self_us, cumulative in rows:
+        if name.split('.')[0] in PROJECT_PREFIXES:
+            print(f"{name:<40}{self_us / 1000:>10.1f}{cumulative / 1000:>14.1f}")
+
+
+def report_first_update(runs: int) -> None:
+    samples = {'imported': [], 'ready': [], 'first command': [], 'first message': []}
+    for _ in range(runs):
+        started = time.time()
+        marks = json.loads(run_child([os.path.abspath(__file__), '--child']).stdout.splitlines()[-1])
+        for key, value in marks.items():
+            samples[key].append((value - started) * 1000)
+    print(f"\n{'since process start':<20}{'median ms':>12}{'min ms':>10}{'max ms':>10}   ({runs} runs)")
+    for key, values in samples.items():
+        print(f"{key:<20}{statistics.median(values):>12.1f}{min(values):>10.1f}{max(values):>10.1f}")
+
+
+def child() -> None:
+    """Start the bot in-process and time the first updates it handles."""
+    import app
+    imported = time.time()
+    from telegram import Update
+    from telegram.request import BaseRequest
+
+    replies = asyncio.Queue()
+
+    class StandInRequest(BaseRequest):
+        """Answers every Bot API call locally and reports sent messages."""
+
+        read_timeout = 5
+
+        async def initialize(self):
+            pass
+
+        async def shutdown(self):
+            pass
+
+        async def do_request(self, url, method, request_data=None, **kwargs):
+            endpoint = url.rsplit('/', 1)[1]
+            params = request_data.parameters if request_data else {}
+            if endpoint == 'getMe':
+                result = {'id': 1, 'is_bot': True, 'first_name': 'bench', 'username': 'bench_bot'}
+            elif endpoint in ('sendMessage', 'editMessageText'):
+                result = {'message_id': 1, 'date': 0, 'text': '-',
+                          'chat': {'id': params.get('chat_id', 1000), 'type': 'private'}}
+                replies.put_nowait(time.time())
+            else:
+                result = True
+            return 200, json.dumps({'ok': True, 'result': result}).encode()
+
+    def make_update(bot, update_id: int, text: str) -> Update:
+        message = {
+            'message_id': update_id, 'date': int(time.time()), 'text': text,
+            'chat': {'id': 1000, 'type': 'private'},
+            'from': {'id': 1000, 'is_bot': False, 'first_name': 'Bench'},
+        }
+        if text.startswith('/'):
+            message['entities'] = [{'type': 'bot_command', 'offset': 0, 'length': len(text)}]
+        return Update.de_json({'update_id': update_id, 'message': message}, bot)
+
+    async def run() -> dict:
+        application = app.build_application(request=StandInRequest())
+        await application.initialize()
+        await application.post_init(application)
+        await application.start()
+        ready = time.time()
+        await application.update_queue.put(make_update(application.bot, 1, '/start'))
+        first_command = await replies.get()
+        await application.update_queue.put(make_update(application.bot, 2, 'Help'))
+        first_message = await replies.get()
+        await application.stop()
+        await application.post_stop(application)
+        await application.shutdown()
+        await application.post_shutdown(application)
+        return {'imported': imported, 'ready': ready,
+                'first command': first_command, 'first message': first_message}
+
+    print(json.dumps(asyncio.run(run())))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1 and sys.argv[1] == '--child':
+        child()
+    else:
+        report_imports()
+        report_first_update(int(sys.argv[1]) if len(sys.argv) > 1 else 10)
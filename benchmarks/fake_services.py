@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for the services the bot talks to, for offline load tests.
+
+* FakeBotAPI   - answers Bot API methods and records every send and edit
+* FakeNgrok    - serves /api/tunnels
+* FakePanel    - serves /apps and /toggle/<name> with injectable latency and failures,
+                 and streams app changes as Server-Sent Events at /events
+
+bench_load.py runs them in-process. Run this file directly to keep them up
+while testing a manually started bot:
+
+    python benchmarks/fake_services.py [--panel-latency 0.05] [--panel-failure-rate 0.1]
+
+then start the bot with TELEGRAM_API_URL, NGROK_API_URL and PANEL_API_URL
+pointing at the printed addresses.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+import tornado.httpserver
+import tornado.iostream
+import tornado.netutil
+import tornado.web
+
+
+class _Service:
+    """A tornado application on its own port."""
+
+    def __init__(self):
+        self.port = None
+        self._server = None
+
+    def routes(self) -> list:
+        raise NotImplementedError
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def start(self, port: int = 0) -> None:
+        application = tornado.web.Application(self.routes(), log_function=lambda handler: None)
+        self._server = tornado.httpserver.HTTPServer(application)
+        sockets = tornado.netutil.bind_sockets(port, address='127.0.0.1')
+        self._server.add_sockets(sockets)
+        self.port = sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.stop()
+            await self._server.close_all_connections()
+            self._server = None
+
+
+async def _inject(latency: float, jitter: float, failure_rate: float, handler: tornado.web.RequestHandler) -> bool:
+    """Sleep for the configured latency; return False after sending an injected failure."""
+    delay = latency + random.uniform(0, jitter) if jitter else latency
+    if delay > 0:
+        await asyncio.sleep(delay)
+    if failure_rate and random.random() < failure_rate:
+        handler.set_status(500)
+        handler.write({'error': 'injected failure'})
+        return False
+    return True
+
+
+class _BotAPIHandler(tornado.web.RequestHandler):
+    def initialize(self, service: 'FakeBotAPI') -> None:
+        self.service = service
+
+    def _params(self) -> dict:
+        if self.request.headers.get('Content-Type', '').startswith('application/json'):
+            return json.loads(self.request.body or b'{}')
+        params = {}
+        for key, values in self.request.body_arguments.items():
+            value = values[-1].decode()
+            try:
+                params[key] = json.loads(value)
+            except ValueError:
+                params[key] = value
+        return params
+
+    async def post(self, token: str, method: str) -> None:
+        result = self.service.call(method, self._params())
+        if not await _inject(self.service.latency, self.service.jitter, 0, self):
+            return
+        self.write({'ok': True, 'result': result})
+
+    get = post
+
+
+class FakeBotAPI(_Service):
+    """Answers Bot API calls and records them per chat.
+
+    ``wait_for(chat_id, method)`` resolves when the bot next calls ``method``
+    for that chat, which is how the load generator times a whole update.
+    ``button(chat_id, prefix)`` finds a button in the last inline keyboard
+    sent to a chat, so callbacks can press what the bot actually drew.
+    Updates put in ``pending`` are the backlog served by getUpdates.
+    """
+
+    MESSAGE_METHODS = frozenset(('sendMessage', 'editMessageText', 'editMessageReplyMarkup'))
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0):
+        super().__init__()
+        self.latency = latency
+        self.jitter = jitter
+        self.calls = {}  # method -> count
+        self.webhook = None
+        self.webhook_set = asyncio.Event()
+        self._message_ids = iter(range(1, 1 << 62))
+        self._waiters = {}  # (chat_id, method) -> future
+        self._keyboards = {}  # chat_id -> last inline keyboard rows
+        self.pending = []  # update dicts not yet confirmed with getUpdates
+
+    def routes(self) -> list:
+        return [(r"/bot([^/]+)/(\w+)", _BotAPIHandler, {'service': self})]
+
+    def wait_for(self, chat_id: int, method: str) -> asyncio.Future:
+        future = asyncio.get_running_loop().create_future()
+        self._waiters[(chat_id, method)] = future
+        return future
+
+    def button(self, chat_id: int, prefix: str) -> str:
+        """callback_data of the first button starting with ``prefix``, or None."""
+        for row in self._keyboards.get(chat_id, ()):
+            for button in row:
+                data = button.get('callback_data') or ''
+                if data.startswith(prefix):
+                    return data
+        return None
+
+    def call(self, method: str, params: dict):
+        now = time.perf_counter()
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == 'getMe':
+            return {'id': 1, 'is_bot': True, 'first_name': 'Fake', 'username': 'fake_bot'}
+        if method == 'setWebhook':
+            self.webhook = params.get('url')
+            self.webhook_set.set()
+            return True
+        if method == 'getWebhookInfo':
+            return {'url': self.webhook or '', 'has_custom_certificate': False, 'pending_update_count': len(self.pending)}
+        if method == 'deleteWebhook':
+            self.webhook = None
+            return True
+        if method == 'getUpdates':
+            offset = int(params.get('offset') or 0)
+            self.pending = [update for update in self.pending if update['update_id'] >= offset]
+            return self.pending[:int(params.get('limit') or 100)]
+        chat_id = params.get('chat_id')
+        markup = params.get('reply_markup')
+        if isinstance(markup, str):
+            markup = json.loads(markup)
+        if chat_id is not None and isinstance(markup, dict) and 'inline_keyboard' in markup:
+            self._keyboards[int(chat_id)] = markup['inline_keyboard']
+        if chat_id is not None:
+            waiter = self._waiters.pop((int(chat_id), method), None)
+            if waiter is not None and not waiter.done():
+                waiter.set_result(now)
+        if method in self.MESSAGE_METHODS:
+            message_id = params.get('message_id') or next(self._message_ids)
+            return {
+                'message_id': int(message_id), 'date': int(time.time()), 'text': params.get('text', ''),
+                'chat': {'id': int(chat_id or 0), 'type': 'private'},
+            }
+        return True
+
+
+class _TunnelsHandler(tornado.web.RequestHandler):
+    def initialize(self, service: 'FakeNgrok') -> None:
+        self.service = service
+
+    async def get(self) -> None:
+        self.service.requests += 1
+        if await _inject(self.service.latency, 0, self.service.failure_rate, self):
+            self.write({'tunnels': [
+                {'name': name, 'public_url': url} for name, url in self.service.tunnels.items()
+            ]})
+
+
+class FakeNgrok(_Service):
+    """Serves the ngrok agent's tunnel list."""
+
+    def __init__(self, tunnels: dict, latency: float = 0.0, failure_rate: float = 0.0):
+        super().__init__()
+        self.tunnels = tunnels
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+
+    def routes(self) -> list:
+        return [(r"/api/tunnels", _TunnelsHandler, {'service': self})]
+
+
+class _AppsHandler(tornado.web.RequestHandler):
+    def initialize(self, service: 'FakePanel') -> None:
+        self.service = service
+
+    async def get(self) -> None:
+        self.service.requests['apps'] += 1
+        if await _inject(self.service.latency, self.service.jitter, self.service.failure_rate, self):
+            self.set_header('Content-Type', 'application/json')
+            self.write(json.dumps(self.service.app_list()))
+
+
+class _ToggleHandler(tornado.web.RequestHandler):
+    def initialize(self, service: 'FakePanel') -> None:
+        self.service = service
+
+    async def post(self, name: str) -> None:
+        self.service.requests['toggle'] += 1
+        if not await _inject(self.service.latency, self.service.jitter, self.service.failure_rate, self):
+            return
+        if name not in self.service.apps:
+            self.set_status(404)
+            return
+        self.service.set_status(name, not self.service.apps[name])
+        self.write({'name': name, 'status': self.service.apps[name]})
+
+
+class _EventsHandler(tornado.web.RequestHandler):
+    def initialize(self, service: 'FakePanel') -> None:
+        self.service = service
+
+    async def get(self) -> None:
+        self.service.requests['events'] += 1
+        self.set_header('Content-Type', 'text/event-stream')
+        self.set_header('Cache-Control', 'no-cache')
+        events = asyncio.Queue()
+        self.service.listeners.add(events)
+        try:
+            self.write(": connected\n\n")
+            await self.flush()
+            while True:
+                app = await events.get()
+                if app is None:
+                    return
+                self.write(f"data: {json.dumps(app)}\n\n")
+                await self.flush()
+        except tornado.iostream.StreamClosedError:
+            pass
+        finally:
+            self.service.listeners.discard(events)
+
+
+class FakePanel(_Service):
+    """Docker Compose panel backend with ``app_count`` stacks."""
+
+    def __init__(self, app_count: int = 10, latency: float = 0.0, jitter: float = 0.0, failure_rate: float = 0.0):
+        super().__init__()
+        self.apps = {f"app{index:03d}": index % 2 == 0 for index in range(app_count)}
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.requests = {'apps': 0, 'toggle': 0, 'events': 0}
+        self.listeners = set()  # one queue per open /events stream
+
+    def routes(self) -> list:
+        return [
+            (r"/apps", _AppsHandler, {'service': self}),
+            (r"/toggle/([^/]+)", _ToggleHandler, {'service': self}),
+            (r"/events", _EventsHandler, {'service': self}),
+        ]
+
+    async def stop(self) -> None:
+        for events in self.listeners:
+            events.put_nowait(None)
+        await super().stop()
+
+    @staticmethod
+    def _entry(name: str, status: bool) -> dict:
+        return {'name': name, 'status': status, 'running_count': 2 if status else 0, 'total_count': 2}
+
+    def app_list(self) -> list:
+        return [self._entry(name, status) for name, status in self.apps.items()]
+
+    def set_status(self, name: str, status: bool) -> None:
+        """Change an app's state and announce it on every open /events stream."""
+        self.apps[name] = status
+        for events in self.listeners:
+            events.put_nowait(self._entry(name, status))
+
+
+def add_arguments(parser: argparse.ArgumentParser) -> None:
+    """Latency and failure options shared with bench_load.py."""
+    parser.add_argument('--bot-api-latency', type=float, default=0.0, help="seconds added to each Bot API call")
+    parser.add_argument('--panel-apps', type=int, default=10, help="number of compose stacks")
+    parser.add_argument('--panel-latency', type=float, default=0.0, help="seconds added to each panel call")
+    parser.add_argument('--panel-jitter', type=float, default=0.0, help="extra random panel latency (max seconds)")
+    parser.add_argument('--panel-failure-rate', type=float, default=0.0, help="fraction of panel calls answered with HTTP 500")
+    parser.add_argument('--ngrok-latency', type=float, default=0.0)
+    parser.add_argument('--ngrok-failure-rate', type=float, default=0.0)
+
+
+def build_services(args: argparse.Namespace, webhook_url: str = 'http://127.0.0.1:8443') -> tuple:
+    bot_api = FakeBotAPI(args.bot_api_latency)
+    ngrok = FakeNgrok(
+        {'telebot': webhook_url, 'changeDetection': 'http://127.0.0.1:5005'},
+        args.ngrok_latency, args.ngrok_failure_rate
+    )
+    panel = FakePanel(args.panel_apps, args.panel_latency, args.panel_jitter, args.panel_failure_rate)
+    return bot_api, ngrok, panel
+
+
+async def serve(args: argparse.Namespace) -> None:
+    bot_api, ngrok, panel = build_services(args)
+    await bot_api.start(args.bot_api_port)
+    await ngrok.start(args.ngrok_port)
+    await panel.start(args.panel_port)
+    print(f"TELEGRAM_API_URL={bot_api.url}/bot")
+    print(f"NGROK_API_URL={ngrok.url}")
+    print(f"PANEL_API_URL={panel.url}")
+    try:
+        while True:
+            await asyncio.sleep(10)
+            print(f"bot api calls: {bot_api.calls}  panel: {panel.requests}  ngrok: {ngrok.requests}")
+    finally:
+        for service in (bot_api, ngrok, panel):
+            await service.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_arguments(parser)
+    parser.add_argument('--bot-api-port', type=int, default=8081)
+    parser.add_argument('--ngrok-port', type=int, default=4040)
+    parser.add_argument('--panel-port', type=int, default=5000)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
@@ -5,16 +5,143 @@ import os
 
 # Bot configuration
 BOT_TOKEN = os.getenv('TELEGRAM_TOKEN', 'YOUR_BOT_TOKEN_HERE')
+TELEGRAM_API_URL = os.getenv('TELEGRAM_API_URL', 'https://api.telegram.org/bot')  # local Bot API server or test stand-in
 
 # Webhook configuration
 WEBHOOK_URL = os.getenv('WEBHOOK_URL')  # Your public domain/ngrok URL
 USE_WEBHOOK = os.getenv('USE_WEBHOOK', 'false').lower() == 'true'
 PORT = int(os.getenv('PORT', 8443))
+WEBHOOK_LISTEN = os.getenv('WEBHOOK_LISTEN', '0.0.0.0')
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv('WEBHOOK_MAX_CONNECTIONS', 40))
+WEBHOOK_DROP_PENDING_UPDATES = os.getenv('WEBHOOK_DROP_PENDING_UPDATES', 'false').lower() == 'true'
+WEBHOOK_SECRET_TOKEN = os.getenv('WEBHOOK_SECRET_TOKEN') or None  # Checked on every incoming update
+WEBHOOK_WORKERS = int(os.getenv('WEBHOOK_WORKERS', 1))  # >1: a front process routes updates to N bot processes
+UPDATE_DEDUP_WINDOW = int(os.getenv('UPDATE_DEDUP_WINDOW', 4096))  # recent update_ids kept to drop redeliveries
 
 # Logging configuration
-LOGGING_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-LOGGING_LEVEL = 'INFO'
+LOGGING_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'  # LOG_FORMAT=text
+LOGGING_LEVEL = os.getenv('LOG_LEVEL', 'INFO').upper()
+LOGGING_LEVELS = os.getenv('LOG_LEVELS', 'httpx=WARNING')  # per logger, e.g. "handlers.panel=DEBUG,telegram=WARNING"
+LOGGING_JSON = os.getenv('LOG_FORMAT', 'json').lower() == 'json'
+LOG_QUEUE_SIZE = int(os.getenv('LOG_QUEUE_SIZE', 10000))  # records waiting to be written; beyond this they are dropped
+LOG_REPEAT_BURST = int(os.getenv('LOG_REPEAT_BURST', 10))  # warnings/errors per call site and window written in full
+LOG_REPEAT_WINDOW = float(os.getenv('LOG_REPEAT_WINDOW', 60))  # seconds
+LOG_REPEAT_SAMPLE = int(os.getenv('LOG_REPEAT_SAMPLE', 100))  # past the burst, one in this many is written
 
 # Bot settings
 KEYBOARD_RESIZE = True
 KEYBOARD_ONE_TIME = False
+
+# Local backend services
+PANEL_API_URL = os.getenv('PANEL_API_URL', 'http://172.17.0.1:5000')
+PANEL_APPS_TIMEOUT = float(os.getenv('PANEL_APPS_TIMEOUT', 10))
+PANEL_TOGGLE_TIMEOUT = float(os.getenv('PANEL_TOGGLE_TIMEOUT', 30))
+PANEL_APPS_FRESH = float(os.getenv('PANEL_APPS_FRESH', 5))  # seconds /apps is served from cache without refreshing
+PANEL_APPS_MAX_STALE = float(os.getenv('PANEL_APPS_MAX_STALE', 300))  # oldest app list shown while the panel is down
+PANEL_PAGE_SIZE = int(os.getenv('PANEL_PAGE_SIZE', 20))  # apps per status page
+PANEL_PAGE_CACHE_SIZE = int(os.getenv('PANEL_PAGE_CACHE_SIZE', 256))  # rendered pages kept
+PANEL_TOKEN_TTL = float(os.getenv('PANEL_TOKEN_TTL', 24 * 3600))  # seconds a panel button stays valid after it was drawn
+
+# Shared HTTP client pool
+HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', 20))
+HTTP_KEEPALIVE_SIZE = int(os.getenv('HTTP_KEEPALIVE_SIZE', 10))
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+HTTP_CONNECT_TIMEOUT = float(os.getenv('HTTP_CONNECT_TIMEOUT', 3))
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', 5))  # consecutive failures that mark a service down
+BREAKER_RESET_TIMEOUT = float(os.getenv('BREAKER_RESET_TIMEOUT', 30))  # seconds of failing fast before a trial call
+
+# ngrok tunnel registry
+NGROK_API_URL = os.getenv('NGROK_API_URL', 'http://172.17.0.1:4040')
+TUNNEL_TTL = float(os.getenv('TUNNEL_TTL', 60))
+TUNNEL_REFRESH_INTERVAL = float(os.getenv('TUNNEL_REFRESH_INTERVAL', 30))
+WEBHOOK_TUNNEL_NAME = os.getenv('WEBHOOK_TUNNEL_NAME', 'telebot')
+MONITOR_TUNNEL_NAME = os.getenv('MONITOR_TUNNEL_NAME', 'changeDetection')
+
+# URL shortener cache
+SHORTEN_CACHE_SIZE = int(os.getenv('SHORTEN_CACHE_SIZE', 10000))
+SHORTEN_CACHE_TTL = float(os.getenv('SHORTEN_CACHE_TTL', 7 * 24 * 3600))
+SHORTEN_CACHE_PATH = os.getenv('SHORTEN_CACHE_PATH')  # e.g. data/short_urls.json; unset disables persistence
+SHORTEN_WORKERS = int(os.getenv('SHORTEN_WORKERS', 16))
+SHORTEN_PROVIDERS = [p.strip() for p in os.getenv('SHORTEN_PROVIDERS', '').split(',') if p.strip()] or ['tinyurl', 'isgd']  # unset or empty: the defaults
+SHORTEN_HEDGE_DELAY = float(os.getenv('SHORTEN_HEDGE_DELAY', 1.5))  # seconds before asking the next provider
+SHORTEN_TIMEOUT = float(os.getenv('SHORTEN_TIMEOUT', 5))
+SHORTEN_BATCH_MAX = int(os.getenv('SHORTEN_BATCH_MAX', 50))
+SHORTEN_BATCH_CONCURRENCY = int(os.getenv('SHORTEN_BATCH_CONCURRENCY', 10))
+
+# Self-hosted short links (SHORTEN_PROVIDERS=local, or as a fallback after another provider)
+SHORT_LINKS_LOCAL = 'local' in SHORTEN_PROVIDERS
+SHORT_LINK_DB_PATH = os.getenv('SHORT_LINK_DB_PATH', 'data/short_links.db')
+SHORT_LINK_BASE_URL = os.getenv('SHORT_LINK_BASE_URL')  # public address of the web server's redirect route; required
+SHORT_LINK_PATH = os.getenv('SHORT_LINK_PATH', '/s/')
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', 100000))  # hot codes answered from memory
+
+# User state limits
+STATE_TTL = float(os.getenv('STATE_TTL', 3600))  # seconds an idle conversation state is kept
+STATE_MAX_ENTRIES = int(os.getenv('STATE_MAX_ENTRIES', 100000))
+STATE_BACKEND = os.getenv('STATE_BACKEND', 'memory')  # 'memory' or 'sqlite'
+STATE_DB_PATH = os.getenv('STATE_DB_PATH', 'data/state.db')
+STATE_FLUSH_INTERVAL = float(os.getenv('STATE_FLUSH_INTERVAL', 0.5))
+STATE_MISS_TTL = float(os.getenv('STATE_MISS_TTL', 60))  # seconds a user with no stored state skips the backend read
+STATE_PURGE_INTERVAL = float(os.getenv('STATE_PURGE_INTERVAL', 300))  # seconds between deletes of expired stored states
+
+# Access control
+APPROVE_IDS = frozenset(int(i) for i in os.getenv('APPROVE_ID', '').split(',') if i.strip().isdigit())
+
+# Live panel updates
+PANEL_LIVE_INTERVAL = float(os.getenv('PANEL_LIVE_INTERVAL', 5))  # seconds between backend polls
+PANEL_LIVE_DEBOUNCE = float(os.getenv('PANEL_LIVE_DEBOUNCE', 2))  # quiet period before editing
+PANEL_LIVE_IDLE_TIMEOUT = float(os.getenv('PANEL_LIVE_IDLE_TIMEOUT', 600))
+
+# Panel bulk actions
+PANEL_BULK_CONCURRENCY = int(os.getenv('PANEL_BULK_CONCURRENCY', 6))
+PANEL_BULK_TIMEOUT = float(os.getenv('PANEL_BULK_TIMEOUT', 60))  # per app
+PANEL_PROGRESS_INTERVAL = float(os.getenv('PANEL_PROGRESS_INTERVAL', 1.5))  # min seconds between progress edits
+
+# Panel logs and restarts
+PANEL_COMPOSE_COMMAND = os.getenv('PANEL_COMPOSE_COMMAND', 'sudo docker compose').split()
+PANEL_RESTART_TIMEOUT = float(os.getenv('PANEL_RESTART_TIMEOUT', 120))
+PANEL_LOGS_TIMEOUT = float(os.getenv('PANEL_LOGS_TIMEOUT', 30))  # seconds /logs waits for docker compose logs
+PANEL_LOG_EDIT_INTERVAL = float(os.getenv('PANEL_LOG_EDIT_INTERVAL', 3))  # min seconds between log message edits
+PANEL_LOG_FOLLOW_TIMEOUT = float(os.getenv('PANEL_LOG_FOLLOW_TIMEOUT', 900))
+PANEL_LOG_BUFFER_CHARS = int(os.getenv('PANEL_LOG_BUFFER_CHARS', 16000))  # unsent lines kept while following
+
+# Outbound Bot API rate limits (Telegram: ~30 msg/s overall, ~1 msg/s per chat, 20 msg/min per group)
+RATE_GLOBAL_PER_SECOND = float(os.getenv('RATE_GLOBAL_PER_SECOND', 30))
+RATE_CHAT_PER_SECOND = float(os.getenv('RATE_CHAT_PER_SECOND', 1))
+RATE_CHAT_BURST = float(os.getenv('RATE_CHAT_BURST', 3))
+RATE_GROUP_PER_SECOND = float(os.getenv('RATE_GROUP_PER_SECOND', 20 / 60))
+RATE_GROUP_BURST = float(os.getenv('RATE_GROUP_BURST', 5))
+RATE_MAX_RETRIES = int(os.getenv('RATE_MAX_RETRIES', 3))
+
+# Update processing
+UPDATE_CONCURRENCY = int(os.getenv('UPDATE_CONCURRENCY', 32))  # handlers running at once (across users)
+UPDATE_MAX_PENDING = int(os.getenv('UPDATE_MAX_PENDING', 1024))  # beyond this, webhook deliveries wait
+CATCHUP_MIN_PENDING = int(os.getenv('CATCHUP_MIN_PENDING', 50))  # backlog at startup that triggers catch-up mode; 0 disables
+CATCHUP_CALLBACK_MAX_AGE = float(os.getenv('CATCHUP_CALLBACK_MAX_AGE', 60))  # older button presses are dropped while catching up
+
+# Metrics (Prometheus text format at METRICS_PATH)
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'false').lower() == 'true'  # /metrics is unauthenticated; opt in
+METRICS_PATH = os.getenv('METRICS_PATH', '/metrics')
+METRICS_PORT = int(os.getenv('METRICS_PORT', 9090))  # polling mode only; webhook mode serves it on PORT
+
+# Built-in web monitor (/watch)
+MONITOR_ENABLED = os.getenv('MONITOR_ENABLED', 'false').lower() == 'true'  # off: the module is not loaded at startup
+MONITOR_DB_PATH = os.getenv('MONITOR_DB_PATH', 'data/monitor.db')
+MONITOR_INTERVAL = float(os.getenv('MONITOR_INTERVAL', 300))  # seconds between polls of one URL
+MONITOR_JITTER = float(os.getenv('MONITOR_JITTER', 0.2))  # each interval varies by up to this fraction
+MONITOR_CONCURRENCY = int(os.getenv('MONITOR_CONCURRENCY', 20))  # polls running at once
+MONITOR_TIMEOUT = float(os.getenv('MONITOR_TIMEOUT', 15))
+MONITOR_MAX_BYTES = int(os.getenv('MONITOR_MAX_BYTES', 2 * 1024 * 1024))  # pages are compared on this prefix
+MONITOR_MAX_PER_USER = int(os.getenv('MONITOR_MAX_PER_USER', 50))
+MONITOR_FAILURE_NOTIFY = int(os.getenv('MONITOR_FAILURE_NOTIFY', 5))  # failed polls in a row before telling the chat
+MONITOR_FLUSH_INTERVAL = float(os.getenv('MONITOR_FLUSH_INTERVAL', 10))  # seconds between state writes
+
+# Container health alerts to the APPROVE_ID chats
+PANEL_ALERTS_ENABLED = os.getenv('PANEL_ALERTS_ENABLED', 'false').lower() == 'true'  # off: the module is not loaded at startup
+PANEL_EVENTS_PATH = os.getenv('PANEL_EVENTS_PATH', '/events')  # SSE change stream; empty to always poll /apps
+PANEL_ALERT_POLL_INTERVAL = float(os.getenv('PANEL_ALERT_POLL_INTERVAL', 15))  # /apps polling without a stream
+PANEL_ALERT_STREAM_RETRY = float(os.getenv('PANEL_ALERT_STREAM_RETRY', 600))  # seconds before looking for a missing stream again
+PANEL_ALERT_DEBOUNCE = float(os.getenv('PANEL_ALERT_DEBOUNCE', 10))  # seconds a new state must hold before it is reported
+PANEL_ALERT_FLAP_COUNT = int(os.getenv('PANEL_ALERT_FLAP_COUNT', 4))  # this many changes within the window is flapping
+PANEL_ALERT_FLAP_WINDOW = float(os.getenv('PANEL_ALERT_FLAP_WINDOW', 300))
+PANEL_ALERT_BATCH_DELAY = float(os.getenv('PANEL_ALERT_BATCH_DELAY', 2))  # changes confirmed within this share a message
@@ -4,68 +4,73 @@ Basic command handlers for the Telegram bot.
 import logging
 from telegram import Update
 from telegram.ext import ContextTypes
-from utils.keyboards import get_main_keyboard
+from utils.keyboards import MAIN_KEYBOARD, MAIN_KEYBOARD_PAYLOAD
+from utils.render_cache import RenderedReply
 from utils.state_manager import state_manager
 
 logger = logging.getLogger(__name__)
 
+WELCOME_BODY = (
+    "Welcome to the Multi-Purpose Bot!\n\n"
+    "I can help you with:\n"
+    "- URL shortening\n"
+    "- Web monitoring\n"
+    "- Admin panel access\n\n"
+    "Use the buttons below or type commands to get started!"
+)
+
+HELP_REPLY = RenderedReply(
+    "Bot Help\n\n"
+    "Available Commands:\n"
+    "• /start - Show main menu\n"
+    "• /help - Show this help\n"
+    "• /shorten - Shorten URLs\n"
+    "• /webmonitor - Web monitoring\n"
+    "• /watch <url> - Get a message when a page changes\n"
+    "• /watches, /unwatch <id> - Manage watches\n"
+    "• /panel - Admin control panel\n"
+    "• /logs <app> [lines] - Recent app logs\n"
+    "• /follow <app> - Stream app logs\n"
+    "• /restart <app> - Restart an app\n"
+    "• /cancel - Cancel operation\n\n"
+    "Quick Tips:\n"
+    "• Use keyboard buttons for navigation\n"
+    "• Type 'monit' for quick monitoring\n"
+    "• Cancel button exits any operation",
+    MAIN_KEYBOARD
+)
+
+CANCELLED_REPLY = RenderedReply(
+    "Operation cancelled. You're back to the main menu.",
+    MAIN_KEYBOARD
+)
+
+NOTHING_TO_CANCEL_REPLY = RenderedReply(
+    "No active operation to cancel. You're already at the main menu.",
+    MAIN_KEYBOARD
+)
+
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /start command."""
     user = update.effective_user
-    reply_markup = get_main_keyboard()
-    
-    welcome_message = (
-        f"Hello {user.first_name}!\n\n"
-        "Welcome to the Multi-Purpose Bot!\n\n"
-        "I can help you with:\n"
-        "- URL shortening\n"
-        "- Web monitoring\n"
-        "- Admin panel access\n\n"
-        "Use the buttons below or type commands to get started!"
-    )
     
     await update.message.reply_text(
-        welcome_message,
-        reply_markup=reply_markup
+        f"Hello {user.first_name}!\n\n{WELCOME_BODY}",
+        api_kwargs=MAIN_KEYBOARD_PAYLOAD
     )
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /help command."""
-    reply_markup = get_main_keyboard()
-    
-    help_message = (
-        "Bot Help\n\n"
-        "Available Commands:\n"
-        "• /start - Show main menu\n"
-        "• /help - Show this help\n"
-        "• /shorten - Shorten URLs\n"
-        "• /webmonitor - Web monitoring\n"
-        "• /panel - Admin control panel\n"
-        "• /cancel - Cancel operation\n\n"
-        "Quick Tips:\n"
-        "• Use keyboard buttons for navigation\n"
-        "• Type 'monit' for quick monitoring\n"
-        "• Cancel button exits any operation"
-    )
-    
-    await update.message.reply_text(
-        help_message,
-        reply_markup=reply_markup
-    )
+    await update.message.reply_text(**HELP_REPLY.kwargs)
 
 async def cancel_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /cancel command."""
     user_id = update.effective_user.id
-    reply_markup = get_main_keyboard()
     
     # Clear any active user state
-    if state_manager.has_state(user_id):
-        state_manager.clear_state(user_id)
-        message = "Operation cancelled. You're back to the main menu."
+    if state_manager.clear_state(user_id):
+        reply = CANCELLED_REPLY
     else:
-        message = "No active operation to cancel. You're already at the main menu."
+        reply = NOTHING_TO_CANCEL_REPLY
     
-    await update.message.reply_text(
-        message,
-        reply_markup=reply_markup
-    )
\ No newline at end of file
+    await update.message.reply_text(**reply.kwargs)
@@ -0,0 +1,33 @@
+"""
+Lazily imported handler callbacks.
+
+app.py registers these stubs so feature modules (and their dependencies
+such as pyshorteners) are imported on the first update that needs them
+instead of before the bot can take its first update.
+"""
+import importlib
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+
+def lazy_callback(module: str, name: str):
+    """Return an async callback that imports ``module`` on first use and calls ``name``."""
+    target = None
+
+    async def callback(update, context):
+        nonlocal target
+        if target is None:
+            target = getattr(importlib.import_module(module), name)
+            logger.debug(f"Loaded {module}.{name} on first use")
+        return await target(update, context)
+
+    callback.__name__ = callback.__qualname__ = name
+    callback.__module__ = module
+    return callback
+
+
+def loaded_module(module: str):
+    """Return ``module`` if something already imported it, else None."""
+    return sys.modules.get(module)
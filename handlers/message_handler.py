@@ -3,47 +3,36 @@ Main message handler that routes messages based on user state.
 """
 from telegram import Update
 from telegram.ext import ContextTypes
+from config import APPROVE_IDS
 from utils.state_manager import state_manager
 from handlers.basic_handlers import help_command, cancel_command
 from handlers.url_shortener import shorten_command, handle_url_shortening, WAITING_FOR_URL
 from handlers.web_monitor import handle_monit_message
 from handlers.panel import panel_command
-import os
+from handlers.router import MessageRouter
+
+def build_router() -> MessageRouter:
+    """Build the routing tables once at startup."""
+    router = MessageRouter(APPROVE_IDS, state_manager.get_state)
+
+    # Keyboard button presses
+    router.add_button("Shorten URL", shorten_command)
+    router.add_button("Help", help_command)
+    router.add_button("WebMonitor", handle_monit_message)
+    router.add_button("Panel", panel_command)
+    router.add_button("Cancel", cancel_command)
+    router.add_alias("monit", handle_monit_message)
+
+    # User states
+    router.add_state(WAITING_FOR_URL, handle_url_shortening)
+    return router
+
+router = build_router()
+
+def register_state(state: str, handler) -> None:
+    """Let a feature route messages for its own conversation state."""
+    router.add_state(state, handler)
 
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle text messages."""
-    user_id = update.effective_user.id
-    user_message = update.message.text
-    approve_ID = os.environ.get('APPROVE_ID', '').split(',')
-    if str(user_id) in approve_ID:
-        
-        # Handle keyboard button presses
-        if user_message == "Shorten URL":
-            await shorten_command(update, context)
-            return
-        elif user_message == "Help":
-            await help_command(update, context)
-            return
-        elif user_message == "WebMonitor":
-            await handle_monit_message(update)
-            return
-        elif user_message.lower() == "monit":
-            await handle_monit_message(update)
-            return
-        elif user_message == "Panel":
-            await panel_command(update, context)
-            return
-        elif user_message == "Cancel":
-            await cancel_command(update, context)
-            return
-    
-        # Check user state and route accordingly
-        user_state = state_manager.get_state(user_id)
-        
-        if user_state == WAITING_FOR_URL:
-            await handle_url_shortening(update, user_id, user_message)
-        else:
-        # Echo the message as default behavior
-            await update.message.reply_text(user_message)
-    else:
-        await update.message.reply_text(user_message)
\ No newline at end of file
+    await router.dispatch(update, context)
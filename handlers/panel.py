@@ -2,121 +2,207 @@
 Panel functionality with inline keyboard for Docker Compose app management.
 """
 import logging
+from functools import lru_cache, partial
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
-from utils.keyboards import get_main_keyboard
-from glob import glob
-from pathlib import Path
-import os
-import requests
-import subprocess
-import json
-import asyncio
+from config import PANEL_PAGE_SIZE, PANEL_PAGE_CACHE_SIZE, PANEL_TOKEN_TTL
+from utils.callback_tokens import CallbackTokens
+from utils.lru_cache import LRUTTLCache
+from utils.panel_api import HIDDEN_APPS, get_app_status, refresh_app_status, toggle_app_status
+from utils.keyboards import PANEL_MENU_KEYBOARD, BACK_TO_PANEL_KEYBOARD
+from utils.rate_limiter import use_background_lane
+from utils.render_cache import RenderedReply
+from handlers.panel_live import get_live_session, start_live_session, stop_live_session
+from handlers.panel_bulk import run_bulk_action, select_targets
 
 logger = logging.getLogger(__name__)
 
+PANEL_MENU_REPLY = RenderedReply(
+    "🎛️ **Docker Control Panel**\n\n"
+    "Manage your Docker Compose applications:\n\n"
+    "📊 **App Status** - View and control running apps\n"
+    "❌ **Close** - Exit the panel",
+    PANEL_MENU_KEYBOARD,
+    parse_mode='Markdown'
+)
 
-async def get_app_status():
-    """Scan for Docker Compose projects and get their status."""
-    
-    try:
-        apps = requests.get(r'http://172.17.0.1:5000/apps').json()
-        return apps
-        
-    except Exception as e:
-        logger.error(f"Error scanning for apps: {e}")
-        return []
+NO_APPS_REPLY = RenderedReply(
+    "📭 **No Docker Compose Applications Found**\n\n"
+    "No `docker-compose.yml` files found in subdirectories.\n"
+    "Make sure your applications are in separate folders with their own docker-compose.yml files.",
+    BACK_TO_PANEL_KEYBOARD,
+    parse_mode='Markdown'
+)
+
+PANEL_CLOSED_REPLY = RenderedReply(
+    "🎛️ **Panel Closed**\n\n"
+    "Use /panel command to open the control panel again."
+)
+
+# Longer names are shortened on screen so a full page stays under Telegram's 4096 characters
+MAX_NAME_CHARS = 64
+
+# App buttons carry a short token instead of the app name (callback_data is limited to 64 bytes)
+app_tokens = CallbackTokens(PANEL_TOKEN_TTL, max_size=10000)
+
+# (chat_id, message_id) -> page the status message shows
+panel_pages = LRUTTLCache(10000, PANEL_TOKEN_TTL)
 
 
 async def panel_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /panel command - show main panel."""
-    keyboard = [
-        [InlineKeyboardButton("📊 App Status", callback_data="app_status")],
-        [InlineKeyboardButton("❌ Close", callback_data="close_panel")]
-    ]
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    await update.message.reply_text(
-        "🎛️ **Docker Control Panel**\n\n"
-        "Manage your Docker Compose applications:\n\n"
-        "📊 **App Status** - View and control running apps\n"
-        "❌ **Close** - Exit the panel",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
+    await update.message.reply_text(**PANEL_MENU_REPLY.kwargs)
 
 
-async def toggle_app_status(app_name: str) -> dict:
-    """
-    Toggle the status of a Docker Compose app.
-    Returns dict with success status and new app status.
+def render_app_status(apps: list, live: bool = False, selection: set = None, page: int = 0) -> tuple:
+    """Build the status message text and inline keyboard for one page of an app list.
+
+    With a ``selection`` the app buttons pick apps for a bulk toggle
+    instead of toggling them directly. Only the visible page is rendered,
+    and rendered pages are cached.
     """
-   
-    try:
-        requests.post(rf'http://172.17.0.1:5000/toggle/{app_name}')
-        return {'success': False, 'error': f'App {app_name} not found'}
-        
-    except Exception as e:
-        logger.error(f"Error toggling app {app_name}: {e}")
-        return {'success': False, 'error': str(e)}
+    visible = sorted((app for app in apps if app['name'] not in HIDDEN_APPS), key=lambda x: x['status'])
+    pages = max(1, -(-len(visible) // PANEL_PAGE_SIZE))
+    page = min(max(page, 0), pages - 1)
+    rows = tuple(
+        (app['name'], app_tokens.token_for(app['name']), bool(app['status']), app['running_count'], app['total_count'])
+        for app in visible[page * PANEL_PAGE_SIZE:(page + 1) * PANEL_PAGE_SIZE]
+    )
+    running = sum(1 for app in visible if app['status'])
+    picked = None
+    if selection is not None:
+        picked = frozenset(name for name, *_ in rows if name in selection)
+    return _render_page(rows, page, pages, running, len(visible), live, picked, len(selection or ()))
 
 
-async def show_app_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Show all apps with their current status."""
-    current_apps = await get_app_status()
-    
-    if not current_apps:
-        keyboard = [[InlineKeyboardButton("🔙 Back", callback_data="back_to_panel")]]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        query = update.callback_query
-        await query.edit_message_text(
-            "📭 **No Docker Compose Applications Found**\n\n"
-            "No `docker-compose.yml` files found in subdirectories.\n"
-            "Make sure your applications are in separate folders with their own docker-compose.yml files.",
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
-        )
-        return
-    
+@lru_cache(maxsize=PANEL_PAGE_CACHE_SIZE)
+def _render_page(rows: tuple, page: int, pages: int, running: int, total: int, live: bool, picked: frozenset, picked_total: int) -> tuple:
     keyboard = []
     status_summary = "📊 **Docker Applications Status**\n\n"
-    current_apps = sorted(current_apps, key=lambda x: x['status'])
-    for app_info in current_apps:
-        if app_info['name'] in ("telebot", "ngrok"):
-            continue
-        
-        status_text = "ON" if app_info['status'] else "OFF"
-        status_emoji = "🟢" if app_info['status'] else "🔴"
+    if pages > 1:
+        status_summary += f"🟢 {running} on · 🔴 {total - running} off · page {page + 1}/{pages}\n\n"
+    for name, token, status, running_count, total_count in rows:
+        label = name if len(name) <= MAX_NAME_CHARS else name[:MAX_NAME_CHARS - 1] + "…"
+        status_text = "ON" if status else "OFF"
+        status_emoji = "🟢" if status else "🔴"
         
         # Create button text with container count info
-        if app_info['total_count'] > 0:
-            button_text = f"{app_info['name']}  {status_emoji}"
+        if total_count > 0:
+            button_text = f"{label}  {status_emoji}"
         else:
-            button_text = f"{app_info['name']} (No containers) ⚪"
+            button_text = f"{label} (No containers) ⚪"
         
-        keyboard.append([InlineKeyboardButton(button_text, callback_data=f"toggle_{app_info['name']}")])
+        if picked is None:
+            callback_data = f"toggle_{token}"
+        else:
+            check = "☑️" if name in picked else "⬜"
+            button_text = f"{check} {button_text}"
+            callback_data = f"pick_{token}"
+        keyboard.append([InlineKeyboardButton(button_text, callback_data=callback_data)])
         
         # Add to status summary
-        status_summary += f"{status_emoji} **{app_info['name']}**: {status_text}"
-        if app_info['total_count'] > 0:
-            status_summary += f" ({app_info['running_count']}/{app_info['total_count']} containers)"
+        status_summary += f"{status_emoji} **{label}**: {status_text}"
+        if total_count > 0:
+            status_summary += f" ({running_count}/{total_count} containers)"
         status_summary += "\n"
+
+    if pages > 1:
+        keyboard.append([
+            InlineKeyboardButton("◀️", callback_data=f"page_{(page - 1) % pages}"),
+            InlineKeyboardButton(f"{page + 1}/{pages}", callback_data="noop"),
+            InlineKeyboardButton("▶️", callback_data=f"page_{(page + 1) % pages}")
+        ])
     
     # Add control buttons
+    if picked is not None:
+        keyboard.append([
+            InlineKeyboardButton(f"✅ Toggle selected ({picked_total})", callback_data="select_apply"),
+            InlineKeyboardButton("✖️ Cancel", callback_data="select_cancel")
+        ])
+        status_summary += "**Pick apps, then toggle them all at once**"
+        return status_summary, InlineKeyboardMarkup(keyboard)
+
+    keyboard.append([
+        InlineKeyboardButton("▶️ Start all", callback_data="bulk_start"),
+        InlineKeyboardButton("⏹ Stop all", callback_data="bulk_stop"),
+        InlineKeyboardButton("☑️ Select", callback_data="select_mode")
+    ])
+    if live:
+        live_button = InlineKeyboardButton("⏸ Stop live", callback_data="live_off")
+    else:
+        live_button = InlineKeyboardButton("🔴 Live", callback_data="live_on")
     keyboard.append([
+        live_button,
         InlineKeyboardButton("🔙 Back", callback_data="back_to_panel")
     ])
     
     reply_markup = InlineKeyboardMarkup(keyboard)
     status_summary += "**Click on any app to start/stop it**"
+    if live:
+        status_summary += "\n_🔴 Live: updates automatically_"
+    return status_summary, reply_markup
+
+
+async def _edit_status_message(bot, chat_id: int, message_id: int, **kwargs) -> None:
+    """Edit a panel message; redrawing it unchanged is not an error."""
+    try:
+        await bot.edit_message_text(chat_id=chat_id, message_id=message_id, **kwargs)
+    except BadRequest as e:
+        if "not modified" not in str(e).lower():
+            raise
+
+
+async def refresh_status_message(bot, chat_id: int, message_id: int, live: bool = None, selection: set = None) -> None:
+    """Fetch the app list and redraw a status message.
+
+    ``live`` starts (True), stops (False) or keeps (None) live mode for the message.
+    """
+    current_apps = await get_app_status()
     
-    query = update.callback_query
-    await query.edit_message_text(
-        status_summary,
+    if not current_apps:
+        stop_live_session(chat_id, message_id)
+        await _edit_status_message(bot, chat_id, message_id, **NO_APPS_REPLY.kwargs)
+        return
+    
+    if live is None:
+        live = get_live_session(chat_id, message_id) is not None
+    render = partial(render_app_status, page=panel_pages.get((chat_id, message_id)) or 0)
+    status_summary, reply_markup = render(current_apps, live=live, selection=selection)
+    
+    await _edit_status_message(
+        bot, chat_id, message_id,
+        text=status_summary,
         reply_markup=reply_markup,
         parse_mode='Markdown'
     )
+    if live:
+        start_live_session(bot, chat_id, message_id, refresh_app_status, render, current_apps)
+
+
+async def show_app_status(update: Update, context: ContextTypes.DEFAULT_TYPE, live: bool = None) -> None:
+    """Show all apps with their current status."""
+    query = update.callback_query
+    await refresh_status_message(context.bot, query.message.chat_id, query.message.message_id, live=live)
+
+
+def _selections(context: ContextTypes.DEFAULT_TYPE) -> dict:
+    """Per-chat map of panel message id -> apps picked for a bulk toggle."""
+    return context.chat_data.setdefault('panel_selection', {})
+
+
+async def _bulk_then_refresh(bot, chat_id: int, message_id: int, title: str, app_names: list) -> None:
+    """Run a bulk action, then redraw the status message it was started from."""
+    use_background_lane()
+    await run_bulk_action(bot, chat_id, title, app_names)
+    await refresh_status_message(bot, chat_id, message_id)
+
+
+def _start_bulk(context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int, title: str, app_names: list) -> None:
+    """Run a bulk action in the background so other updates keep flowing."""
+    context.application.create_task(
+        _bulk_then_refresh(context.bot, chat_id, message_id, title, app_names)
+    )
 
 
 async def handle_panel_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -126,41 +212,84 @@ async def handle_panel_callback(update: Update, context: ContextTypes.DEFAULT_TY
     
     callback_data = query.data
     
-    if callback_data == "app_status":
+    if callback_data == "noop":
+        # Labels such as the page indicator; answering the query is all there is to do
+        return
+
+    elif callback_data == "app_status":
         await show_app_status(update, context)
         
+    elif callback_data == "live_on":
+        await show_app_status(update, context, live=True)
         
-    elif callback_data == "close_panel":
-        await query.edit_message_text(
-            "🎛️ **Panel Closed**\n\n"
-            "Use /panel command to open the control panel again."
+    elif callback_data == "live_off":
+        stop_live_session(query.message.chat_id, query.message.message_id)
+        await show_app_status(update, context, live=False)
+        
+    elif callback_data in ("bulk_start", "bulk_stop"):
+        action = "start" if callback_data == "bulk_start" else "stop"
+        # Bulk actions toggle, so pick targets from the backend's current state, not a cached view
+        app_names = select_targets(await refresh_app_status(), action)
+        title = "Starting all apps" if action == "start" else "Stopping all apps"
+        _start_bulk(context, query.message.chat_id, query.message.message_id, title, app_names)
+        
+    elif callback_data == "select_mode":
+        stop_live_session(query.message.chat_id, query.message.message_id)
+        selection = _selections(context).setdefault(query.message.message_id, set())
+        await refresh_status_message(context.bot, query.message.chat_id, query.message.message_id, live=False, selection=selection)
+        
+    elif callback_data.startswith("page_"):
+        panel_pages.set((query.message.chat_id, query.message.message_id), int(callback_data.replace("page_", "", 1)))
+        # Stay in selection mode while paging through it
+        selection = _selections(context).get(query.message.message_id)
+        await refresh_status_message(
+            context.bot, query.message.chat_id, query.message.message_id,
+            live=False if selection is not None else None, selection=selection
         )
         
+    elif callback_data.startswith("pick_"):
+        app_name = app_tokens.resolve(callback_data.replace("pick_", "", 1))
+        selection = _selections(context).setdefault(query.message.message_id, set())
+        if app_name is None:
+            logger.info(f"Expired panel button {callback_data}; redrawing")
+        elif app_name in selection:
+            selection.discard(app_name)
+        else:
+            selection.add(app_name)
+        await refresh_status_message(context.bot, query.message.chat_id, query.message.message_id, live=False, selection=selection)
+        
+    elif callback_data == "select_apply":
+        app_names = sorted(_selections(context).pop(query.message.message_id, set()))
+        _start_bulk(context, query.message.chat_id, query.message.message_id, f"Toggling {len(app_names)} selected apps", app_names)
+        
+    elif callback_data == "select_cancel":
+        _selections(context).pop(query.message.message_id, None)
+        await show_app_status(update, context)
+        
+    elif callback_data == "close_panel":
+        stop_live_session(query.message.chat_id, query.message.message_id)
+        _selections(context).pop(query.message.message_id, None)
+        await query.edit_message_text(**PANEL_CLOSED_REPLY.kwargs)
+        
     elif callback_data == "back_to_panel":
         # Show main panel again
-        keyboard = [
-            [InlineKeyboardButton("📊 App Status", callback_data="app_status")],
-            [InlineKeyboardButton("❌ Close", callback_data="close_panel")]
-        ]
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            "🎛️ **Docker Control Panel**\n\n"
-            "Manage your Docker Compose applications:\n\n"
-            "📊 **App Status** - View and control running apps\n"
-            "❌ **Close** - Exit the panel",
-            reply_markup=reply_markup,
-            parse_mode='Markdown'
-        )
+        stop_live_session(query.message.chat_id, query.message.message_id)
+        _selections(context).pop(query.message.message_id, None)
+        await query.edit_message_text(**PANEL_MENU_REPLY.kwargs)
         
     elif callback_data.startswith("toggle_"):
         # Extract app name and toggle its status
         try:
-            app_name = callback_data.replace("toggle_", "")
-            await toggle_app_status(app_name)
+            app_name = app_tokens.resolve(callback_data.replace("toggle_", "", 1))
+            if app_name is None:
+                # Drawn too long ago; show the current buttons instead of guessing
+                logger.info(f"Expired panel button {callback_data}; redrawing")
+            else:
+                await toggle_app_status(app_name)
             await show_app_status(update, context)
                 
-        except:
+        except Exception as e:
+            logger.error(f"Error toggling app from {callback_data}: {e}")
             # Show error message
             await context.bot.send_message(
                 chat_id=query.message.chat_id,
@@ -169,62 +298,3 @@ async def handle_panel_callback(update: Update, context: ContextTypes.DEFAULT_TY
             )
             # Still refresh the status to show current state
             await show_app_status(update, context)
-
-
-# Additional utility functions for advanced features
-
-async def get_app_logs(app_name: str, lines: int = 50) -> str:
-    """Get recent logs for a specific app."""
-    cwd = os.getcwd()
-    
-    try:
-        for app in apps:
-            if app['name'] == app_name:
-                os.chdir(app['folder'])
-                result = subprocess.run(
-                    ['sudo', 'docker', 'compose', 'logs', '--tail', str(lines)],
-                    capture_output=True,
-                    text=True
-                )
-                if result.returncode == 0:
-                    return result.stdout
-                else:
-                    return f"Error getting logs: {result.stderr}"
-        return f"App {app_name} not found"
-    except Exception as e:
-        logger.error(f"Error getting logs for {app_name}: {e}")
-        return f"Error: {str(e)}"
-    finally:
-        os.chdir(cwd)
-
-
-async def restart_app(app_name: str) -> dict:
-    """Restart a Docker Compose app."""
-    cwd = os.getcwd()
-    
-    try:
-        for app in apps:
-            if app['name'] == app_name:
-                os.chdir(app['folder'])
-                
-                logger.info(f"Restarting app: {app_name}")
-                result = subprocess.run(
-                    ['sudo', 'docker', 'compose', 'restart'],
-                    capture_output=True,
-                    text=True
-                )
-                
-                if result.returncode == 0:
-                    logger.info(f"Successfully restarted {app_name}")
-                    return {'success': True, 'action': 'restarted'}
-                else:
-                    logger.error(f"Failed to restart {app_name}: {result.stderr}")
-                    return {'success': False, 'error': result.stderr}
-        
-        return {'success': False, 'error': f'App {app_name} not found'}
-        
-    except Exception as e:
-        logger.error(f"Error restarting app {app_name}: {e}")
-        return {'success': False, 'error': str(e)}
-    finally:
-        os.chdir(cwd)
\ No newline at end of file
@@ -0,0 +1,261 @@
+"""
+Container health alerts pushed to the approved chats.
+
+The watcher follows the panel backend's change stream (Server-Sent Events
+at PANEL_EVENTS_PATH) and falls back to polling /apps and diffing the
+result when the backend has no stream or it breaks. After every
+(re)connect the full list is fetched once, so events missed while
+disconnected still surface.
+
+A new state is only reported once an app has kept it for
+PANEL_ALERT_DEBOUNCE seconds, so a container that keeps restarting does not
+alert on every restart. One that changes state PANEL_ALERT_FLAP_COUNT times
+within PANEL_ALERT_FLAP_WINDOW is reported as flapping.
+Changes confirmed close together go out as one message per chat, sent in
+the background lane of the outbound rate limiter.
+"""
+import asyncio
+import json
+import logging
+import time
+import httpx
+from config import (
+    APPROVE_IDS, PANEL_API_URL, PANEL_EVENTS_PATH, PANEL_APPS_TIMEOUT, PANEL_ALERT_POLL_INTERVAL,
+    PANEL_ALERT_DEBOUNCE, PANEL_ALERT_FLAP_COUNT, PANEL_ALERT_FLAP_WINDOW,
+    PANEL_ALERT_STREAM_RETRY, PANEL_ALERT_BATCH_DELAY, HTTP_CONNECT_TIMEOUT
+)
+from utils.http_client import http_client
+from utils.metrics import metrics
+from utils.panel_api import app_status_cache, fetch_app_status
+from utils.rate_limiter import use_background_lane
+
+logger = logging.getLogger(__name__)
+
+UP = 'up'
+DEGRADED = 'degraded'
+DOWN = 'down'
+GONE = 'gone'
+FLAPPING = 'flapping'
+
+# Reconnect a stream that sent nothing (not even a keep-alive) for this long
+STREAM_IDLE_TIMEOUT = 300.0
+
+ALERT_LINES = {
+    UP: "🟢 {name} is up",
+    DEGRADED: "🟡 {name} is degraded ({running}/{total} containers)",
+    DOWN: "🔴 {name} is down",
+    GONE: "⚪ {name} was removed",
+    FLAPPING: "🟠 {name} is flapping ({count} changes in {window:.0f}s)",
+}
+
+panel_alerts_sent = metrics.counter(
+    'telebot_panel_alerts_total', 'Container state changes reported to the approved chats', ('state',)
+)
+
+
+class StreamUnavailable(Exception):
+    """The backend does not offer a change stream."""
+
+
+def app_state(app: dict) -> tuple:
+    """(state, running, total) of one /apps entry."""
+    running = app.get('running_count', 0)
+    total = app.get('total_count', 0)
+    if not app.get('status') or (total and not running):
+        return DOWN, running, total
+    if running < total:
+        return DEGRADED, running, total
+    return UP, running, total
+
+
+class PanelAlerts:
+    """Tracks every app's state and reports confirmed changes."""
+
+    def __init__(self, chats, debounce: float, flap_count: int, flap_window: float, batch_delay: float):
+        self.chats = tuple(chats)
+        self.debounce = debounce
+        self.flap_count = flap_count
+        self.flap_window = flap_window
+        self.batch_delay = batch_delay
+        self.bot = None
+        self.confirmed = {}  # name -> state last reported (or found at startup)
+        self._observed = {}  # name -> state last seen
+        self._pending = {}  # name -> (state, running, total, since)
+        self._flaps = {}  # name -> [window start, changes, reported]
+        self._outbox = []  # (name, state, details) waiting for the next batch
+        self._flush_handle = None
+        self._task = None
+        self._sends = set()
+
+    # --- lifecycle ---
+
+    def start(self, bot) -> None:
+        if self._task is None and self.chats:
+            self.bot = bot
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        await asyncio.gather(self._task, *self._sends, return_exceptions=True)
+        self._task = None
+
+    # --- change detection ---
+
+    def observe(self, apps: list, complete: bool = False) -> None:
+        """Feed app entries from /apps or the stream.
+
+        ``complete`` means ``apps`` is the full list, so missing apps are gone.
+        The first complete list is the baseline and reports nothing.
+        """
+        if not complete and not self._observed:
+            # No baseline yet to compare with
+            return
+        now = time.monotonic()
+        baseline = complete and not self._observed
+        seen = set()
+        for app in apps:
+            name = app['name']
+            seen.add(name)
+            state, running, total = app_state(app)
+            if baseline:
+                self.confirmed[name] = self._observed[name] = state
+            else:
+                self._update(name, state, running, total, now)
+        if complete:
+            for name in [name for name in self._observed if name not in seen]:
+                self._update(name, GONE, 0, 0, now)
+
+    def _update(self, name: str, state: str, running: int, total: int, now: float) -> None:
+        previous = self._observed.get(name)
+        self._observed[name] = state
+        if previous is not None and state != previous:
+            self._count_change(name, now)
+        if state == self.confirmed.get(name):
+            self._pending.pop(name, None)
+            return
+        pending = self._pending.get(name)
+        if pending is None or pending[0] != state:
+            self._pending[name] = (state, running, total, now)
+            asyncio.get_running_loop().call_later(self.debounce, self._settle)
+        else:
+            # Same state, newer container counts
+            self._pending[name] = (state, running, total, pending[3])
+
+    def _count_change(self, name: str, now: float) -> None:
+        flaps = self._flaps.get(name)
+        if flaps is None or now - flaps[0] >= self.flap_window:
+            flaps = self._flaps[name] = [now, 0, False]
+        flaps[1] += 1
+        if flaps[1] >= self.flap_count and not flaps[2]:
+            flaps[2] = True
+            self._queue(name, FLAPPING, {'count': flaps[1], 'window': now - flaps[0]})
+            # Whatever it settles in is news, even the state it had before
+            self.confirmed.pop(name, None)
+
+    def _settle(self) -> None:
+        now = time.monotonic()
+        for name, (state, running, total, since) in list(self._pending.items()):
+            if now - since >= self.debounce - 0.001:
+                del self._pending[name]
+                self.confirmed[name] = state
+                self._queue(name, state, {'running': running, 'total': total})
+
+    def _queue(self, name: str, state: str, details: dict) -> None:
+        self._outbox.append((name, state, details))
+        if self._flush_handle is None:
+            # Let changes confirmed close together share one message
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_delay, self._flush)
+
+    # --- fan-out ---
+
+    def _flush(self) -> None:
+        self._flush_handle = None
+        outbox, self._outbox = self._outbox, []
+        if not outbox or self._task is None:
+            return
+        lines = ["🚨 Panel alert", ""]
+        for name, state, details in sorted(outbox, key=lambda item: item[0]):
+            panel_alerts_sent.inc(state)
+            lines.append(ALERT_LINES[state].format(name=name, **details))
+        task = asyncio.create_task(self._send_all("\n".join(lines)))
+        self._sends.add(task)
+        task.add_done_callback(self._sends.discard)
+
+    async def _send_all(self, text: str) -> None:
+        use_background_lane()
+        # One pass over every chat; the rate limiter paces it behind interactive replies
+        results = await asyncio.gather(
+            *(self.bot.send_message(chat_id=chat_id, text=text) for chat_id in self.chats),
+            return_exceptions=True
+        )
+        for chat_id, result in zip(self.chats, results):
+            if isinstance(result, Exception):
+                logger.error(f"Could not send panel alert to chat {chat_id}: {result}")
+
+    # --- sources ---
+
+    async def _run(self) -> None:
+        use_background_lane()
+        stream_retry_at = 0.0
+        while True:
+            if PANEL_EVENTS_PATH and time.monotonic() >= stream_retry_at:
+                try:
+                    await self._follow_stream()
+                    logger.info("Panel event stream ended; reconnecting")
+                except StreamUnavailable as e:
+                    logger.info(f"{e}; polling /apps every {PANEL_ALERT_POLL_INTERVAL:.0f}s instead")
+                    stream_retry_at = time.monotonic() + PANEL_ALERT_STREAM_RETRY
+                except httpx.ReadTimeout:
+                    logger.info("Panel event stream went quiet; reconnecting")
+                except Exception as e:
+                    logger.warning(f"Panel event stream failed: {e!r}")
+            # Without a stream (or between reconnects) diff the full list
+            try:
+                self.observe(await fetch_app_status(), complete=True)
+            except Exception as e:
+                logger.warning(f"Panel alerts could not fetch the app list: {e}")
+            await asyncio.sleep(PANEL_ALERT_POLL_INTERVAL)
+
+    async def _follow_stream(self) -> None:
+        """Consume the SSE stream until the backend closes it."""
+        timeout = httpx.Timeout(PANEL_APPS_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT, read=STREAM_IDLE_TIMEOUT)
+        async with http_client.stream(
+            'GET', f"{PANEL_API_URL}{PANEL_EVENTS_PATH}", dependency="panel", operation="events",
+            timeout=timeout, headers={'Accept': 'text/event-stream'}
+        ) as response:
+            if response.status_code in (404, 405, 501):
+                raise StreamUnavailable(f"The panel has no event stream (HTTP {response.status_code})")
+            response.raise_for_status()
+            logger.info("Following the panel event stream")
+            # The list may have changed between the fetch and the connect
+            self.observe(await fetch_app_status(), complete=True)
+            data = []
+            async for line in response.aiter_lines():
+                if line.startswith('data:'):
+                    data.append(line[5:].lstrip())
+                elif not line and data:
+                    self._event("\n".join(data))
+                    data = []
+
+    def _event(self, data: str) -> None:
+        try:
+            event = json.loads(data)
+            apps = event if isinstance(event, list) else [event]
+            self.observe([app for app in apps if isinstance(app, dict) and 'name' in app])
+        except (ValueError, KeyError, TypeError) as e:
+            # One bad frame must not drop the stream
+            logger.warning(f"Ignoring malformed panel event {data[:200]!r}: {e!r}")
+            return
+        # Panel views should not show the list from before this change
+        app_status_cache.invalidate()
+
+
+# Global panel alerts instance
+panel_alerts = PanelAlerts(
+    sorted(APPROVE_IDS), PANEL_ALERT_DEBOUNCE, PANEL_ALERT_FLAP_COUNT, PANEL_ALERT_FLAP_WINDOW, PANEL_ALERT_BATCH_DELAY
+)
@@ -0,0 +1,101 @@
+"""
+Bulk start/stop actions for the Docker control panel.
+"""
+import asyncio
+import logging
+import time
+from config import PANEL_BULK_CONCURRENCY, PANEL_BULK_TIMEOUT, PANEL_PROGRESS_INTERVAL
+from utils.panel_api import HIDDEN_APPS, toggle_app_status
+
+logger = logging.getLogger(__name__)
+
+
+def select_targets(apps: list, action: str) -> list:
+    """Pick the app names a bulk action has to toggle.
+
+    'start' toggles stopped apps and 'stop' toggles running ones; apps
+    without containers and the bot's own stacks are left alone.
+    """
+    want_running = action == 'start'
+    return [
+        app['name'] for app in apps
+        if app['name'] not in HIDDEN_APPS
+        and app['total_count'] > 0
+        and bool(app['status']) != want_running
+    ]
+
+
+async def _toggle_limited(semaphore: asyncio.Semaphore, app_name: str) -> tuple:
+    """Toggle one app under the concurrency limit and a hard per-app timeout."""
+    async with semaphore:
+        try:
+            result = await asyncio.wait_for(
+                toggle_app_status(app_name, timeout=PANEL_BULK_TIMEOUT),
+                timeout=PANEL_BULK_TIMEOUT
+            )
+        except asyncio.TimeoutError:
+            result = {'success': False, 'error': f'timed out after {PANEL_BULK_TIMEOUT:g}s'}
+    return app_name, result
+
+
+def _render_progress(title: str, total: int, succeeded: list, failed: dict, done: bool) -> str:
+    """Build the progress / summary text for a bulk action."""
+    finished = len(succeeded) + len(failed)
+    if done:
+        text = f"✅ {title}: {len(succeeded)} succeeded, {len(failed)} failed"
+    else:
+        text = f"⏳ {title}: {finished}/{total} done"
+    if succeeded:
+        text += "\n\n🟢 " + ", ".join(succeeded)
+    if failed:
+        text += "\n\n❌ Failed:\n" + "\n".join(f"• {name}: {error}" for name, error in failed.items())
+    return text
+
+
+async def run_bulk_action(bot, chat_id: int, title: str, app_names: list) -> tuple:
+    """Toggle apps concurrently, reporting progress in a single message.
+
+    Returns the list of succeeded app names and a dict of failures.
+    """
+    succeeded = []
+    failed = {}
+    if not app_names:
+        await bot.send_message(chat_id=chat_id, text=f"ℹ️ {title}: nothing to do")
+        return succeeded, failed
+
+    progress = await bot.send_message(
+        chat_id=chat_id,
+        text=_render_progress(title, len(app_names), succeeded, failed, done=False)
+    )
+    logger.info(f"{title}: toggling {len(app_names)} apps")
+
+    semaphore = asyncio.Semaphore(PANEL_BULK_CONCURRENCY)
+    tasks = [asyncio.create_task(_toggle_limited(semaphore, name)) for name in app_names]
+    last_edit = time.monotonic()
+    for next_done in asyncio.as_completed(tasks):
+        app_name, result = await next_done
+        if result['success']:
+            succeeded.append(app_name)
+        else:
+            failed[app_name] = result.get('error', 'unknown error')
+
+        remaining = len(app_names) - len(succeeded) - len(failed)
+        if remaining and time.monotonic() - last_edit >= PANEL_PROGRESS_INTERVAL:
+            last_edit = time.monotonic()
+            try:
+                await progress.edit_text(_render_progress(title, len(app_names), succeeded, failed, done=False))
+            except Exception as e:
+                logger.warning(f"Could not update bulk progress: {e}")
+
+    summary = _render_progress(title, len(app_names), succeeded, failed, done=True)
+    try:
+        await progress.edit_text(summary)
+    except Exception as e:
+        # The summary must not get lost with the progress message (deleted, too old to edit...)
+        logger.warning(f"Could not edit bulk summary, sending it instead: {e}")
+        try:
+            await progress.reply_text(summary)
+        except Exception as e:
+            logger.error(f"Could not send bulk summary: {e}")
+    logger.info(f"{title}: {len(succeeded)} succeeded, {len(failed)} failed")
+    return succeeded, failed
@@ -0,0 +1,150 @@
+"""
+Live-updating panel messages.
+
+A live session polls the panel backend in the background and edits its
+message only when the app list actually changes.
+"""
+import asyncio
+import logging
+import time
+from telegram.error import BadRequest
+from utils.rate_limiter import use_background_lane
+from config import PANEL_LIVE_INTERVAL, PANEL_LIVE_DEBOUNCE, PANEL_LIVE_IDLE_TIMEOUT
+
+logger = logging.getLogger(__name__)
+
+# Give up debouncing after this many consecutive changing polls
+MAX_DEBOUNCE_ROUNDS = 5
+
+
+def app_snapshot(apps: list) -> tuple:
+    """Reduce an app list to the fields that are shown to the user."""
+    return tuple(sorted(
+        (app['name'], bool(app['status']), app['running_count'], app['total_count'])
+        for app in apps
+    ))
+
+
+class LiveSession:
+    """Keeps one panel message in sync with the backend until it goes idle."""
+
+    def __init__(self, bot, chat_id: int, message_id: int, fetch, render):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.message_id = message_id
+        self.fetch = fetch
+        self.render = render
+        self.snapshot = None
+        self.rendered = None  # (text, reply_markup) last sent by this session
+        self.last_activity = time.monotonic()
+        self.task = None
+
+    def touch(self) -> None:
+        """Record user interaction, postponing the idle timeout."""
+        self.last_activity = time.monotonic()
+
+    def mark_rendered(self, apps: list) -> None:
+        """Remember what the message currently shows."""
+        self.snapshot = app_snapshot(apps)
+
+    async def _settle(self, apps: list) -> list:
+        """Wait until the app list stops changing so a burst becomes one edit."""
+        snapshot = app_snapshot(apps)
+        for _ in range(MAX_DEBOUNCE_ROUNDS):
+            await asyncio.sleep(PANEL_LIVE_DEBOUNCE)
+            latest = await self.fetch()
+            latest_snapshot = app_snapshot(latest)
+            apps = latest
+            if latest_snapshot == snapshot:
+                break
+            snapshot = latest_snapshot
+        return apps
+
+    async def _edit(self, apps: list, live: bool) -> None:
+        rendered = self.render(apps, live=live)
+        if rendered == self.rendered:
+            # Changes on other pages can leave the visible page as it was
+            self.mark_rendered(apps)
+            return
+        text, reply_markup = rendered
+        await self.bot.edit_message_text(
+            text,
+            chat_id=self.chat_id,
+            message_id=self.message_id,
+            reply_markup=reply_markup,
+            parse_mode='Markdown'
+        )
+        self.rendered = rendered
+        self.mark_rendered(apps)
+
+    async def run(self) -> None:
+        """Poll, diff and edit until idle or cancelled."""
+        use_background_lane()
+        apps = []
+        try:
+            while time.monotonic() - self.last_activity < PANEL_LIVE_IDLE_TIMEOUT:
+                await asyncio.sleep(PANEL_LIVE_INTERVAL)
+                apps = await self.fetch()
+                if not apps or app_snapshot(apps) == self.snapshot:
+                    continue
+                apps = await self._settle(apps)
+                if app_snapshot(apps) != self.snapshot:
+                    await self._edit(apps, live=True)
+
+            # Idle: show the final state without the live marker
+            logger.info(f"Live panel {self.chat_id}/{self.message_id} stopped after idle timeout")
+            apps = apps or await self.fetch()
+            if apps:
+                await self._edit(apps, live=False)
+        except BadRequest as e:
+            # The message was deleted or replaced; nothing left to update
+            logger.info(f"Live panel {self.chat_id}/{self.message_id} stopped: {e}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Live panel {self.chat_id}/{self.message_id} failed: {e}")
+        finally:
+            if live_sessions.get((self.chat_id, self.message_id)) is self:
+                del live_sessions[(self.chat_id, self.message_id)]
+
+
+# (chat_id, message_id) -> LiveSession
+live_sessions = {}
+
+
+def get_live_session(chat_id: int, message_id: int):
+    """Return the live session for a message, if any."""
+    return live_sessions.get((chat_id, message_id))
+
+
+def start_live_session(bot, chat_id: int, message_id: int, fetch, render, apps: list) -> LiveSession:
+    """Start (or refresh) live mode for a panel message showing ``apps``."""
+    session = live_sessions.get((chat_id, message_id))
+    if session is None:
+        session = LiveSession(bot, chat_id, message_id, fetch, render)
+        live_sessions[(chat_id, message_id)] = session
+        session.task = asyncio.create_task(session.run())
+    # The user may have switched pages since the session started
+    session.render = render
+    session.rendered = None
+    session.touch()
+    session.mark_rendered(apps)
+    return session
+
+
+def stop_live_session(chat_id: int, message_id: int) -> bool:
+    """Stop live mode for a message. Returns True if it was live."""
+    session = live_sessions.pop((chat_id, message_id), None)
+    if session is None:
+        return False
+    session.task.cancel()
+    return True
+
+
+async def stop_all_live_sessions() -> None:
+    """Cancel every live session. Called at shutdown."""
+    sessions = list(live_sessions.values())
+    live_sessions.clear()
+    for session in sessions:
+        session.task.cancel()
+    await asyncio.gather(*(session.task for session in sessions), return_exceptions=True)
@@ -0,0 +1,331 @@
+"""
+Log viewing and restart for panel apps via async docker compose subprocesses.
+"""
+import asyncio
+import logging
+import time
+from collections import deque
+from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup
+from telegram.ext import ContextTypes
+from config import (
+    APPROVE_IDS, PANEL_COMPOSE_COMMAND, PANEL_RESTART_TIMEOUT, PANEL_LOGS_TIMEOUT,
+    PANEL_LOG_EDIT_INTERVAL, PANEL_LOG_FOLLOW_TIMEOUT, PANEL_LOG_BUFFER_CHARS
+)
+from utils.panel_api import get_app_status
+from utils.rate_limiter import use_background_lane
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit is 4096; keep room for the skipped-lines note
+MAX_CHUNK_LENGTH = 4000
+MAX_LINE_LENGTH = 1000
+STREAM_LIMIT = 1024 * 1024
+
+STOP_FOLLOW_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("⏹ Stop following", callback_data="logs_stop")]
+])
+
+
+async def find_app(app_name: str) -> dict:
+    """Look up an app by name in the backend's app list."""
+    for app in await get_app_status():
+        if app['name'] == app_name:
+            return app
+    return None
+
+
+async def _spawn(folder: str, *args: str) -> asyncio.subprocess.Process:
+    """Start ``docker compose <args>`` in the app's folder without touching our own cwd."""
+    return await asyncio.create_subprocess_exec(
+        *PANEL_COMPOSE_COMMAND, *args,
+        cwd=folder,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.STDOUT,
+        limit=STREAM_LIMIT
+    )
+
+
+async def _terminate(process: asyncio.subprocess.Process) -> None:
+    """Stop a subprocess, escalating to SIGKILL if it ignores SIGTERM."""
+    if process.returncode is not None:
+        return
+    try:
+        process.terminate()
+        await asyncio.wait_for(process.wait(), timeout=5)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+    except ProcessLookupError:
+        pass
+
+
+def _decode(line: bytes) -> str:
+    text = line.decode(errors='replace').rstrip()
+    if len(text) > MAX_LINE_LENGTH:
+        text = text[:MAX_LINE_LENGTH] + "…"
+    return text
+
+
+class TailBuffer:
+    """Keeps only the most recent lines that fit in a character budget."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.lines = deque()
+        self.chars = 0
+        self.dropped = 0
+
+    def append(self, line: str) -> None:
+        self.lines.append(line)
+        self.chars += len(line) + 1
+        while self.chars > self.max_chars and len(self.lines) > 1:
+            self.chars -= len(self.lines.popleft()) + 1
+            self.dropped += 1
+
+    def drain(self) -> tuple:
+        """Return (lines, dropped count) and reset the buffer."""
+        lines, dropped = list(self.lines), self.dropped
+        self.lines.clear()
+        self.chars = 0
+        self.dropped = 0
+        return lines, dropped
+
+
+async def _read_tail(process: asyncio.subprocess.Process, tail: TailBuffer) -> int:
+    """Read a subprocess's output into ``tail`` until it exits; returns its exit code."""
+    while True:
+        line = await process.stdout.readline()
+        if not line:
+            break
+        tail.append(_decode(line))
+    return await process.wait()
+
+
+async def get_app_logs(app_name: str, lines: int = 50, timeout: float = PANEL_LOGS_TIMEOUT) -> str:
+    """Get recent logs for a specific app."""
+    process = None
+    try:
+        app = await find_app(app_name)
+        if app is None:
+            return f"App {app_name} not found"
+
+        process = await _spawn(app['folder'], 'logs', '--no-color', '--tail', str(lines))
+        tail = TailBuffer(MAX_CHUNK_LENGTH)
+        returncode = await asyncio.wait_for(_read_tail(process, tail), timeout=timeout)
+
+        output, dropped = tail.drain()
+        text = "\n".join(output)
+        if returncode != 0:
+            return f"Error getting logs: {text}"
+        if dropped:
+            text = f"… {dropped} earlier lines omitted\n{text}"
+        return text or "(no log output)"
+    except asyncio.TimeoutError:
+        logger.error(f"Getting logs for {app_name} timed out after {timeout:g}s")
+        await _terminate(process)
+        return f"Error: timed out after {timeout:g}s"
+    except Exception as e:
+        logger.error(f"Error getting logs for {app_name}: {e}")
+        return f"Error: {str(e)}"
+
+
+async def restart_app(app_name: str) -> dict:
+    """Restart a Docker Compose app."""
+    process = None
+    try:
+        app = await find_app(app_name)
+        if app is None:
+            return {'success': False, 'error': f'App {app_name} not found'}
+
+        logger.info(f"Restarting app: {app_name}")
+        process = await _spawn(app['folder'], 'restart')
+        stdout, _ = await asyncio.wait_for(process.communicate(), timeout=PANEL_RESTART_TIMEOUT)
+        output = stdout.decode(errors='replace')[-MAX_CHUNK_LENGTH:]
+
+        if process.returncode == 0:
+            logger.info(f"Successfully restarted {app_name}")
+            return {'success': True, 'action': 'restarted'}
+        else:
+            logger.error(f"Failed to restart {app_name}: {output}")
+            return {'success': False, 'error': output}
+
+    except asyncio.TimeoutError:
+        logger.error(f"Restarting {app_name} timed out after {PANEL_RESTART_TIMEOUT:g}s")
+        await _terminate(process)
+        return {'success': False, 'error': f'timed out after {PANEL_RESTART_TIMEOUT:g}s'}
+    except Exception as e:
+        logger.error(f"Error restarting app {app_name}: {e}")
+        return {'success': False, 'error': str(e)}
+
+
+class LogFollower:
+    """Streams ``docker compose logs -f`` into a chat.
+
+    Lines are batched into messages that fit Telegram's size limit; the
+    current message is edited at most every PANEL_LOG_EDIT_INTERVAL and a
+    new one is appended when it fills up. Only a bounded tail of unsent
+    lines is held in memory.
+    """
+
+    def __init__(self, bot, chat_id: int, app_name: str):
+        self.bot = bot
+        self.chat_id = chat_id
+        self.app_name = app_name
+        self.process = None
+        self.message = None
+        self.text = ""
+        self.buffer = TailBuffer(PANEL_LOG_BUFFER_CHARS)
+        self.task = None
+
+    async def _read(self) -> None:
+        while True:
+            line = await self.process.stdout.readline()
+            if not line:
+                return
+            self.buffer.append(_decode(line))
+
+    async def _publish(self, final: bool = False) -> None:
+        """Move buffered lines into the current message, starting new ones as needed."""
+        lines, dropped = self.buffer.drain()
+        if dropped:
+            lines.insert(0, f"… {dropped} lines skipped")
+        if not lines and not final:
+            return
+
+        reply_markup = None if final else STOP_FOLLOW_KEYBOARD
+        for line in lines:
+            if self.text and len(self.text) + len(line) + 1 > MAX_CHUNK_LENGTH:
+                # Freeze the full message and continue in a new one
+                await self.message.edit_text(self.text)
+                self.message = await self.bot.send_message(self.chat_id, line, reply_markup=reply_markup)
+                self.text = line
+            else:
+                self.text = f"{self.text}\n{line}" if self.text else line
+
+        text = self.text + ("\n\n⏹ Stopped following" if final else "")
+        if self.message is None:
+            self.message = await self.bot.send_message(self.chat_id, text, reply_markup=reply_markup)
+        else:
+            await self.message.edit_text(text, reply_markup=reply_markup)
+
+    async def run(self, tail: int) -> None:
+        use_background_lane()
+        try:
+            app = await find_app(self.app_name)
+            if app is None:
+                await self.bot.send_message(self.chat_id, f"App {self.app_name} not found")
+                return
+            await self._follow(app['folder'], tail)
+        finally:
+            if followers.get(self.chat_id) is self:
+                del followers[self.chat_id]
+
+    async def _follow(self, folder: str, tail: int) -> None:
+        self.process = await _spawn(folder, 'logs', '-f', '--no-color', '--tail', str(tail))
+        reader = asyncio.create_task(self._read())
+        deadline = time.monotonic() + PANEL_LOG_FOLLOW_TIMEOUT
+        try:
+            self.text = f"📜 {self.app_name} logs (following)"
+            self.message = await self.bot.send_message(self.chat_id, self.text, reply_markup=STOP_FOLLOW_KEYBOARD)
+            while not reader.done() and time.monotonic() < deadline:
+                await asyncio.wait({reader}, timeout=PANEL_LOG_EDIT_INTERVAL)
+                await self._publish()
+        except Exception as e:
+            logger.error(f"Error following logs for {self.app_name}: {e}")
+        finally:
+            reader.cancel()
+            await _terminate(self.process)
+            try:
+                await self._publish(final=True)
+            except Exception as e:
+                logger.warning(f"Could not finalize log message for {self.app_name}: {e}")
+
+
+# chat_id -> LogFollower; one followed app per chat
+followers = {}
+
+
+async def stop_following(chat_id: int) -> bool:
+    """Stop the log follower in a chat. Returns True if one was running."""
+    follower = followers.pop(chat_id, None)
+    if follower is None:
+        return False
+    follower.task.cancel()
+    await asyncio.gather(follower.task, return_exceptions=True)
+    return True
+
+
+async def stop_all_followers() -> None:
+    """Stop every log follower and its subprocess. Called at shutdown."""
+    for chat_id in list(followers):
+        await stop_following(chat_id)
+
+
+def _parse_app_args(context: ContextTypes.DEFAULT_TYPE, default_lines: int) -> tuple:
+    """Return (app name, line count) from command arguments."""
+    app_name = context.args[0] if context.args else None
+    lines = default_lines
+    if len(context.args) > 1 and context.args[1].isdigit():
+        lines = int(context.args[1])
+    return app_name, lines
+
+
+async def logs_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /logs <app> [lines] command."""
+    if update.effective_user.id not in APPROVE_IDS:
+        return
+    app_name, lines = _parse_app_args(context, 50)
+    if app_name is None:
+        await update.message.reply_text("Usage: /logs <app> [lines]")
+        return
+    logs = await get_app_logs(app_name, lines)
+    await update.message.reply_text(logs[-MAX_CHUNK_LENGTH:])
+
+
+async def follow_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /follow <app> [lines] command - stream logs until stopped."""
+    if update.effective_user.id not in APPROVE_IDS:
+        return
+    app_name, lines = _parse_app_args(context, 20)
+    if app_name is None:
+        await update.message.reply_text("Usage: /follow <app> [lines]")
+        return
+    chat_id = update.effective_chat.id
+    await stop_following(chat_id)
+    follower = LogFollower(context.bot, chat_id, app_name)
+    followers[chat_id] = follower
+    follower.task = asyncio.create_task(follower.run(lines))
+
+
+async def restart_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /restart <app> command."""
+    if update.effective_user.id not in APPROVE_IDS:
+        return
+    app_name, _ = _parse_app_args(context, 0)
+    if app_name is None:
+        await update.message.reply_text("Usage: /restart <app>")
+        return
+    await update.message.reply_text(f"🔁 Restarting {app_name}…")
+    # A restart can take minutes; don't hold up this user's other updates
+    context.application.create_task(_restart_and_report(update.message, app_name))
+
+
+async def _restart_and_report(message, app_name: str) -> None:
+    """Restart an app and reply to the /restart message with the outcome."""
+    use_background_lane()
+    result = await restart_app(app_name)
+    try:
+        if result['success']:
+            await message.reply_text(f"✅ {app_name} restarted")
+        else:
+            await message.reply_text(f"❌ Failed to restart {app_name}:\n{result['error']}")
+    except Exception as e:
+        logger.error(f"Could not report the restart of {app_name}: {e}")
+
+
+async def handle_logs_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle the stop button on a followed log message."""
+    query = update.callback_query
+    await query.answer()
+    if not await stop_following(query.message.chat_id):
+        await query.edit_message_reply_markup(reply_markup=None)
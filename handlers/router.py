@@ -0,0 +1,55 @@
+"""
+Precompiled text message router.
+"""
+from telegram import Update
+from telegram.ext import ContextTypes
+
+
+async def echo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Echo the message back as default behavior."""
+    await update.message.reply_text(update.message.text)
+
+
+class MessageRouter:
+    """Routes text messages with constant-time table lookups.
+
+    Approved users get keyboard buttons (exact label), aliases
+    (case-insensitive) and then their current state's handler.
+    Everyone else, and anything unmatched, falls through to the default.
+    """
+
+    def __init__(self, approved_ids, state_lookup, default=echo):
+        self.approved_ids = frozenset(approved_ids)
+        self.state_lookup = state_lookup
+        self.default = default
+        self.buttons = {}
+        self.aliases = {}
+        self.states = {}
+
+    def add_button(self, label: str, handler) -> None:
+        """Route an exact keyboard button label to a handler."""
+        self.buttons[label] = handler
+
+    def add_alias(self, text: str, handler) -> None:
+        """Route a case-insensitive keyword to a handler."""
+        self.aliases[text.lower()] = handler
+
+    def add_state(self, state: str, handler) -> None:
+        """Route messages from users in a given state to a handler."""
+        self.states[state] = handler
+
+    def resolve(self, user_id: int, text: str):
+        """Return the handler for a message without running it."""
+        if user_id not in self.approved_ids:
+            return self.default
+        handler = self.buttons.get(text)
+        if handler is None:
+            handler = self.aliases.get(text.lower())
+        if handler is None:
+            handler = self.states.get(self.state_lookup(user_id), self.default)
+        return handler
+
+    async def dispatch(self, update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+        """Run the handler for an incoming text message."""
+        handler = self.resolve(update.effective_user.id, update.message.text)
+        await handler(update, context)
@@ -1,54 +1,203 @@
 """
 URL shortening functionality.
 """
+import asyncio
 import logging
+from concurrent.futures import ThreadPoolExecutor
 import pyshorteners
 from telegram import Update
 from telegram.ext import ContextTypes
-from utils.keyboards import get_main_keyboard
+from config import (
+    SHORTEN_CACHE_SIZE, SHORTEN_CACHE_TTL, SHORTEN_CACHE_PATH, SHORTEN_WORKERS,
+    SHORTEN_PROVIDERS, SHORTEN_HEDGE_DELAY, SHORTEN_TIMEOUT,
+    SHORTEN_BATCH_MAX, SHORTEN_BATCH_CONCURRENCY
+)
+from utils.keyboards import MAIN_KEYBOARD_PAYLOAD
+from utils.render_cache import RenderedReply
+from utils.lru_cache import LRUTTLCache
+from utils.metrics import metrics
+from utils.short_links import make_short_code, short_url
 from utils.state_manager import state_manager
-from utils.validators import is_valid_url
+from utils.validators import extract_urls, normalize_url
 
 # Initialize logger and URL shortener
 logger = logging.getLogger(__name__)
-shortener = pyshorteners.Shortener()
+shortener = pyshorteners.Shortener(timeout=SHORTEN_TIMEOUT)
+
+# Telegram rejects messages longer than this
+MAX_MESSAGE_LENGTH = 4096
+
+# Normalized URL -> short URL (or LOCAL_PREFIX + code for local links), shared by all users
+url_cache = LRUTTLCache(SHORTEN_CACHE_SIZE, SHORTEN_CACHE_TTL, SHORTEN_CACHE_PATH)
+
+# pyshorteners is blocking, so upstream calls run on a bounded thread pool
+_executor = ThreadPoolExecutor(max_workers=SHORTEN_WORKERS, thread_name_prefix="shortener")
+
+# Upstream calls in progress, keyed by normalized URL
+_in_flight = {}
+
+# SHORTEN_PROVIDERS name of the self-hosted links in utils.short_links
+LOCAL_PROVIDER = 'local'
+# Local links are cached as a code and built on SHORT_LINK_BASE_URL when shown
+LOCAL_PREFIX = f"{LOCAL_PROVIDER}:"
 
 # State constants
 WAITING_FOR_URL = 'waiting_for_url'
 
+SHORTEN_PROMPT_REPLY = RenderedReply(
+    "Please send me one or more URLs to shorten (e.g., https://example.com)\n\n"
+    "Tip: Use the 'Cancel' button or type /cancel to exit this mode."
+)
+
+INVALID_URL_REPLY = RenderedReply(
+    "That doesn't look like a valid URL. Please send a URL starting with http:// or https://"
+)
+
+SHORTEN_FAILED_REPLY = RenderedReply(
+    "Sorry, I couldn't shorten that URL. Please make sure it's a valid URL and try again."
+)
+
+def load_url_cache() -> None:
+    """Restore the persisted URL cache. Called when the module is first imported."""
+    url_cache.load()
+
+load_url_cache()
+
+def close_url_shortener() -> None:
+    """Persist the URL cache and stop the worker threads. Called at shutdown."""
+    url_cache.save()
+    _executor.shutdown(wait=False, cancel_futures=True)
+
+def _provider_short(provider: str, url: str) -> str:
+    """Blocking call to one pyshorteners provider. Runs on the thread pool."""
+    if provider == LOCAL_PROVIDER:
+        return LOCAL_PREFIX + make_short_code(url)
+    with metrics.track('shortener', provider):
+        return getattr(shortener, provider).short(url)
+
+async def _shorten_hedged(url: str) -> str:
+    """Ask the primary provider first and hedge with the next one
+    whenever the current attempts are slow or failing."""
+    loop = asyncio.get_running_loop()
+    providers = iter(SHORTEN_PROVIDERS)
+    first = next(providers)
+    pending = {loop.run_in_executor(_executor, _provider_short, first, url)}
+    last_error = None
+
+    while pending:
+        done, pending = await asyncio.wait(
+            pending, timeout=SHORTEN_HEDGE_DELAY, return_when=asyncio.FIRST_COMPLETED
+        )
+        for future in done:
+            if future.exception() is None:
+                for other in pending:
+                    other.cancel()
+                return future.result()
+            last_error = future.exception()
+            logger.warning(f"Shortening provider failed for {url}: {last_error}")
+
+        # Either every attempt so far is slow or one failed: bring in the next provider
+        provider = next(providers, None)
+        if provider is not None:
+            logger.info(f"Hedging {url} with {provider}")
+            pending.add(loop.run_in_executor(_executor, _provider_short, provider, url))
+
+    raise last_error
+
+def _public_url(shortened: str) -> str:
+    """Turn a cached result into the URL shown to the user."""
+    if shortened.startswith(LOCAL_PREFIX):
+        return short_url(shortened[len(LOCAL_PREFIX):])
+    return shortened
+
+def _start_upstream(key: str, url: str) -> asyncio.Future:
+    """Start one shared upstream call and cache its result."""
+    future = asyncio.ensure_future(_shorten_hedged(url))
+    _in_flight[key] = future
+
+    def _done(f: asyncio.Future) -> None:
+        _in_flight.pop(key, None)
+        if not f.cancelled() and f.exception() is None:
+            url_cache.set(key, f.result())
+
+    future.add_done_callback(_done)
+    return future
+
+async def shorten_url(url: str) -> str:
+    """Shorten a URL, serving repeats from the cache and
+    collapsing concurrent requests for the same URL into one upstream call."""
+    key = normalize_url(url)
+    shortened = url_cache.get(key)
+    if shortened is not None:
+        return _public_url(shortened)
+
+    if SHORTEN_PROVIDERS[0] == LOCAL_PROVIDER:
+        # A local insert: no thread pool, hedging or request collapsing needed
+        shortened = LOCAL_PREFIX + make_short_code(url)
+        url_cache.set(key, shortened)
+        return _public_url(shortened)
+
+    future = _in_flight.get(key)
+    if future is None:
+        future = _start_upstream(key, url)
+    # Shield so one cancelled waiter does not cancel the shared call
+    return _public_url(await asyncio.shield(future))
+
 async def shorten_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /shorten command."""
     user_id = update.effective_user.id
     state_manager.set_state(user_id, WAITING_FOR_URL)
-    await update.message.reply_text(
-        "Please send me a URL to shorten (e.g., https://example.com)\n\n"
-        "Tip: Use the 'Cancel' button or type /cancel to exit this mode."
-    )
-
-async def handle_url_shortening(update: Update, user_id: int, url: str) -> None:
-    """Handle URL shortening process."""
-    if is_valid_url(url):
+    await update.message.reply_text(**SHORTEN_PROMPT_REPLY.kwargs)
+
+async def _shorten_limited(semaphore: asyncio.Semaphore, url: str):
+    """Shorten one URL of a batch, returning the exception instead of raising."""
+    async with semaphore:
         try:
-            # Shorten the URL using TinyURL
-            shortened_url = shortener.tinyurl.short(url)
-            
-            # Create keyboard to go back to main menu
-            reply_markup = get_main_keyboard()
-            
-            await update.message.reply_text(
-                f"Original URL: {url}\nShortened URL: {shortened_url}",
-                reply_markup=reply_markup
-            )
-            
-            # Reset user state
-            state_manager.clear_state(user_id)
-            
+            return await shorten_url(url)
         except Exception as e:
-            logger.error(f"Error shortening URL: {e}")
-            await update.message.reply_text(
-                "Sorry, I couldn't shorten that URL. Please make sure it's a valid URL and try again."
-            )
+            logger.error(f"Error shortening URL {url}: {e}")
+            return e
+
+def _split_message(lines: list) -> list:
+    """Join lines into as few messages as fit Telegram's length limit."""
+    chunks = []
+    current = ""
+    for line in lines:
+        if current and len(current) + len(line) + 1 > MAX_MESSAGE_LENGTH:
+            chunks.append(current)
+            current = ""
+        current = f"{current}\n{line}" if current else line
+    if current:
+        chunks.append(current)
+    return chunks
+
+async def handle_url_shortening(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle URL shortening process for every URL in the message."""
+    user_id = update.effective_user.id
+    urls = extract_urls(update.message, limit=SHORTEN_BATCH_MAX)
+    if not urls:
+        await update.message.reply_text(**INVALID_URL_REPLY.kwargs)
+        return
+
+    semaphore = asyncio.Semaphore(SHORTEN_BATCH_CONCURRENCY)
+    results = await asyncio.gather(*(_shorten_limited(semaphore, url) for url in urls))
+
+    if all(isinstance(result, Exception) for result in results):
+        await update.message.reply_text(**SHORTEN_FAILED_REPLY.kwargs)
+        return
+
+    if len(urls) == 1:
+        lines = [f"Original URL: {urls[0]}\nShortened URL: {results[0]}"]
     else:
-        await update.message.reply_text(
-            "That doesn't look like a valid URL. Please send a URL starting with http:// or https://"
-        )
\ No newline at end of file
+        lines = [f"Shortened {len(urls)} URLs:"]
+        for index, (url, result) in enumerate(zip(urls, results), start=1):
+            if isinstance(result, Exception):
+                lines.append(f"{index}. {url}\n   ✗ couldn't shorten")
+            else:
+                lines.append(f"{index}. {url}\n   → {result}")
+
+    for chunk in _split_message(lines):
+        await update.message.reply_text(chunk, api_kwargs=MAIN_KEYBOARD_PAYLOAD)
+
+    # Reset user state
+    state_manager.clear_state(user_id)
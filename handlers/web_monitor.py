@@ -1,38 +1,486 @@
 """
 Web monitoring functionality for Telegram bot.
+
+Users watch URLs with /watch; the monitor engine polls them and messages
+the chat when a page really changes.
+
+* A single scheduler keeps watches in a heap ordered by due time, adds
+  jitter to every interval so polls never line up, and runs at most
+  MONITOR_CONCURRENCY polls at once.
+* Polls send If-None-Match / If-Modified-Since, so an unchanged page that
+  supports validators costs one 304. Other pages are reduced to a 64-bit
+  digest of their normalized text; only a different digest is a change.
+* Per watch only the URL, validators, digest and a failure count are kept,
+  in memory and in SQLite.
+
+A watch belongs to the user who added it and reports to the chat it was
+added in.
 """
+import asyncio
+import hashlib
+import heapq
+import logging
+import os
+import random
+import re
+import sqlite3
+import threading
+import time
+from functools import lru_cache
+import httpx
 from telegram import Update
 from telegram.ext import ContextTypes
-from utils.keyboards import get_main_keyboard
-import requests
+from config import (
+    APPROVE_IDS, MONITOR_ENABLED, MONITOR_TUNNEL_NAME, MONITOR_DB_PATH, MONITOR_INTERVAL, MONITOR_JITTER,
+    MONITOR_CONCURRENCY, MONITOR_TIMEOUT, MONITOR_MAX_BYTES, MONITOR_MAX_PER_USER,
+    MONITOR_FAILURE_NOTIFY, MONITOR_FLUSH_INTERVAL, HTTP_CONNECT_TIMEOUT
+)
+from utils.keyboards import MAIN_KEYBOARD
+from utils.metrics import metrics
+from utils.rate_limiter import use_background_lane
+from utils.render_cache import RenderedReply
+from utils.tunnel_registry import tunnel_registry
+from utils.validators import is_valid_url, normalize_url
+
+logger = logging.getLogger(__name__)
+
+# Failing URLs are retried less often, up to this multiple of the interval
+MAX_BACKOFF_FACTOR = 12
+# Bodies larger than this are normalized and hashed off the event loop
+THREAD_HASH_BYTES = 64 * 1024
+
+_NOISE = re.compile(rb'<script\b.*?</script\s*>|<style\b.*?</style\s*>|<!--.*?-->', re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(rb'\s+')
+_TAG_GAP = re.compile(rb' ?([<>]) ?')
+
+monitor_polls = metrics.counter(
+    'telebot_monitor_polls_total', 'Web monitor polls by outcome', ('result',)
+)
+
+
+def content_digest(body: bytes, is_html: bool) -> int:
+    """64-bit digest of a page, ignoring scripts, styles, comments and whitespace changes in HTML."""
+    if is_html:
+        body = _TAG_GAP.sub(rb'\1', _WHITESPACE.sub(b' ', _NOISE.sub(b'', body))).strip()
+    return int.from_bytes(hashlib.blake2b(body, digest_size=8).digest(), 'big', signed=True)
+
+
+class Watch:
+    """One URL watched by one user."""
+
+    __slots__ = ('id', 'user_id', 'chat_id', 'url', 'etag', 'last_modified', 'digest', 'failures', 'due')
+
+    def __init__(self, id: int, user_id: int, chat_id: int, url: str, etag: str = None,
+                 last_modified: str = None, digest: int = None, failures: int = 0):
+        self.id = id
+        self.user_id = user_id
+        self.chat_id = chat_id
+        self.url = url
+        self.etag = etag
+        self.last_modified = last_modified
+        self.digest = digest
+        self.failures = failures
+        self.due = 0.0
+
+    def row(self) -> tuple:
+        return (self.etag, self.last_modified, self.digest, self.failures, self.id)
+
+
+class WatchStore:
+    """SQLite table of watches; every call runs in a worker thread."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+
+    def open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._connection.execute("PRAGMA journal_mode=WAL")
+        self._connection.execute("PRAGMA synchronous=NORMAL")
+        self._connection.execute(
+            "CREATE TABLE IF NOT EXISTS watches ("
+            "id INTEGER PRIMARY KEY, "
+            "user_id INTEGER NOT NULL, "
+            "chat_id INTEGER NOT NULL, "
+            "url TEXT NOT NULL, "
+            "etag TEXT, "
+            "last_modified TEXT, "
+            "digest INTEGER, "
+            "failures INTEGER NOT NULL DEFAULT 0, "
+            "UNIQUE (user_id, url))"
+        )
+
+    def load(self) -> list:
+        rows = self._connection.execute(
+            "SELECT id, user_id, chat_id, url, etag, last_modified, digest, failures FROM watches"
+        ).fetchall()
+        return [Watch(*row) for row in rows]
+
+    def add(self, user_id: int, chat_id: int, url: str) -> int:
+        with self._lock:
+            return self._connection.execute(
+                "INSERT INTO watches (user_id, chat_id, url) VALUES (?, ?, ?)", (user_id, chat_id, url)
+            ).lastrowid
+
+    def remove(self, watch_id: int) -> None:
+        with self._lock:
+            self._connection.execute("DELETE FROM watches WHERE id = ?", (watch_id,))
+
+    def write_batch(self, rows: list) -> None:
+        with self._lock:
+            self._connection.execute("BEGIN")
+            try:
+                self._connection.executemany(
+                    "UPDATE watches SET etag = ?, last_modified = ?, digest = ?, failures = ? WHERE id = ?", rows
+                )
+                self._connection.execute("COMMIT")
+            except Exception:
+                self._connection.execute("ROLLBACK")
+                raise
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+class MonitorEngine:
+    """Schedules and runs the polls of every watch this process owns."""
+
+    def __init__(self, store: WatchStore, interval: float, jitter: float, concurrency: int,
+                 timeout: float, max_bytes: int, flush_interval: float):
+        self.store = store
+        self.interval = interval
+        self.jitter = jitter
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.flush_interval = flush_interval
+        self.watches = {}  # id -> Watch
+        self.by_user = {}  # user_id -> {watch ids}
+        self.bot = None
+        self._heap = []  # (due, watch id); entries whose due no longer matches are skipped
+        self._wake = asyncio.Event()
+        self._slots = None
+        self._dirty = set()
+        self._polls = set()
+        self._client = None
+        self._tasks = ()
+
+    # --- lifecycle ---
+
+    async def start(self, bot, shard: tuple = (0, 1)) -> None:
+        """Load this process's watches and start polling.
+
+        With several webhook workers each owns the watches of the users with
+        ``user_id % count == index``: the worker the front sends their commands to.
+        """
+        if self._tasks:
+            return
+        self.bot = bot
+        index, count = shard
+        await asyncio.to_thread(self.store.open)
+        for watch in await asyncio.to_thread(self.store.load):
+            if watch.user_id % count == index:
+                self._track(watch)
+                # Spread the first round over one interval
+                self._schedule(watch, random.uniform(0, self.interval))
+        self._slots = asyncio.Semaphore(self.concurrency)
+        self._client = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+            timeout=httpx.Timeout(self.timeout, connect=min(self.timeout, HTTP_CONNECT_TIMEOUT)),
+            follow_redirects=True,
+            headers={'User-Agent': 'telebot-monitor/1.0'}
+        )
+        self._tasks = (asyncio.create_task(self._run()), asyncio.create_task(self._flush_loop()))
+        logger.info(f"Web monitor started with {len(self.watches)} watches")
+
+    async def stop(self) -> None:
+        """Stop polling and persist pending changes."""
+        if not self._tasks:
+            return
+        for task in (*self._tasks, *self._polls):
+            task.cancel()
+        await asyncio.gather(*self._tasks, *self._polls, return_exceptions=True)
+        self._tasks = ()
+        await self.flush()
+        await self._client.aclose()
+        await asyncio.to_thread(self.store.close)
+        logger.info("Web monitor stopped")
+
+    # --- watches ---
+
+    def _track(self, watch: Watch) -> None:
+        self.watches[watch.id] = watch
+        self.by_user.setdefault(watch.user_id, set()).add(watch.id)
+
+    def _schedule(self, watch: Watch, delay: float) -> None:
+        watch.due = time.monotonic() + delay
+        heapq.heappush(self._heap, (watch.due, watch.id))
+        if self._heap[0][1] == watch.id:
+            self._wake.set()
+
+    def list(self, user_id: int) -> list:
+        """The user's watches, oldest first."""
+        return [self.watches[watch_id] for watch_id in sorted(self.by_user.get(user_id, ()))]
+
+    async def add(self, user_id: int, chat_id: int, url: str) -> Watch:
+        """Start watching ``url``, reporting to ``chat_id``; raises ValueError if that is not allowed."""
+        if any(watch.url == url for watch in self.list(user_id)):
+            raise ValueError("You are already watching this URL.")
+        if len(self.by_user.get(user_id, ())) >= MONITOR_MAX_PER_USER:
+            raise ValueError(f"You can watch at most {MONITOR_MAX_PER_USER} URLs.")
+        watch_id = await asyncio.to_thread(self.store.add, user_id, chat_id, url)
+        watch = Watch(watch_id, user_id, chat_id, url)
+        self._track(watch)
+        # Take the baseline right away
+        self._schedule(watch, 0)
+        return watch
+
+    async def remove(self, user_id: int, watch_id: int) -> bool:
+        """Stop one of the user's watches. Returns False if the user has no such watch."""
+        if watch_id not in self.by_user.get(user_id, ()):
+            return False
+        self.by_user[user_id].discard(watch_id)
+        del self.watches[watch_id]
+        self._dirty.discard(watch_id)
+        await asyncio.to_thread(self.store.remove, watch_id)
+        return True
+
+    # --- scheduling ---
+
+    def _next_delay(self, watch: Watch) -> float:
+        factor = min(2 ** watch.failures, MAX_BACKOFF_FACTOR) if watch.failures else 1
+        return self.interval * factor * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    async def _run(self) -> None:
+        use_background_lane()
+        while True:
+            now = time.monotonic()
+            while self._heap and self._heap[0][0] <= now:
+                due, watch_id = heapq.heappop(self._heap)
+                watch = self.watches.get(watch_id)
+                if watch is None or watch.due != due:
+                    continue
+                # The global cap: wait here rather than queue thousands of tasks
+                await self._slots.acquire()
+                task = asyncio.create_task(self._poll(watch))
+                self._polls.add(task)
+                task.add_done_callback(self._poll_done)
+            self._wake.clear()
+            timeout = self._heap[0][0] - time.monotonic() if self._heap else None
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def _poll_done(self, task: asyncio.Task) -> None:
+        self._polls.discard(task)
+        self._slots.release()
+
+    # --- polling ---
+
+    async def _fetch(self, watch: Watch):
+        """Return (status, etag, last_modified, body, is_html); body is None for a 304."""
+        headers = {}
+        if watch.etag:
+            headers['If-None-Match'] = watch.etag
+        if watch.last_modified:
+            headers['If-Modified-Since'] = watch.last_modified
+        with metrics.track('monitor', 'poll') as call:
+            async with self._client.stream('GET', watch.url, headers=headers) as response:
+                if response.status_code == 304:
+                    return 304, watch.etag, watch.last_modified, None, False
+                if response.is_error:
+                    call.failed(f"http_{response.status_code // 100}xx")
+                    raise httpx.HTTPStatusError(
+                        f"HTTP {response.status_code}", request=response.request, response=response
+                    )
+                chunks = []
+                size = 0
+                async for chunk in response.aiter_bytes():
+                    chunks.append(chunk)
+                    size += len(chunk)
+                    if size >= self.max_bytes:
+                        # Pages are compared on their first max_bytes
+                        break
+                is_html = 'html' in response.headers.get('Content-Type', '')
+                return (
+                    response.status_code, response.headers.get('ETag'),
+                    response.headers.get('Last-Modified'), b''.join(chunks)[:self.max_bytes], is_html
+                )
+
+    async def _poll(self, watch: Watch) -> None:
+        try:
+            try:
+                status, etag, last_modified, body, is_html = await self._fetch(watch)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                await self._failed(watch, e)
+                return
+            await self._check(watch, etag, last_modified, body, is_html)
+        finally:
+            if watch.id in self.watches:
+                self._schedule(watch, self._next_delay(watch))
+
+    async def _check(self, watch: Watch, etag: str, last_modified: str, body: bytes, is_html: bool) -> None:
+        """Compare a successful poll with the stored state and report a real change."""
+        if watch.failures:
+            if watch.failures >= MONITOR_FAILURE_NOTIFY:
+                await self._notify(watch, f"✅ Reachable again: {watch.url}")
+            watch.failures = 0
+            self._dirty.add(watch.id)
+        if (etag, last_modified) != (watch.etag, watch.last_modified):
+            watch.etag, watch.last_modified = etag, last_modified
+            self._dirty.add(watch.id)
+        if body is None:
+            monitor_polls.inc('not_modified')
+            return
+
+        if len(body) > THREAD_HASH_BYTES:
+            digest = await asyncio.to_thread(content_digest, body, is_html)
+        else:
+            digest = content_digest(body, is_html)
+        if digest == watch.digest:
+            monitor_polls.inc('unchanged')
+            return
+        first = watch.digest is None
+        watch.digest = digest
+        self._dirty.add(watch.id)
+        if first:
+            monitor_polls.inc('baseline')
+            return
+        monitor_polls.inc('changed')
+        await self._notify(watch, f"🔔 Change detected on {watch.url}")
+
+    async def _failed(self, watch: Watch, error: Exception) -> None:
+        monitor_polls.inc('error')
+        watch.failures += 1
+        self._dirty.add(watch.id)
+        logger.warning(f"Web monitor could not fetch {watch.url}: {error!r}")
+        if watch.failures == MONITOR_FAILURE_NOTIFY:
+            await self._notify(
+                watch, f"⚠️ {watch.url} has failed {watch.failures} checks in a row ({type(error).__name__}); "
+                       f"still retrying"
+            )
+
+    async def _notify(self, watch: Watch, text: str) -> None:
+        try:
+            await self.bot.send_message(chat_id=watch.chat_id, text=text, disable_web_page_preview=True)
+        except Exception as e:
+            logger.error(f"Could not notify chat {watch.chat_id} about watch {watch.id}: {e}")
+
+    # --- persistence ---
+
+    async def flush(self) -> None:
+        """Write changed validators, digests and failure counts in one transaction."""
+        if not self._dirty:
+            return
+        rows = [self.watches[watch_id].row() for watch_id in self._dirty if watch_id in self.watches]
+        self._dirty = set()
+        try:
+            await asyncio.to_thread(self.store.write_batch, rows)
+        except Exception as e:
+            logger.error(f"Error saving web monitor state: {e}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+
+# Global monitor engine instance
+monitor_engine = MonitorEngine(
+    WatchStore(MONITOR_DB_PATH), MONITOR_INTERVAL, MONITOR_JITTER, MONITOR_CONCURRENCY,
+    MONITOR_TIMEOUT, MONITOR_MAX_BYTES, MONITOR_FLUSH_INTERVAL
+)
+
 
 # Monitor URL
 def get_url():
-    res = requests.get('http://172.17.0.1:4040/api/tunnels').json()
-    telebot_url = "Not found"
-    for tunnel in res['tunnels']:
-        if tunnel['name'] == 'changeDetection':
-            telebot_url = tunnel['public_url']
-    return telebot_url
+    return tunnel_registry.get(MONITOR_TUNNEL_NAME, "Not found")
+
+
+@lru_cache(maxsize=8)
+def render_monitor_reply(monitor_url: str) -> RenderedReply:
+    """Render the monitor reply once per tunnel URL."""
+    return RenderedReply(
+        f"🌐 **Web Monitor**\n\nMonitoring URL: {monitor_url}\n\n🔗 Click the link to access the monitoring dashboard.\n\n"
+        "Built-in watches:\n"
+        "• /watch <url> - Get a message when a page changes\n"
+        "• /watches - List your watches\n"
+        "• /unwatch <id> - Stop watching",
+        MAIN_KEYBOARD,
+        parse_mode='Markdown'
+    )
 
 
 async def webmonitor_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handle /webmonitor command."""
-    reply_markup = get_main_keyboard()
-    MONITOR_URL = get_url()
     # chat_id = update.effective_chat.id
-    await update.message.reply_text(
-        f"🌐 **Web Monitor**\n\nMonitoring URL: {MONITOR_URL}\n\n🔗 Click the link to access the monitoring dashboard.",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
+    await update.message.reply_text(**render_monitor_reply(get_url()).kwargs)
 
-async def handle_monit_message(update: Update) -> None:
+async def handle_monit_message(update: Update, context: ContextTypes.DEFAULT_TYPE = None) -> None:
     """Handle 'monit' message."""
-    reply_markup = get_main_keyboard()
-    MONITOR_URL = get_url()
+    await update.message.reply_text(**render_monitor_reply(get_url()).kwargs)
+
+
+async def watch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /watch <url> command."""
+    if update.effective_user.id not in APPROVE_IDS:
+        return
+    if not context.args:
+        await update.message.reply_text("Usage: /watch <url>")
+        return
+    if not MONITOR_ENABLED:
+        # Nothing would poll the new watch
+        await update.message.reply_text("❌ The web monitor is turned off (MONITOR_ENABLED=false).")
+        return
+    url = context.args[0]
+    if not url.lower().startswith(('http://', 'https://')):
+        url = f"https://{url}"
+    if not is_valid_url(url):
+        await update.message.reply_text("❌ That doesn't look like a valid URL.")
+        return
+    try:
+        watch = await monitor_engine.add(update.effective_user.id, update.effective_chat.id, normalize_url(url))
+    except ValueError as e:
+        await update.message.reply_text(f"❌ {e}")
+        return
     await update.message.reply_text(
-        f"🌐 **Web Monitor**\n\nMonitoring URL: {MONITOR_URL}\n\n🔗 Click the link to access the monitoring dashboard.",
-        reply_markup=reply_markup,
-        parse_mode='Markdown'
-    )
\ No newline at end of file
+        f"👀 Watching {watch.url} (#{watch.id}).\nI'll message you here when it changes.",
+        disable_web_page_preview=True
+    )
+
+async def unwatch_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /unwatch <id> command."""
+    if update.effective_user.id not in APPROVE_IDS:
+        return
+    if not context.args or not context.args[0].lstrip('#').isdigit():
+        await update.message.reply_text("Usage: /unwatch <id> (see /watches)")
+        return
+    watch_id = int(context.args[0].lstrip('#'))
+    if await monitor_engine.remove(update.effective_user.id, watch_id):
+        await update.message.reply_text(f"🛑 Stopped watching #{watch_id}.")
+    else:
+        await update.message.reply_text(f"❌ You have no watch #{watch_id}.")
+
+async def watches_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Handle /watches command."""
+    if update.effective_user.id not in APPROVE_IDS:
+        return
+    watches = monitor_engine.list(update.effective_user.id)
+    if not watches:
+        await update.message.reply_text("No watches yet. Use /watch <url> to add one.")
+        return
+    lines = [f"👀 Watched URLs ({len(watches)}/{MONITOR_MAX_PER_USER}):", ""]
+    for watch in watches:
+        status = "⚠️ failing" if watch.failures else ("✅" if watch.digest is not None else "⏳")
+        lines.append(f"#{watch.id} {status} {watch.url}")
+    await update.message.reply_text("\n".join(lines), disable_web_page_preview=True)
@@ -0,0 +1,116 @@
+"""
+Edit coalescing in the outbound rate limiter when a sender is cancelled.
+
+Run with: python -m pytest tests
+"""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pytest  # noqa: E402
+from telegram.error import NetworkError  # noqa: E402
+from utils.rate_limiter import OutboundRateLimiter  # noqa: E402
+
+CHAT_ID = 1
+MESSAGE_ID = 7
+DATA = {'chat_id': CHAT_ID, 'message_id': MESSAGE_ID}
+
+
+def make_limiter() -> OutboundRateLimiter:
+    # One send per 50ms per chat, so a second edit waits in the queue
+    return OutboundRateLimiter(
+        global_rate=1000, chat_rate=20, chat_burst=1, group_rate=20, group_burst=1, max_retries=0
+    )
+
+
+async def edit(limiter: OutboundRateLimiter, sent: list, text: str):
+    async def callback(text):
+        sent.append(text)
+        return text
+    return await limiter.process_request(callback, (text,), {}, 'editMessageText', DATA, None)
+
+
+def test_cancelled_sender_hands_newest_edit_to_follower():
+    async def scenario():
+        limiter = make_limiter()
+        sent = []
+        await edit(limiter, sent, 'first')
+        owner = asyncio.create_task(edit(limiter, sent, 'second'))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(edit(limiter, sent, 'third'))
+        await asyncio.sleep(0)
+        owner.cancel()
+        assert await asyncio.wait_for(follower, 1) == 'third'
+        assert owner.cancelled()
+        # Later edits of the message are not stuck behind the cancelled one
+        assert await asyncio.wait_for(edit(limiter, sent, 'fourth'), 1) == 'fourth'
+        assert sent == ['first', 'third', 'fourth']
+        assert limiter.stats()['pending_edits'] == 0
+        await limiter.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_sender_without_followers_is_forgotten():
+    async def scenario():
+        limiter = make_limiter()
+        sent = []
+        await edit(limiter, sent, 'first')
+        owner = asyncio.create_task(edit(limiter, sent, 'second'))
+        await asyncio.sleep(0)
+        owner.cancel()
+        await asyncio.sleep(0)
+        assert limiter.stats()['pending_edits'] == 0
+        assert await asyncio.wait_for(edit(limiter, sent, 'third'), 1) == 'third'
+        assert sent == ['first', 'third']
+        await limiter.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_edit_queued_during_cancelled_send_goes_out():
+    async def scenario():
+        limiter = make_limiter()
+        started = asyncio.Event()
+
+        async def slow(text):
+            started.set()
+            await asyncio.sleep(10)
+
+        async def quick(text):
+            return text
+
+        owner = asyncio.create_task(
+            limiter.process_request(slow, ('first',), {}, 'editMessageText', DATA, None)
+        )
+        await started.wait()
+        # The content is already being sent; this edit queues separately
+        queued = asyncio.create_task(
+            limiter.process_request(quick, ('second',), {}, 'editMessageText', DATA, None)
+        )
+        await asyncio.sleep(0)
+        owner.cancel()
+        assert await asyncio.wait_for(queued, 1) == 'second'
+        await limiter.shutdown()
+
+    asyncio.run(scenario())
+
+
+def test_shutdown_fails_queued_followers():
+    async def scenario():
+        limiter = make_limiter()
+        sent = []
+        await edit(limiter, sent, 'first')
+        owner = asyncio.create_task(edit(limiter, sent, 'second'))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(edit(limiter, sent, 'third'))
+        await asyncio.sleep(0)
+        await limiter.shutdown()
+        owner.cancel()
+        with pytest.raises(NetworkError):
+            await asyncio.wait_for(follower, 1)
+        assert sent == ['first']
+
+    asyncio.run(scenario())
@@ -0,0 +1,69 @@
+"""
+Short tokens standing in for long values in inline keyboard callback data.
+
+Telegram limits callback_data to 64 bytes, which an app name alone can
+exceed. Buttons carry a few base62 characters instead, resolved back to
+the value when pressed. A token stays valid for ``ttl`` seconds after it
+was last rendered; the same value keeps its token while it is in use.
+
+Tokens start with a random prefix drawn at startup, so buttons rendered
+before a restart (or by another worker process) resolve as expired rather
+than to whatever value reuses their counter.
+"""
+import itertools
+import secrets
+from utils.lru_cache import LRUTTLCache
+
+_ALPHABET = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ"
+
+# 62 ** 4 epochs; a stale button hits the current one about once in 15 million restarts
+EPOCH_LENGTH = 4
+
+
+def base62(number: int) -> str:
+    digits = []
+    while True:
+        number, remainder = divmod(number, 62)
+        digits.append(_ALPHABET[remainder])
+        if number == 0:
+            return ''.join(reversed(digits))
+
+
+def parse_base62(text: str) -> int:
+    """Inverse of base62(); raises ValueError for characters outside the alphabet."""
+    number = 0
+    for char in text:
+        digit = _ALPHABET.find(char)
+        if digit < 0:
+            raise ValueError(f"Not a base62 digit: {char!r}")
+        number = number * 62 + digit
+    return number
+
+
+class CallbackTokens:
+    """Two-way map between values and short expiring tokens."""
+
+    def __init__(self, ttl: float, max_size: int):
+        self._values = LRUTTLCache(max_size, ttl)  # token -> value
+        self._tokens = LRUTTLCache(max_size, ttl)  # value -> token
+        self._counter = itertools.count()
+        self.epoch = ''.join(secrets.choice(_ALPHABET) for _ in range(EPOCH_LENGTH))
+
+    def token_for(self, value: str) -> str:
+        """Return the value's token, issuing one if needed, and extend its lifetime."""
+        token = self._tokens.get(value)
+        if token is None or self._values.get(token) != value:
+            token = self.epoch + base62(next(self._counter))
+        self._tokens.set(value, token)
+        self._values.set(token, value)
+        return token
+
+    def resolve(self, token: str):
+        """Return the value behind ``token``, or None if it expired or never existed."""
+        if not token.startswith(self.epoch):
+            # Issued before a restart or by another process
+            return None
+        return self._values.get(token)
+
+    def __len__(self) -> int:
+        return len(self._values)
@@ -0,0 +1,127 @@
+"""
+Catch-up mode: work off the update backlog left by downtime quickly.
+
+When Telegram holds at least CATCHUP_MIN_PENDING updates at startup, the
+bot takes them itself with getUpdates in batches of 100 (the maximum)
+instead of waiting for one webhook delivery after another. Each batch is
+triaged before anything runs:
+
+* button presses that are certainly older than CATCHUP_CALLBACK_MAX_AGE
+  are dropped; the keyboards they were pressed on are out of date and
+  Telegram no longer accepts answers to them
+* repeated presses of the same button on the same message by the same
+  user (tapping again while the bot was down) collapse into the last one
+
+The rest is handed over as one batch, processed concurrently (each
+user's updates still in order), and the next batch is only requested
+(which confirms the previous one to Telegram) once it is done. An empty
+batch ends catch-up mode and the caller registers the webhook or starts
+polling as usual.
+"""
+import asyncio
+import logging
+import time
+from telegram import Bot
+from config import CATCHUP_MIN_PENDING, CATCHUP_CALLBACK_MAX_AGE, WEBHOOK_DROP_PENDING_UPDATES
+from utils.metrics import metrics
+from webhook_manager import ALLOWED_UPDATES
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit for getUpdates
+BATCH_SIZE = 100
+
+catch_up_updates = metrics.counter(
+    'telebot_catch_up_updates_total', 'Backlog updates taken in catch-up mode by outcome', ('result',)
+)
+
+
+def triage(updates: list, now: float, max_age: float) -> tuple:
+    """Split a batch into (updates to process, stale presses dropped, repeated presses collapsed).
+
+    Callback queries carry no date. A press happened before any update that
+    follows it, so the date of the next message in the batch bounds its age.
+    """
+    stale = 0
+    keep = []
+    seen = set()
+    next_date = None  # date of the earliest message after the update being looked at
+    for update in reversed(updates):
+        message = update.effective_message if update.callback_query is None else None
+        if message is not None and message.date is not None:
+            next_date = (message.edit_date or message.date).timestamp()
+            keep.append(update)
+            continue
+        query = update.callback_query
+        if query is None:
+            keep.append(update)
+            continue
+        if next_date is not None and now - next_date > max_age:
+            stale += 1
+            continue
+        if query.message is not None:
+            key = (query.from_user.id, query.message.chat.id, query.message.message_id, query.data)
+        else:
+            key = (query.from_user.id, query.inline_message_id, query.data)
+        if key in seen:
+            continue
+        seen.add(key)
+        keep.append(update)
+    keep.reverse()
+    return keep, stale, len(updates) - len(keep) - stale
+
+
+async def catch_up(bot: Bot, process_batch) -> bool:
+    """Run catch-up mode if the backlog is large enough; True if it ran.
+
+    ``await process_batch(updates)`` must return once the updates are handled
+    (or safely handed to the workers). Call before the webhook is registered
+    or polling starts.
+    """
+    if CATCHUP_MIN_PENDING <= 0 or WEBHOOK_DROP_PENDING_UPDATES:
+        return False
+    try:
+        info = await bot.get_webhook_info()
+    except Exception as e:
+        logger.error(f"Could not check the update backlog: {e}")
+        return False
+    if info.pending_update_count < CATCHUP_MIN_PENDING:
+        return False
+
+    logger.info(f"{info.pending_update_count} updates pending; catching up")
+    started = time.monotonic()
+    if info.url:
+        # getUpdates is refused while a webhook is set; pending updates are kept
+        await bot.delete_webhook(drop_pending_updates=False)
+    offset = None
+    totals = {'processed': 0, 'stale': 0, 'collapsed': 0}
+    try:
+        while True:
+            # Asking for the next batch confirms the previous one
+            updates = await bot.get_updates(
+                offset=offset, limit=BATCH_SIZE, timeout=0, allowed_updates=ALLOWED_UPDATES
+            )
+            if not updates:
+                break
+            offset = updates[-1].update_id + 1
+            keep, stale, collapsed = triage(updates, time.time(), CATCHUP_CALLBACK_MAX_AGE)
+            await process_batch(keep)
+            for result, count in (('processed', len(keep)), ('stale', stale), ('collapsed', collapsed)):
+                totals[result] += count
+                if count:
+                    catch_up_updates.inc(result, amount=count)
+    except Exception as e:
+        # Unconfirmed updates stay pending and arrive the normal way
+        logger.error(f"Catch-up mode stopped early: {e}")
+    elapsed = time.monotonic() - started
+    logger.info(
+        f"Caught up in {elapsed:.1f}s: {totals['processed']} updates processed, "
+        f"{totals['stale']} stale button presses dropped, {totals['collapsed']} repeated presses collapsed"
+    )
+    return True
+
+
+async def process_in_application(application, updates: list) -> None:
+    """Process ``updates`` concurrently through the Application's update processor."""
+    processor = application.update_processor
+    await asyncio.gather(*(processor.process_update(update, application.process_update(update)) for update in updates))
@@ -0,0 +1,135 @@
+"""
+Shared async HTTP client for calls to local backend services.
+"""
+import asyncio
+import contextlib
+import logging
+import httpx
+from config import (
+    HTTP_POOL_SIZE, HTTP_KEEPALIVE_SIZE, HTTP_TIMEOUT, HTTP_CONNECT_TIMEOUT,
+    BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+)
+from utils.metrics import metrics
+from utils.resilience import CircuitBreaker, CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class HttpClient:
+    """Owns one keep-alive httpx.AsyncClient shared by every handler.
+
+    Each ``dependency`` gets a circuit breaker: once it keeps failing, calls
+    raise CircuitOpenError at once instead of waiting for another timeout.
+    """
+
+    def __init__(self):
+        self._client = None
+        self._breakers = {}
+
+    @staticmethod
+    def _build_client() -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=HTTP_POOL_SIZE,
+                max_keepalive_connections=HTTP_KEEPALIVE_SIZE
+            ),
+            timeout=httpx.Timeout(HTTP_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+        )
+
+    async def start(self) -> None:
+        """Open the connection pool. Called from Application.post_init."""
+        if self._client is None:
+            self._client = self._build_client()
+            logger.info(f"HTTP client started (pool size {HTTP_POOL_SIZE})")
+
+    async def close(self) -> None:
+        """Close all pooled connections. Called from Application.post_shutdown."""
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            logger.info("HTTP client closed")
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        """Return the shared client, opening it lazily if startup was skipped."""
+        if self._client is None:
+            self._client = self._build_client()
+        return self._client
+
+    def breaker(self, dependency: str) -> CircuitBreaker:
+        """Return the circuit breaker guarding ``dependency``."""
+        breaker = self._breakers.get(dependency)
+        if breaker is None:
+            breaker = self._breakers[dependency] = CircuitBreaker(
+                dependency, BREAKER_FAILURE_THRESHOLD, BREAKER_RESET_TIMEOUT
+            )
+        return breaker
+
+    async def request(self, method: str, url: str, dependency: str = 'http', operation: str = None, **kwargs) -> httpx.Response:
+        """Send a request through the shared pool, timed under ``dependency``/``operation``.
+
+        Raises CircuitOpenError without sending anything while ``dependency`` is down.
+        """
+        operation = operation or method.lower()
+        breaker = self._admit(dependency, operation, kwargs)
+        return await self._send(breaker, dependency, operation, lambda: self.client.request(method, url, **kwargs))
+
+    @contextlib.asynccontextmanager
+    async def stream(self, method: str, url: str, dependency: str = 'http', operation: str = None, **kwargs):
+        """Like request(), but yields the response with its body unread, for streaming.
+
+        The breaker and metrics see opening the stream (status and headers);
+        reading the body is up to the caller and is not timed.
+        """
+        operation = operation or method.lower()
+        breaker = self._admit(dependency, operation, kwargs)
+        request = self.client.build_request(method, url, **kwargs)
+        response = await self._send(breaker, dependency, operation, lambda: self.client.send(request, stream=True))
+        try:
+            yield response
+        finally:
+            await response.aclose()
+
+    def _admit(self, dependency: str, operation: str, kwargs: dict) -> CircuitBreaker:
+        """Check the dependency's breaker and normalize the call's timeout."""
+        breaker = self.breaker(dependency)
+        try:
+            breaker.before_call()
+        except CircuitOpenError:
+            metrics.dependency_errors.inc(dependency, operation, 'circuit_open')
+            raise
+        timeout = kwargs.get('timeout')
+        if isinstance(timeout, (int, float)):
+            # A per-call timeout bounds reads; connecting to a local service never needs long
+            kwargs['timeout'] = httpx.Timeout(timeout, connect=min(timeout, HTTP_CONNECT_TIMEOUT))
+        return breaker
+
+    async def _send(self, breaker: CircuitBreaker, dependency: str, operation: str, send) -> httpx.Response:
+        """Await ``send()``, timing it and reporting its outcome to the breaker."""
+        success = None
+        try:
+            with metrics.track(dependency, operation) as call:
+                response = await send()
+                if response.is_error:
+                    call.failed(f"http_{response.status_code // 100}xx")
+            # 4xx means the service is up and answered
+            success = response.status_code < 500
+            return response
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            success = False
+            raise
+        finally:
+            breaker.record(success)
+
+    async def get(self, url: str, **kwargs) -> httpx.Response:
+        """Send a GET request through the shared pool."""
+        return await self.request('GET', url, **kwargs)
+
+    async def post(self, url: str, **kwargs) -> httpx.Response:
+        """Send a POST request through the shared pool."""
+        return await self.request('POST', url, **kwargs)
+
+# Global HTTP client instance
+http_client = HttpClient()
@@ -1,29 +1,47 @@
 """
 Keyboard layouts for the Telegram bot.
+
+Layouts are fixed, so each markup is built once and shared;
+Telegram objects are immutable, which makes reuse safe.
 """
-from telegram import KeyboardButton, ReplyKeyboardMarkup
+from telegram import KeyboardButton, ReplyKeyboardMarkup, InlineKeyboardButton, InlineKeyboardMarkup
 from config import KEYBOARD_RESIZE, KEYBOARD_ONE_TIME
+from utils.render_cache import markup_payload
 
-def get_main_keyboard() -> ReplyKeyboardMarkup:
-    """Get the main menu keyboard."""
-    keyboard = [
+MAIN_KEYBOARD = ReplyKeyboardMarkup(
+    [
         [KeyboardButton("Shorten URL"), KeyboardButton("Help")],
         [KeyboardButton("WebMonitor"), KeyboardButton("Panel")],
         [KeyboardButton("Cancel")]
-    ]
-    return ReplyKeyboardMarkup(
-        keyboard, 
-        resize_keyboard=KEYBOARD_RESIZE, 
-        one_time_keyboard=KEYBOARD_ONE_TIME
-    )
+    ],
+    resize_keyboard=KEYBOARD_RESIZE,
+    one_time_keyboard=KEYBOARD_ONE_TIME
+)
+
+CANCEL_KEYBOARD = ReplyKeyboardMarkup(
+    [
+        [KeyboardButton("Cancel")]
+    ],
+    resize_keyboard=KEYBOARD_RESIZE,
+    one_time_keyboard=KEYBOARD_ONE_TIME
+)
+
+PANEL_MENU_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("📊 App Status", callback_data="app_status")],
+    [InlineKeyboardButton("❌ Close", callback_data="close_panel")]
+])
+
+BACK_TO_PANEL_KEYBOARD = InlineKeyboardMarkup([
+    [InlineKeyboardButton("🔙 Back", callback_data="back_to_panel")]
+])
+
+# Serialized once for replies whose text varies but whose keyboard does not
+MAIN_KEYBOARD_PAYLOAD = markup_payload(MAIN_KEYBOARD)
+
+def get_main_keyboard() -> ReplyKeyboardMarkup:
+    """Get the main menu keyboard."""
+    return MAIN_KEYBOARD
 
 def get_cancel_keyboard() -> ReplyKeyboardMarkup:
     """Get a keyboard with just the cancel option."""
-    keyboard = [
-        [KeyboardButton("Cancel")]
-    ]
-    return ReplyKeyboardMarkup(
-        keyboard, 
-        resize_keyboard=KEYBOARD_RESIZE, 
-        one_time_keyboard=KEYBOARD_ONE_TIME
-    )
\ No newline at end of file
+    return CANCEL_KEYBOARD
@@ -0,0 +1,208 @@
+"""
+Non-blocking logging: handlers only enqueue records, a background thread writes them.
+
+Nothing on the event loop formats or writes a log line. ``logger.info()``
+costs a level check, a repeat check and a queue put; a listener thread
+formats the records (as JSON by default) and writes them to stderr.
+
+Warnings and errors from one call site are limited to a burst per window,
+after which only a sample is written, each carrying the number of records
+it stands for, so a backend outage cannot flood the log or the queue.
+"""
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from config import (
+    LOGGING_FORMAT, LOGGING_LEVEL, LOGGING_LEVELS, LOGGING_JSON, LOG_QUEUE_SIZE,
+    LOG_REPEAT_BURST, LOG_REPEAT_WINDOW, LOG_REPEAT_SAMPLE
+)
+
+# Attributes every LogRecord has; anything else was passed via ``extra``
+_STANDARD_ATTRS = frozenset(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line; ``extra`` fields are included as keys."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'pid': record.process,
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS:
+                entry[key] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+    def formatTime(self, record: logging.LogRecord, datefmt: str = None) -> str:
+        return time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z"
+
+
+class TextFormatter(logging.Formatter):
+    """LOGGING_FORMAT, plus a note when records were suppressed or dropped."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        text = super().format(record)
+        suppressed = getattr(record, 'suppressed', 0)
+        if suppressed:
+            text += f" [{suppressed} similar suppressed]"
+        dropped = getattr(record, 'dropped_before', 0)
+        if dropped:
+            text += f" [{dropped} records dropped before this one]"
+        return text
+
+
+class RepeatFilter(logging.Filter):
+    """Limits warnings and errors per call site (logger, file, line).
+
+    The first ``burst`` records of a site in each ``window`` pass; after that
+    one in ``sample`` passes, with ``suppressed`` set to the number of records
+    skipped since the last one written.
+    """
+
+    def __init__(self, burst: int, window: float, sample: int):
+        super().__init__()
+        self.burst = burst
+        self.window = window
+        self.sample = sample
+        self._sites = {}  # (name, pathname, lineno) -> [window start, count, suppressed]
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = record.created
+        with self._lock:
+            site = self._sites.get(key)
+            if site is None or now - site[0] >= self.window:
+                suppressed = site[2] if site is not None else 0
+                if len(self._sites) > 10000:
+                    self._sites.clear()
+                self._sites[key] = [now, 1, 0]
+            else:
+                site[1] += 1
+                if site[1] <= self.burst or (site[1] - self.burst) % self.sample == 0:
+                    suppressed, site[2] = site[2], 0
+                else:
+                    site[2] += 1
+                    return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class _EnqueueHandler(logging.handlers.QueueHandler):
+    """Puts records on the queue as they are; the listener does all formatting."""
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Same process, so no need to pre-format for pickling
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            # Never block the caller; the listener reports the gap
+            self.dropped += 1
+
+
+class _Writer(logging.StreamHandler):
+    """Writes records on the listener thread and reports records dropped at the queue."""
+
+    def __init__(self, stream, enqueue_handler: _EnqueueHandler):
+        super().__init__(stream)
+        self.enqueue_handler = enqueue_handler
+        self._reported_drops = 0
+
+    def emit(self, record: logging.LogRecord) -> None:
+        dropped = self.enqueue_handler.dropped
+        if dropped != self._reported_drops:
+            record.dropped_before = dropped - self._reported_drops
+            self._reported_drops = dropped
+        super().emit(record)
+
+
+def parse_levels(spec: str) -> dict:
+    """``"httpx=WARNING,handlers.panel=DEBUG"`` -> {logger name: level}."""
+    levels = {}
+    for item in spec.split(','):
+        name, _, level = item.strip().partition('=')
+        if name and level:
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+class LogPipeline:
+    """Owns the root logger's queue handler and the listener thread writing its records."""
+
+    def __init__(self):
+        self._handler = None
+        self._writer = None
+        self._listener = None
+        self._fork_hook = False
+
+    def start(self) -> None:
+        """Route all logging through the queue. Safe to call again (e.g. after fork)."""
+        self.stop()
+        log_queue = queue.Queue(LOG_QUEUE_SIZE)
+        handler = _EnqueueHandler(log_queue)
+        handler.addFilter(RepeatFilter(LOG_REPEAT_BURST, LOG_REPEAT_WINDOW, LOG_REPEAT_SAMPLE))
+        writer = _Writer(sys.stderr, handler)
+        writer.setFormatter(JsonFormatter() if LOGGING_JSON else TextFormatter(LOGGING_FORMAT))
+
+        root = logging.getLogger()
+        for existing in root.handlers[:]:
+            root.removeHandler(existing)
+        root.addHandler(handler)
+        root.setLevel(getattr(logging, LOGGING_LEVEL, logging.INFO))
+        for name, level in parse_levels(LOGGING_LEVELS).items():
+            logging.getLogger(name).setLevel(level)
+
+        self._handler = handler
+        self._writer = writer
+        self._listener = logging.handlers.QueueListener(log_queue, writer)
+        self._listener.start()
+        if not self._fork_hook:
+            # Threads do not survive fork: a forked worker needs its own listener
+            os.register_at_fork(after_in_child=self._restart_in_child)
+            atexit.register(self.stop)
+            self._fork_hook = True
+
+    def _restart_in_child(self) -> None:
+        if self._listener is not None:
+            self._listener = None  # its thread stayed in the parent
+            self.start()
+
+    def stop(self) -> None:
+        """Write every queued record and stop the listener thread.
+
+        Records logged afterwards (late in interpreter shutdown) are written directly.
+        """
+        if self._listener is None:
+            return
+        root = logging.getLogger()
+        root.removeHandler(self._handler)
+        self._listener.stop()
+        self._listener = None
+        for log_filter in self._handler.filters:
+            self._writer.addFilter(log_filter)
+        root.addHandler(self._writer)
+
+# Global logging pipeline instance
+log_pipeline = LogPipeline()
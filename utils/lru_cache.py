@@ -0,0 +1,82 @@
+"""
+Size-bounded LRU cache with per-entry TTL and optional JSON persistence.
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class LRUTTLCache:
+    """Maps keys to values, evicting the least recently used entry when full
+    and treating entries older than the TTL as missing."""
+
+    def __init__(self, max_size: int, ttl: float, path: str = None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.path = path
+        self._entries = OrderedDict()  # key -> (value, expires_at)
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        """Return the cached value or None if missing or expired."""
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        value, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self._dirty = True
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: str, value) -> None:
+        """Store a value, evicting the least recently used entry if full."""
+        self._entries[key] = (value, time.time() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        self._dirty = True
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def load(self) -> None:
+        """Load unexpired entries from disk, if persistence is enabled."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+            now = time.time()
+            # Entries are stored oldest first, so LRU order survives the round trip
+            for key, (value, expires_at) in data.items():
+                if expires_at > now:
+                    self._entries[key] = (value, expires_at)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            logger.info(f"Loaded {len(self._entries)} cached entries from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading cache from {self.path}: {e}")
+
+    def save(self) -> None:
+        """Atomically write entries to disk, if persistence is enabled and anything changed."""
+        if not self.path or not self._dirty:
+            return
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"  # webhook workers may save at once
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(self._entries, f)
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.error(f"Error saving cache to {self.path}: {e}")
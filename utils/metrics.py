@@ -0,0 +1,271 @@
+"""
+In-process metrics with Prometheus text exposition.
+
+Counters and histograms are plain dicts of label tuples, so recording a
+sample costs a dict lookup and a few integer adds. Gauges are read from
+callbacks only when /metrics is scraped.
+"""
+import asyncio
+import bisect
+import logging
+import threading
+import time
+import tornado.web
+from config import METRICS_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# Seconds; suits both fast handlers and slow backend calls
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = '') -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+class Counter:
+    """Monotonic counter per label combination."""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def collect(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        for label_values, value in list(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labels, label_values)} {value}")
+        return lines
+
+
+class Histogram:
+    """Fixed-bucket latency histogram per label combination."""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}  # label values -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+            series[index] += 1
+            series[-1] += value
+
+    def collect(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for label_values, series in list(self._series.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series):
+                cumulative += count
+                labels = _format_labels(self.labels, label_values, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labels, label_values)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class Gauge:
+    """Value read from a callback at scrape time."""
+
+    def __init__(self, name: str, documentation: str, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def collect(self) -> list:
+        try:
+            value = self.read()
+        except Exception as e:
+            logger.error(f"Error reading gauge {self.name}: {e}")
+            return []
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} gauge", f"{self.name} {value}"]
+
+
+def _is_timeout(exc: BaseException) -> bool:
+    """Timeouts from asyncio, httpx, requests and python-telegram-bot."""
+    if isinstance(exc, (TimeoutError, asyncio.TimeoutError)):
+        return True
+    return any(name in ('TimeoutException', 'Timeout', 'TimedOut') for name in (cls.__name__ for cls in type(exc).__mro__))
+
+
+class _DependencyCall:
+    """Context manager timing one call to an external dependency."""
+
+    __slots__ = ('registry', 'labels', 'started')
+
+    def __init__(self, registry: 'MetricsRegistry', dependency: str, operation: str):
+        self.registry = registry
+        self.labels = (dependency, operation)
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def failed(self, kind: str) -> None:
+        """Count a failure that did not raise (e.g. an HTTP error status)."""
+        self.registry.dependency_errors.inc(*self.labels, kind)
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.dependency_seconds.observe(time.perf_counter() - self.started, *self.labels)
+        if exc is not None and not isinstance(exc, asyncio.CancelledError):
+            self.failed('timeout' if _is_timeout(exc) else 'error')
+        return False
+
+
+class _NoopCall:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def failed(self, kind: str) -> None:
+        pass
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP_CALL = _NoopCall()
+
+
+def callback_type(data: str) -> str:
+    """Bounded label for callback data: the part before the first underscore."""
+    return data.split('_', 1)[0] if data else 'none'
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered together for /metrics."""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics = []
+        self.handler_seconds = self.histogram(
+            'telebot_handler_seconds', 'Time spent in each update handler', ('handler',)
+        )
+        self.handler_errors = self.counter(
+            'telebot_handler_errors_total', 'Exceptions raised by update handlers', ('handler',)
+        )
+        self.callback_seconds = self.histogram(
+            'telebot_callback_seconds', 'Time spent handling callback queries by type', ('callback',)
+        )
+        self.dependency_seconds = self.histogram(
+            'telebot_dependency_seconds', 'Latency of calls to external services', ('dependency', 'operation')
+        )
+        self.dependency_errors = self.counter(
+            'telebot_dependency_errors_total', 'Failed calls to external services',
+            ('dependency', 'operation', 'kind')
+        )
+
+    def counter(self, name: str, documentation: str, labels: tuple = ()) -> Counter:
+        metric = Counter(name, documentation, labels)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, documentation, labels, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def gauge(self, name: str, documentation: str, read) -> Gauge:
+        metric = Gauge(name, documentation, read)
+        self._metrics.append(metric)
+        return metric
+
+    def track(self, dependency: str, operation: str):
+        """Time a call to an external dependency: ``with metrics.track('panel', 'apps'):``."""
+        if not self.enabled:
+            return _NOOP_CALL
+        return _DependencyCall(self, dependency, operation)
+
+    def instrument_handler(self, callback):
+        """Wrap a handler callback to record its latency and errors."""
+        if not self.enabled:
+            return callback
+        name = getattr(callback, '__name__', 'handler')
+        handler_seconds = self.handler_seconds
+        callback_seconds = self.callback_seconds
+        handler_errors = self.handler_errors
+
+        async def instrumented(update, context):
+            started = time.perf_counter()
+            try:
+                return await callback(update, context)
+            except Exception:
+                handler_errors.inc(name)
+                raise
+            finally:
+                elapsed = time.perf_counter() - started
+                handler_seconds.observe(elapsed, name)
+                query = getattr(update, 'callback_query', None)
+                if query is not None:
+                    callback_seconds.observe(elapsed, callback_type(query.data))
+
+        instrumented.__name__ = instrumented.__qualname__ = name
+        return instrumented
+
+    def render(self) -> str:
+        """Return every metric in Prometheus text format."""
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.collect())
+        return '\n'.join(lines) + '\n'
+
+
+def merge_exposition(texts: list) -> str:
+    """Combine the /metrics output of several processes by summing equal series.
+
+    Counters, histogram buckets and the gauges above (queue depths, in-flight
+    updates) all add up across processes, so the sum is the deployment's value.
+    """
+    families = {}  # metric name -> (header lines, {series: value})
+    for text in texts:
+        samples = None
+        for line in text.splitlines():
+            if line.startswith('# '):
+                name = line.split(' ', 3)[2]
+                family = families.get(name)
+                if family is None:
+                    family = families[name] = ([], {})
+                if line not in family[0]:
+                    family[0].append(line)
+                samples = family[1]
+            elif line and samples is not None:
+                series, value = line.rsplit(' ', 1)
+                samples[series] = samples.get(series, 0) + float(value)
+    lines = []
+    for headers, samples in families.values():
+        lines.extend(headers)
+        for series, value in samples.items():
+            lines.append(f"{series} {int(value) if value.is_integer() else value}")
+    return '\n'.join(lines) + '\n'
+
+
+class MetricsHandler(tornado.web.RequestHandler):
+    """Serves the registry for Prometheus scrapes."""
+
+    def initialize(self, registry: MetricsRegistry) -> None:
+        self.registry = registry
+
+    def get(self) -> None:
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(self.registry.render())
+
+# Global metrics registry instance
+metrics = MetricsRegistry(enabled=METRICS_ENABLED)
@@ -0,0 +1,61 @@
+"""
+Client for the Docker Compose panel backend.
+"""
+import logging
+from config import (
+    PANEL_API_URL, PANEL_APPS_TIMEOUT, PANEL_TOGGLE_TIMEOUT, PANEL_APPS_FRESH, PANEL_APPS_MAX_STALE
+)
+from utils.http_client import http_client
+from utils.resilience import StaleWhileRevalidate
+
+logger = logging.getLogger(__name__)
+
+# Stacks the bot depends on; never listed or bulk-toggled from the panel
+HIDDEN_APPS = frozenset(("telebot", "ngrok"))
+
+
+async def fetch_app_status() -> list:
+    """Ask the backend to scan Docker Compose projects; raises on failure."""
+    response = await http_client.get(
+        f"{PANEL_API_URL}/apps", timeout=PANEL_APPS_TIMEOUT, dependency="panel", operation="apps"
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+# The last good listing, served at once while a refresh runs in the background
+app_status_cache = StaleWhileRevalidate(
+    "panel app list", fetch_app_status, PANEL_APPS_FRESH, PANEL_APPS_MAX_STALE, default=[]
+)
+
+
+async def get_app_status():
+    """Docker Compose projects and their status; [] if the backend has been unreachable for too long."""
+    return await app_status_cache.get()
+
+
+async def refresh_app_status():
+    """Like get_app_status, but waits for the backend (live views poll with this)."""
+    return await app_status_cache.refresh()
+
+
+async def toggle_app_status(app_name: str, timeout: float = PANEL_TOGGLE_TIMEOUT) -> dict:
+    """
+    Toggle the status of a Docker Compose app.
+    Returns dict with success status and new app status.
+    """
+   
+    try:
+        response = await http_client.post(
+            f"{PANEL_API_URL}/toggle/{app_name}", timeout=timeout, dependency="panel", operation="toggle"
+        )
+        if response.is_success:
+            return {'success': True}
+        return {'success': False, 'error': f'Backend returned HTTP {response.status_code} for {app_name}'}
+        
+    except Exception as e:
+        logger.error(f"Error toggling app {app_name}: {e}")
+        return {'success': False, 'error': str(e) or type(e).__name__}
+    finally:
+        # Even a failed or timed-out toggle may have changed the app's state
+        app_status_cache.invalidate()
@@ -0,0 +1,336 @@
+"""
+Outbound rate limiting for Bot API calls.
+
+Plugs into python-telegram-bot as the Application's rate limiter, so every
+send and edit made through context.bot passes through it.
+"""
+import asyncio
+import contextvars
+import heapq
+import itertools
+import logging
+import time
+from telegram.error import NetworkError, RetryAfter
+from telegram.ext import BaseRateLimiter
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Priority lanes; lower values are sent first
+INTERACTIVE = 0
+BACKGROUND = 1
+
+# Edits to the same message that can replace each other while queued
+EDIT_ENDPOINTS = frozenset((
+    'editMessageText', 'editMessageReplyMarkup', 'editMessageCaption'
+))
+
+_lane = contextvars.ContextVar('outbound_lane', default=INTERACTIVE)
+
+
+def use_background_lane() -> None:
+    """Send the current task's Bot API calls in the background lane.
+
+    Call at the top of a background task (live panels, log following,
+    alerts); command replies keep the default interactive lane.
+    """
+    _lane.set(BACKGROUND)
+
+
+class TokenBucket:
+    """Token bucket where each caller reserves a token and waits its turn."""
+
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available, without taking it."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self) -> None:
+        self.tokens -= 1
+
+    def reserve(self, now: float) -> float:
+        """Take a token now, possibly going into debt; returns seconds to wait."""
+        self._refill(now)
+        self.tokens -= 1
+        return 0.0 if self.tokens >= 0 else -self.tokens / self.rate
+
+    def penalize(self, seconds: float) -> None:
+        """Block the bucket for ``seconds`` (after a flood-control error)."""
+        self.tokens = min(self.tokens, 0) - seconds * self.rate
+
+    def is_idle(self, now: float) -> bool:
+        self._refill(now)
+        return self.tokens >= self.capacity
+
+
+class _PendingEdit:
+    """The newest queued edit of one message, shared by every edit it replaced."""
+
+    __slots__ = ('args', 'kwargs', 'result', 'followers')
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, args, kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        self.result = loop.create_future()
+        self.followers = 0  # replaced edits still waiting for the result
+        # Nobody may be waiting on a failed result; don't warn about it
+        self.result.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    def resolve(self, result=None, exception: BaseException = None) -> None:
+        if self.result.done():
+            return
+        if exception is not None:
+            self.result.set_exception(exception)
+        else:
+            self.result.set_result(result)
+
+
+class OutboundRateLimiter(BaseRateLimiter):
+    """Per-chat and global token buckets with priority lanes and edit coalescing.
+
+    * Each chat has its own bucket (private chats and groups differ).
+    * A global bucket hands out send slots to the highest-priority waiter first.
+    * A RetryAfter pauses the affected chat and all sends, then the request is retried.
+    * Queued edits of the same message are coalesced: only the newest is sent.
+    """
+
+    def __init__(
+        self,
+        global_rate: float,
+        chat_rate: float,
+        chat_burst: float,
+        group_rate: float,
+        group_burst: float,
+        max_retries: int
+    ):
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.group_burst = group_burst
+        self.max_retries = max_retries
+
+        self._global = TokenBucket(global_rate, global_rate)
+        self._chats = {}
+        self._waiters = []  # heap of (lane, seq, future)
+        self._seq = itertools.count()
+        self._dispatcher = None
+        self._paused_until = 0.0
+        self._pending_edits = {}
+        self._handoffs = set()
+        self._closed = False
+
+        self.sent = 0
+        self.coalesced = 0
+        self.retries = 0
+        self.chat_waiting = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    async def initialize(self) -> None:
+        self._closed = False
+
+    async def shutdown(self) -> None:
+        self._closed = True
+        for task in list(self._handoffs):
+            task.cancel()
+        if self._dispatcher is not None:
+            self._dispatcher.cancel()
+            self._dispatcher = None
+        for _, _, waiter in self._waiters:
+            waiter.cancel()
+        self._waiters.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            # Negative ids and @usernames are groups or channels
+            if isinstance(chat_id, str) or chat_id < 0:
+                bucket = TokenBucket(self.group_rate, self.group_burst)
+            else:
+                bucket = TokenBucket(self.chat_rate, self.chat_burst)
+            self._chats[chat_id] = bucket
+            if len(self._chats) > 10000:
+                self._prune_chats()
+        return bucket
+
+    def _prune_chats(self) -> None:
+        """Forget buckets that are full again; they behave like new ones."""
+        now = time.monotonic()
+        self._chats = {chat_id: bucket for chat_id, bucket in self._chats.items() if not bucket.is_idle(now)}
+
+    async def _dispatch(self) -> None:
+        """Hand out global send slots to waiters in priority order."""
+        while self._waiters:
+            now = time.monotonic()
+            delay = max(self._paused_until - now, self._global.wait_time(now))
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                self._global.take()
+                waiter.set_result(None)
+        self._dispatcher = None
+
+    async def _global_slot(self, lane: int) -> None:
+        """Wait for a global send slot in the given lane."""
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (lane, next(self._seq), waiter))
+        if self._dispatcher is None:
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await waiter
+
+    async def _chat_slot(self, chat_id) -> None:
+        delay = self._chat_bucket(chat_id).reserve(time.monotonic())
+        if delay > 0:
+            self.chat_waiting += 1
+            try:
+                await asyncio.sleep(delay)
+            finally:
+                self.chat_waiting -= 1
+
+    def _record_wait(self, waited: float) -> None:
+        self.wait_count += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+
+    async def process_request(self, callback, args, kwargs, endpoint, data, rate_limit_args):
+        chat_id = data.get('chat_id')
+        if chat_id is None:
+            # Not a chat send (answerCallbackQuery, getMe, setWebhook...): only honor flood pauses
+            pause = self._paused_until - time.monotonic()
+            if pause > 0:
+                await asyncio.sleep(pause)
+            with metrics.track('telegram', endpoint):
+                return await callback(*args, **kwargs)
+
+        try:
+            chat_id = int(chat_id)
+        except (TypeError, ValueError):
+            pass
+        lane = rate_limit_args.get('lane', INTERACTIVE) if isinstance(rate_limit_args, dict) else _lane.get()
+
+        if endpoint not in EDIT_ENDPOINTS or data.get('message_id') is None:
+            return await self._send(callback, args, kwargs, endpoint, chat_id, lane)
+
+        edit_key = (chat_id, data['message_id'], endpoint)
+        group = self._pending_edits.get(edit_key)
+        if group is not None:
+            # An edit of this message is already queued: send our content in its slot
+            group.args, group.kwargs = args, kwargs
+            self.coalesced += 1
+            group.followers += 1
+            try:
+                return await asyncio.shield(group.result)
+            finally:
+                group.followers -= 1
+        group = _PendingEdit(asyncio.get_running_loop(), args, kwargs)
+        self._pending_edits[edit_key] = group
+        return await self._send_edit(callback, endpoint, chat_id, lane, group, edit_key)
+
+    async def _send_edit(self, callback, endpoint, chat_id, lane, group: _PendingEdit, edit_key: tuple):
+        """Send the newest content of a queued edit and resolve everyone waiting for it."""
+        try:
+            return await self._send(callback, group.args, group.kwargs, endpoint, chat_id, lane, group, edit_key)
+        except asyncio.CancelledError:
+            self._abandon_edit(callback, endpoint, chat_id, lane, group, edit_key)
+            raise
+
+    def _abandon_edit(self, callback, endpoint, chat_id, lane, group: _PendingEdit, edit_key: tuple) -> None:
+        """The sender of a queued edit was cancelled; don't strand the edits coalesced onto it."""
+        if group.result.done():
+            return
+        queued = self._pending_edits.get(edit_key) is group
+        if queued and group.followers and not self._closed:
+            # Newer content is still waiting to be sent: keep the group queued and send it for them
+            task = asyncio.create_task(self._send_edit(callback, endpoint, chat_id, lane, group, edit_key))
+            self._handoffs.add(task)
+            task.add_done_callback(self._handoffs.discard)
+            # Its outcome reaches the followers through group.result
+            task.add_done_callback(lambda t: t.cancelled() or t.exception())
+            return
+        if queued:
+            del self._pending_edits[edit_key]
+        group.resolve(exception=NetworkError("The edit was cancelled before it was sent"))
+
+    async def _send(self, callback, args, kwargs, endpoint, chat_id, lane, group=None, edit_key=None):
+        """Wait for the chat and global slots, then call the Bot API, retrying on RetryAfter."""
+        started = time.monotonic()
+        for attempt in range(self.max_retries + 1):
+            await self._chat_slot(chat_id)
+            await self._global_slot(lane)
+            if attempt == 0:
+                self._record_wait(time.monotonic() - started)
+            if group is not None:
+                # Take the newest content; edits arriving from now on queue separately
+                args, kwargs = group.args, group.kwargs
+                if self._pending_edits.get(edit_key) is group:
+                    del self._pending_edits[edit_key]
+
+            try:
+                with metrics.track('telegram', endpoint):
+                    result = await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                retry_after = exc.retry_after
+                seconds = retry_after.total_seconds() if hasattr(retry_after, 'total_seconds') else float(retry_after)
+                self.retries += 1
+                self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+                self._chat_bucket(chat_id).penalize(seconds)
+                if attempt == self.max_retries:
+                    logger.error(f"Flood limit for chat {chat_id} persisted after {self.max_retries} retries")
+                    if group is not None:
+                        group.resolve(exception=exc)
+                    raise
+                logger.warning(f"Flood limit hit for chat {chat_id}; retrying in {seconds:.1f}s")
+                if group is not None:
+                    newer = self._pending_edits.get(edit_key)
+                    if newer is not None:
+                        # A newer edit is already queued and supersedes ours
+                        self.coalesced += 1
+                        try:
+                            result = await asyncio.shield(newer.result)
+                        except Exception as newer_exc:
+                            group.resolve(exception=newer_exc)
+                            raise
+                        group.resolve(result)
+                        return result
+                    self._pending_edits[edit_key] = group
+                continue
+            except Exception as exc:
+                if group is not None:
+                    group.resolve(exception=exc)
+                raise
+
+            self.sent += 1
+            if group is not None:
+                group.resolve(result)
+            return result
+
+    def stats(self) -> dict:
+        """Return queue depth, wait-time and outcome counters."""
+        return {
+            'queue_depth': len(self._waiters) + self.chat_waiting,
+            'global_waiting': len(self._waiters),
+            'chat_waiting': self.chat_waiting,
+            'pending_edits': len(self._pending_edits),
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'retries': self.retries,
+            'wait_avg': self.wait_total / self.wait_count if self.wait_count else 0.0,
+            'wait_max': self.wait_max,
+            'tracked_chats': len(self._chats),
+        }
@@ -0,0 +1,33 @@
+"""
+Pre-rendered replies for fixed-content messages.
+
+Each RenderedReply is built once at import time, including the JSON
+payload of its keyboard, so sending it does no per-call object
+construction or serialization.
+"""
+from telegram import TelegramObject
+
+
+def markup_payload(reply_markup: TelegramObject) -> dict:
+    """Serialize a keyboard once into api_kwargs for Bot API calls.
+
+    The Bot API request layer passes strings through unchanged, so the
+    markup is not converted again on every send.
+    """
+    return {'reply_markup': reply_markup.to_json()}
+
+
+class RenderedReply:
+    """A fixed message body and keyboard, ready to pass to reply_text or edit_message_text."""
+
+    __slots__ = ('text', 'reply_markup', 'parse_mode', 'kwargs')
+
+    def __init__(self, text: str, reply_markup: TelegramObject = None, parse_mode: str = None):
+        self.text = text
+        self.reply_markup = reply_markup
+        self.parse_mode = parse_mode
+        self.kwargs = {'text': text}
+        if parse_mode is not None:
+            self.kwargs['parse_mode'] = parse_mode
+        if reply_markup is not None:
+            self.kwargs['api_kwargs'] = markup_payload(reply_markup)
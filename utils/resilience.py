@@ -0,0 +1,151 @@
+"""
+Circuit breakers and stale-while-revalidate caching for local backend services.
+"""
+import asyncio
+import logging
+import time
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+circuit_opened = metrics.counter(
+    'telebot_circuit_opened_total', 'Times a dependency was marked down after repeated failures', ('dependency',)
+)
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open."""
+
+
+class CircuitBreaker:
+    """Fails fast while a dependency is down.
+
+    ``failure_threshold`` consecutive failures open the circuit: calls then
+    raise CircuitOpenError without touching the network. After
+    ``reset_timeout`` seconds a single trial call is let through; its success
+    closes the circuit, its failure keeps it open for another period.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._trial_running = False
+
+    def before_call(self) -> None:
+        """Raise CircuitOpenError unless a call may go through now."""
+        if self.state == self.CLOSED:
+            return
+        if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_running = False
+        if self.state == self.HALF_OPEN and not self._trial_running:
+            self._trial_running = True
+            return
+        raise CircuitOpenError(f"{self.name} is unavailable (circuit open)")
+
+    def record(self, success) -> None:
+        """Report a call's outcome: True, False, or None when it was abandoned."""
+        if success is None:
+            self._trial_running = False
+        elif success:
+            self._close()
+        else:
+            self._fail()
+
+    def _close(self) -> None:
+        if self.state != self.CLOSED:
+            logger.info(f"Circuit for '{self.name}' closed; the service is back")
+        self.state = self.CLOSED
+        self.failures = 0
+        self._trial_running = False
+
+    def _fail(self) -> None:
+        self.failures += 1
+        self._trial_running = False
+        if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                logger.warning(
+                    f"Circuit for '{self.name}' opened after {self.failures} failures; "
+                    f"failing fast for {self.reset_timeout:.0f}s"
+                )
+                circuit_opened.inc(self.name)
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+
+class StaleWhileRevalidate:
+    """Serves the last good result of ``fetch()`` and refreshes it in the background.
+
+    * younger than ``fresh_for`` seconds: returned as is
+    * older: returned at once while one background refresh runs
+    * nothing usable (never fetched, invalidated, or older than ``max_stale``):
+      the caller waits for a refresh, and gets the last good value (or
+      ``default``) if that fails
+
+    Concurrent callers share a single refresh.
+    """
+
+    def __init__(self, name: str, fetch, fresh_for: float, max_stale: float, default=None):
+        self.name = name
+        self.fetch = fetch
+        self.fresh_for = fresh_for
+        self.max_stale = max_stale
+        self.default = default
+        self.value = default
+        self.fetched_at = 0.0
+        self._generation = 0  # bumped by invalidate()
+        self._value_generation = -1  # generation the cached value was fetched in
+        self._task = None
+        self._task_generation = -1
+
+    def _age(self) -> float:
+        return time.monotonic() - self.fetched_at if self._value_generation >= 0 else float('inf')
+
+    async def get(self):
+        """Return the cached value, waiting for the backend only when nothing usable is cached."""
+        age = self._age()
+        if self._value_generation == self._generation and age < self.max_stale:
+            if age >= self.fresh_for:
+                self._start_refresh()
+            return self.value
+        return await self.refresh()
+
+    async def refresh(self):
+        """Fetch now (joining a refresh already under way) and return the best value available."""
+        await asyncio.shield(self._start_refresh())
+        if self._age() < self.max_stale:
+            return self.value
+        return self.default
+
+    def invalidate(self) -> None:
+        """Mark the cached value out of date (e.g. after changing the backend's state)."""
+        self._generation += 1
+
+    def _start_refresh(self) -> asyncio.Task:
+        # A refresh that started before invalidate() may return the old state
+        if self._task is None or self._task.done() or self._task_generation != self._generation:
+            self._task_generation = self._generation
+            self._task = asyncio.create_task(self._run(self._generation))
+        return self._task
+
+    async def _run(self, generation: int) -> None:
+        try:
+            value = await self.fetch()
+        except CircuitOpenError as e:
+            logger.debug(f"Not refreshing {self.name}: {e}")
+            return
+        except Exception as e:
+            logger.error(f"Error refreshing {self.name}: {e}")
+            return
+        if generation >= self._value_generation:
+            self.value = value
+            self.fetched_at = time.monotonic()
+            self._value_generation = generation
@@ -0,0 +1,140 @@
+"""
+Self-hosted short links, selected with ``SHORTEN_PROVIDERS=local``.
+
+A link's code is its row id in base62, so creating one is a single insert
+into an indexed SQLite table (or an index lookup when the URL was shortened
+before) and resolving one is a primary-key read. Recently used codes are
+answered from memory. The bot's web server redirects SHORT_LINK_PATH<code>
+to the original URL with a 301.
+
+Links are built on SHORT_LINK_BASE_URL when they are shown, so only codes
+are cached. There is no fallback to the webhook address: in polling mode
+the route is served on METRICS_PORT, which the webhook host does not reach.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import tornado.web
+from config import SHORT_LINK_DB_PATH, SHORT_LINK_BASE_URL, SHORT_LINK_PATH, SHORT_LINK_CACHE_SIZE
+from utils.callback_tokens import base62, parse_base62
+from utils.lru_cache import LRUTTLCache
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Row ids stay far below 62 ** 11; longer codes cannot exist
+MAX_CODE_LENGTH = 11
+
+short_link_redirects = metrics.counter(
+    'telebot_short_link_redirects_total', 'Short link requests by outcome', ('result',)
+)
+
+
+class ShortLinkStore:
+    """SQLite table of links with an in-memory cache of hot codes.
+
+    Calls are short and run on the calling thread: the event loop for
+    redirects and local shortening, the shortener pool when local links
+    back up another provider.
+    """
+
+    def __init__(self, path: str, cache_size: int):
+        self.path = path
+        self._connection = None
+        self._lock = threading.Lock()
+        self._hot = LRUTTLCache(cache_size, float('inf'))  # code -> URL; links never change
+
+    def _open(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS links ("
+                "id INTEGER PRIMARY KEY, "
+                "url TEXT NOT NULL UNIQUE)"
+            )
+            self._connection = connection
+            logger.info(f"Short link store opened at {self.path}")
+        return self._connection
+
+    def code_for(self, url: str) -> str:
+        """Return the code of ``url``, creating the link if it is new."""
+        with self._lock:
+            connection = self._open()
+            row = connection.execute("SELECT id FROM links WHERE url = ?", (url,)).fetchone()
+            if row is None:
+                # Another worker process may insert the same URL in between
+                connection.execute("INSERT OR IGNORE INTO links (url) VALUES (?)", (url,))
+                row = connection.execute("SELECT id FROM links WHERE url = ?", (url,)).fetchone()
+        code = base62(row[0])
+        self._hot.set(code, url)
+        return code
+
+    def resolve(self, code: str):
+        """Return the URL behind ``code``, or None if there is no such link."""
+        url = self._hot.get(code)
+        if url is not None:
+            return url
+        if len(code) > MAX_CODE_LENGTH:
+            return None
+        try:
+            link_id = parse_base62(code)
+        except ValueError:
+            return None
+        with self._lock:
+            row = self._open().execute("SELECT url FROM links WHERE id = ?", (link_id,)).fetchone()
+        if row is None:
+            return None
+        self._hot.set(code, row[0])
+        return row[0]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
+
+
+def make_short_code(url: str) -> str:
+    """Shorten ``url`` locally; returns the code."""
+    with metrics.track('shortener', 'local'):
+        return short_links.code_for(url)
+
+
+def short_url(code: str) -> str:
+    """The public address of a link code."""
+    if not SHORT_LINK_BASE_URL:
+        raise RuntimeError("SHORT_LINK_BASE_URL is not set; local short links cannot be built")
+    return f"{SHORT_LINK_BASE_URL.rstrip('/')}{SHORT_LINK_PATH}{code}"
+
+
+class ShortLinkHandler(tornado.web.RequestHandler):
+    """Redirects a short link to its URL."""
+
+    SUPPORTED_METHODS = ("GET", "HEAD")
+
+    def initialize(self, store: ShortLinkStore) -> None:
+        self.store = store
+
+    def get(self, code: str) -> None:
+        url = self.store.resolve(code)
+        if url is None:
+            short_link_redirects.inc('not_found')
+            raise tornado.web.HTTPError(404)
+        short_link_redirects.inc('redirected')
+        self.redirect(url, permanent=True)
+
+    head = get
+
+
+def add_short_link_route(server) -> None:
+    """Serve SHORT_LINK_PATH<code> on ``server`` (a WebServer)."""
+    server.add_route(f"{SHORT_LINK_PATH}([0-9A-Za-z]+)", ShortLinkHandler, store=short_links)
+
+# Global short link store instance
+short_links = ShortLinkStore(SHORT_LINK_DB_PATH, SHORT_LINK_CACHE_SIZE)
@@ -0,0 +1,151 @@
+"""
+Storage backends for StateManager.
+"""
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class StateBackend:
+    """Durable storage behind StateManager's in-memory cache.
+
+    Rows are ``user_id -> (state, expires_at)`` with ``expires_at`` as a
+    Unix timestamp. Writes arrive in coalesced batches from StateManager.
+    Backends that are not ``persistent`` receive no writes at all.
+    """
+
+    persistent = True
+
+    def open(self) -> None:
+        """Acquire resources. Called once at startup."""
+
+    def load(self, limit: int) -> dict:
+        """Return up to ``limit`` unexpired rows, most recently written last."""
+        return {}
+
+    def get(self, user_id: int):
+        """Return ``(state, expires_at)`` for an unexpired row, or None."""
+        return None
+
+    def write_batch(self, upserts: dict, deletes: set) -> None:
+        """Apply a batch of upserts and deletes atomically."""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        """Delete rows whose state has expired; returns how many."""
+        return 0
+
+    def close(self) -> None:
+        """Release resources. Called once at shutdown."""
+
+
+class MemoryStateBackend(StateBackend):
+    """No storage: states live only in StateManager's bounded cache.
+
+    A second in-process copy would keep every state that expired or was
+    evicted from the cache, so nothing is written here.
+    """
+
+    persistent = False
+
+    def write_batch(self, upserts: dict, deletes: set) -> None:
+        pass
+
+
+class SQLiteStateBackend(StateBackend):
+    """Stores rows in a SQLite database in WAL mode.
+
+    Reads use their own connection so they never wait on a batch being
+    written from the flush thread.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._reader = None
+        self._writer = None
+        self._write_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        connection = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        connection.execute("PRAGMA journal_mode=WAL")
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def open(self) -> None:
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._writer = self._connect()
+        self._writer.execute(
+            "CREATE TABLE IF NOT EXISTS user_states ("
+            "user_id INTEGER PRIMARY KEY, "
+            "state TEXT NOT NULL, "
+            "expires_at REAL NOT NULL)"
+        )
+        self._writer.execute("DELETE FROM user_states WHERE expires_at <= ?", (time.time(),))
+        self._reader = self._connect()
+        logger.info(f"SQLite state backend opened at {self.path}")
+
+    def load(self, limit: int) -> dict:
+        if self._reader is None:
+            return {}
+        rows = self._reader.execute(
+            "SELECT user_id, state, expires_at FROM user_states "
+            "WHERE expires_at > ? ORDER BY expires_at DESC LIMIT ?",
+            (time.time(), limit)
+        ).fetchall()
+        return {user_id: (state, expires_at) for user_id, state, expires_at in reversed(rows)}
+
+    def get(self, user_id: int):
+        if self._reader is None:
+            return None
+        return self._reader.execute(
+            "SELECT state, expires_at FROM user_states WHERE user_id = ? AND expires_at > ?",
+            (user_id, time.time())
+        ).fetchone()
+
+    def write_batch(self, upserts: dict, deletes: set) -> None:
+        with self._write_lock:
+            if self._writer is None:
+                return
+            self._writer.execute("BEGIN")
+            try:
+                self._writer.executemany(
+                    "INSERT OR REPLACE INTO user_states (user_id, state, expires_at) VALUES (?, ?, ?)",
+                    [(user_id, state, expires_at) for user_id, (state, expires_at) in upserts.items()]
+                )
+                self._writer.executemany(
+                    "DELETE FROM user_states WHERE user_id = ?",
+                    [(user_id,) for user_id in deletes]
+                )
+                self._writer.execute("COMMIT")
+            except Exception:
+                self._writer.execute("ROLLBACK")
+                raise
+
+    def purge_expired(self) -> int:
+        with self._write_lock:
+            if self._writer is None:
+                return 0
+            return self._writer.execute("DELETE FROM user_states WHERE expires_at <= ?", (time.time(),)).rowcount
+
+    def close(self) -> None:
+        with self._write_lock:
+            for connection in (self._reader, self._writer):
+                if connection is not None:
+                    connection.close()
+            self._reader = None
+            self._writer = None
+
+
+def create_state_backend(name: str, path: str) -> StateBackend:
+    """Build the backend selected by the STATE_BACKEND setting."""
+    if name == 'sqlite':
+        return SQLiteStateBackend(path)
+    if name == 'memory':
+        return MemoryStateBackend()
+    raise ValueError(f"Unknown state backend: {name}")
@@ -1,31 +1,251 @@
 """
 State management for user interactions.
 """
+import asyncio
+import heapq
+import logging
+import time
+from collections import OrderedDict
+from config import (
+    STATE_TTL, STATE_MAX_ENTRIES, STATE_BACKEND, STATE_DB_PATH, STATE_FLUSH_INTERVAL, STATE_MISS_TTL,
+    STATE_PURGE_INTERVAL
+)
+from utils.state_backends import StateBackend, MemoryStateBackend, create_state_backend
+
+logger = logging.getLogger(__name__)
+
+
+class _StateEntry:
+    """A user's state as a small integer code plus its expiry time."""
+
+    __slots__ = ('code', 'expires_at')
+
+    def __init__(self, code: int, expires_at: float):
+        self.code = code
+        self.expires_at = expires_at
+
 
 class StateManager:
-    """Manages user states for different bot operations."""
-    
-    def __init__(self):
-        self.user_states = {}
-    
+    """Manages user states for different bot operations.
+
+    Entries expire after ``ttl`` seconds (tracked in a min-heap, so expiry
+    never scans every user) and the least recently used entry is evicted
+    once ``max_entries`` is reached.
+
+    Reads are served from memory, falling back to the backend on a miss.
+    Users the backend has nothing for are remembered for ``miss_ttl``
+    seconds, so repeated reads for stateless users skip the backend.
+    Writes are coalesced per user and flushed to the backend in batches
+    every ``flush_interval`` seconds and at shutdown; expired rows are
+    deleted from it every ``purge_interval`` seconds.
+    """
+
+    __slots__ = (
+        'ttl', 'max_entries', 'user_states', '_expiry_heap',
+        '_codes', '_names', 'evictions', 'expirations',
+        'backend', 'flush_interval', '_pending', '_flushing', '_flush_task',
+        'miss_ttl', '_misses', 'backend_reads', 'purge_interval'
+    )
+
+    def __init__(
+        self,
+        ttl: float = STATE_TTL,
+        max_entries: int = STATE_MAX_ENTRIES,
+        backend: StateBackend = None,
+        flush_interval: float = STATE_FLUSH_INTERVAL,
+        miss_ttl: float = STATE_MISS_TTL,
+        purge_interval: float = STATE_PURGE_INTERVAL
+    ):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.backend = backend if backend is not None else MemoryStateBackend()
+        self.flush_interval = flush_interval
+        self.miss_ttl = miss_ttl
+        self.purge_interval = purge_interval
+        self._misses = OrderedDict()  # user_id -> time the backend miss stops being trusted
+        self.backend_reads = 0
+        self._pending = {}  # user_id -> (state, expires_at), or None for a delete
+        self._flushing = {}  # the batch currently being written
+        self._flush_task = None
+        self.user_states = OrderedDict()  # user_id -> _StateEntry, least recently used first
+        self._expiry_heap = []  # (expires_at, user_id); stale items are skipped lazily
+        self._codes = {}  # state name -> code
+        self._names = []  # code -> state name
+        self.evictions = 0
+        self.expirations = 0
+
+    def _intern(self, state: str) -> int:
+        """Map a state name to its integer code, registering it on first use."""
+        code = self._codes.get(state)
+        if code is None:
+            code = len(self._names)
+            self._codes[state] = code
+            self._names.append(state)
+        return code
+
+    def _expire(self, now: float) -> None:
+        """Drop entries whose TTL has passed, oldest first."""
+        heap = self._expiry_heap
+        while heap and heap[0][0] <= now:
+            expires_at, user_id = heapq.heappop(heap)
+            entry = self.user_states.get(user_id)
+            # Only expire if this heap item is still the entry's current deadline
+            if entry is not None and entry.expires_at == expires_at:
+                del self.user_states[user_id]
+                self.expirations += 1
+
+        # Rebuild the heap when overwritten deadlines make up most of it
+        if len(heap) > 2 * len(self.user_states) + 64:
+            self._expiry_heap = [(entry.expires_at, user_id) for user_id, entry in self.user_states.items()]
+            heapq.heapify(self._expiry_heap)
+
+    def _cache(self, user_id: int, state: str, expires_at: float) -> None:
+        """Insert or update the in-memory entry for a user."""
+        entry = self.user_states.get(user_id)
+        if entry is None:
+            self.user_states[user_id] = _StateEntry(self._intern(state), expires_at)
+            if len(self.user_states) > self.max_entries:
+                self.user_states.popitem(last=False)
+                self.evictions += 1
+        else:
+            entry.code = self._intern(state)
+            entry.expires_at = expires_at
+            self.user_states.move_to_end(user_id)
+        heapq.heappush(self._expiry_heap, (expires_at, user_id))
+
+    def _lookup(self, user_id: int):
+        """Return the live entry for a user, reading through to the backend on a miss."""
+        self._expire(time.time())
+        entry = self.user_states.get(user_id)
+        if entry is not None:
+            self.user_states.move_to_end(user_id)
+            return entry
+        now = time.time()
+        # Unflushed changes are newer than anything in the backend
+        if user_id in self._pending:
+            row = self._pending[user_id]
+        elif user_id in self._flushing:
+            row = self._flushing[user_id]
+        else:
+            missed_until = self._misses.get(user_id)
+            if missed_until is not None and missed_until > now:
+                return None
+            self.backend_reads += 1
+            row = self.backend.get(user_id)
+            if row is None or row[1] <= now:
+                self._remember_miss(user_id, now)
+                return None
+        if row is None or row[1] <= now:
+            return None
+        self._cache(user_id, row[0], row[1])
+        return self.user_states[user_id]
+
+    def _remember_miss(self, user_id: int, now: float) -> None:
+        """Skip backend reads for a user without a stored state for a while."""
+        self._misses[user_id] = now + self.miss_ttl
+        self._misses.move_to_end(user_id)
+        if len(self._misses) > self.max_entries:
+            self._misses.popitem(last=False)
+
+    def _write(self, user_id: int, row) -> None:
+        """Queue a row (None deletes it) for the next flush to the backend."""
+        if self.backend.persistent:
+            self._pending[user_id] = row
+
     def set_state(self, user_id: int, state: str) -> None:
         """Set a user's state."""
-        self.user_states[user_id] = state
-    
+        now = time.time()
+        self._expire(now)
+        self._misses.pop(user_id, None)
+        expires_at = now + self.ttl
+        self._cache(user_id, state, expires_at)
+        self._write(user_id, (state, expires_at))
+
     def get_state(self, user_id: int) -> str:
         """Get a user's current state."""
-        return self.user_states.get(user_id)
-    
+        entry = self._lookup(user_id)
+        if entry is None:
+            return None
+        return self._names[entry.code]
+
     def clear_state(self, user_id: int) -> bool:
         """Clear a user's state. Returns True if state existed, False otherwise."""
-        if user_id in self.user_states:
+        if self._lookup(user_id) is not None:
             del self.user_states[user_id]
+            self._write(user_id, None)
             return True
         return False
-    
+
     def has_state(self, user_id: int) -> bool:
         """Check if user has an active state."""
-        return user_id in self.user_states
+        return self._lookup(user_id) is not None
+
+    async def start(self) -> None:
+        """Open the backend, warm the cache and start the flush loop."""
+        self.backend.open()
+        for user_id, (state, expires_at) in self.backend.load(self.max_entries).items():
+            self._cache(user_id, state, expires_at)
+        if self._flush_task is None:
+            self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def stop(self) -> None:
+        """Stop the flush loop, write out pending changes and close the backend."""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+            try:
+                await self._flush_task
+            except asyncio.CancelledError:
+                pass
+            self._flush_task = None
+        await self.flush()
+        self.backend.close()
+
+    async def flush(self) -> None:
+        """Write all pending changes to the backend in one batch."""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, {}
+        self._flushing = pending
+        upserts = {user_id: row for user_id, row in pending.items() if row is not None}
+        deletes = {user_id for user_id, row in pending.items() if row is None}
+        try:
+            await asyncio.to_thread(self.backend.write_batch, upserts, deletes)
+        except Exception as e:
+            logger.error(f"Error flushing {len(pending)} state changes: {e}")
+            # Keep the batch unless newer changes for the same users arrived meanwhile
+            for user_id, row in pending.items():
+                self._pending.setdefault(user_id, row)
+        finally:
+            self._flushing = {}
+
+    async def _flush_loop(self) -> None:
+        purge_at = time.monotonic() + self.purge_interval
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+            if self.backend.persistent and time.monotonic() >= purge_at:
+                purge_at = time.monotonic() + self.purge_interval
+                try:
+                    purged = await asyncio.to_thread(self.backend.purge_expired)
+                except Exception as e:
+                    logger.error(f"Error purging expired states: {e}")
+                else:
+                    if purged:
+                        logger.debug(f"Purged {purged} expired states")
+
+    def stats(self) -> dict:
+        """Return size, eviction and expiration counters."""
+        return {
+            'size': len(self.user_states),
+            'max_entries': self.max_entries,
+            'heap_size': len(self._expiry_heap),
+            'evictions': self.evictions,
+            'expirations': self.expirations,
+            'pending_writes': len(self._pending),
+            'cached_misses': len(self._misses),
+            'backend_reads': self.backend_reads,
+            'state_codes': len(self._names),
+        }
 
 # Global state manager instance
-state_manager = StateManager()
\ No newline at end of file
+state_manager = StateManager(backend=create_state_backend(STATE_BACKEND, STATE_DB_PATH))
@@ -0,0 +1,101 @@
+"""
+In-memory registry of ngrok tunnels with background refresh.
+"""
+import asyncio
+import logging
+import time
+from config import NGROK_API_URL, TUNNEL_TTL, TUNNEL_REFRESH_INTERVAL
+from utils.http_client import http_client
+from utils.resilience import CircuitOpenError
+
+logger = logging.getLogger(__name__)
+
+
+class TunnelRegistry:
+    """Caches the ngrok tunnel list as a name -> public URL table."""
+
+    def __init__(self, api_url: str, ttl: float, refresh_interval: float):
+        self.api_url = f"{api_url}/api/tunnels"
+        self.ttl = ttl
+        self.refresh_interval = refresh_interval
+        self._tunnels = {}
+        self._fetched_at = 0.0
+        self._task = None
+        self._pending_refresh = None
+        self._removed_listeners = []
+
+    async def refresh(self) -> None:
+        """Fetch the tunnel list through the shared async client."""
+        try:
+            response = await http_client.get(self.api_url, dependency='ngrok', operation='tunnels')
+            response.raise_for_status()
+            self._apply(response.json())
+        except CircuitOpenError as e:
+            logger.debug(f"Not refreshing ngrok tunnels: {e}")
+        except Exception as e:
+            logger.error(f"Error refreshing ngrok tunnels: {e}")
+
+    def _apply(self, data: dict) -> None:
+        """Replace the table and report tunnels that disappeared."""
+        tunnels = {tunnel['name']: tunnel['public_url'] for tunnel in data.get('tunnels', [])}
+        removed = self._tunnels.keys() - tunnels.keys()
+        for name in removed:
+            logger.warning(f"Tunnel '{name}' disappeared (was {self._tunnels[name]})")
+            for listener in self._removed_listeners:
+                try:
+                    listener(name, self._tunnels[name])
+                except Exception as e:
+                    logger.error(f"Tunnel listener failed for '{name}': {e}")
+        self._tunnels = tunnels
+        self._fetched_at = time.monotonic()
+
+    def on_removed(self, listener) -> None:
+        """Register a callable(name, last_url) invoked when a tunnel disappears."""
+        self._removed_listeners.append(listener)
+
+    def is_stale(self) -> bool:
+        """Check if the cached table is older than the TTL."""
+        return time.monotonic() - self._fetched_at > self.ttl
+
+    def get(self, name: str, default: str = None) -> str:
+        """Look up a tunnel's public URL. Never waits on ngrok."""
+        if self.is_stale():
+            self._schedule_refresh()
+        return self._tunnels.get(name, default)
+
+    def _schedule_refresh(self) -> None:
+        """Start a one-off background refresh if none is running."""
+        if self._pending_refresh is not None and not self._pending_refresh.done():
+            return
+        try:
+            self._pending_refresh = asyncio.get_running_loop().create_task(self.refresh())
+        except RuntimeError:
+            # No running loop (startup code); the caller gets the cached value
+            pass
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.refresh_interval)
+            await self.refresh()
+
+    async def start(self) -> None:
+        """Populate the table if needed and start periodic refreshing."""
+        if not self._tunnels:
+            await self.refresh()
+        if self._task is None:
+            self._task = asyncio.create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        """Stop periodic refreshing."""
+        for task in (self._task, self._pending_refresh):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._task = None
+        self._pending_refresh = None
+
+# Global tunnel registry instance
+tunnel_registry = TunnelRegistry(NGROK_API_URL, TUNNEL_TTL, TUNNEL_REFRESH_INTERVAL)
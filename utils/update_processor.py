@@ -0,0 +1,108 @@
+"""
+Concurrent update processing that keeps each user's updates in order.
+"""
+import asyncio
+import logging
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+logger = logging.getLogger(__name__)
+
+
+def ordering_keys(update: object) -> tuple:
+    """Keys whose updates must be handled one after another.
+
+    A user's updates are ordered (so /shorten is handled before the URL that
+    follows it), and so are all button presses on the same message.
+    """
+    if not isinstance(update, Update):
+        return ()
+    keys = []
+    if update.effective_user is not None:
+        keys.append(('user', update.effective_user.id))
+    elif update.effective_chat is not None:
+        keys.append(('chat', update.effective_chat.id))
+    query = update.callback_query
+    if query is not None:
+        if query.message is not None:
+            keys.append(('message', query.message.chat.id, query.message.message_id))
+        elif query.inline_message_id is not None:
+            keys.append(('inline', query.inline_message_id))
+    return tuple(keys)
+
+
+class OrderedUpdateProcessor(BaseUpdateProcessor):
+    """Runs updates of different users in parallel, each user's in arrival order.
+
+    * ``max_concurrent`` handlers run at once. An update first waits for the
+      earlier updates sharing one of its ordering keys, and only then takes a
+      worker slot, so one busy user never holds slots other users could use.
+    * At most ``max_pending`` updates are inside the processor; the webhook
+      waits in ``wait_for_capacity`` beyond that, which slows Telegram's
+      deliveries instead of growing the queue without bound.
+    """
+
+    def __init__(self, max_concurrent: int, max_pending: int):
+        super().__init__(max(max_pending, max_concurrent))
+        self.max_concurrent = max_concurrent
+        self._workers = asyncio.Semaphore(max_concurrent)
+        self._tails = {}  # ordering key -> future resolved when its latest update is done
+        self._capacity = asyncio.Event()
+        self.running = 0
+        self.waiting_for_order = 0
+        self.processed = 0
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_process_update(self, update: object, coroutine) -> None:
+        keys = ordering_keys(update)
+        previous = [self._tails[key] for key in keys if key in self._tails]
+        done = asyncio.get_running_loop().create_future()
+        for key in keys:
+            self._tails[key] = done
+
+        started = False
+        try:
+            if previous:
+                self.waiting_for_order += 1
+                try:
+                    # wait() never cancels the predecessors when this task is cancelled
+                    await asyncio.wait(previous)
+                finally:
+                    self.waiting_for_order -= 1
+            async with self._workers:
+                started = True
+                self.running += 1
+                try:
+                    await coroutine
+                finally:
+                    self.running -= 1
+        finally:
+            if not started:
+                coroutine.close()
+            done.set_result(None)
+            for key in keys:
+                if self._tails.get(key) is done:
+                    del self._tails[key]
+            self.processed += 1
+            self._capacity.set()
+
+    async def wait_for_capacity(self, update_queue: asyncio.Queue) -> None:
+        """Wait until the processor and ``update_queue`` together hold fewer than max_pending updates."""
+        while update_queue.qsize() + self.current_concurrent_updates >= self.max_concurrent_updates:
+            self._capacity.clear()
+            await self._capacity.wait()
+
+    def stats(self) -> dict:
+        """Return in-flight and ordering counters."""
+        return {
+            'in_flight': self.current_concurrent_updates,
+            'running': self.running,
+            'waiting_for_order': self.waiting_for_order,
+            'ordering_keys': len(self._tails),
+            'processed': self.processed,
+        }
@@ -2,6 +2,10 @@
 Validation utilities for the bot.
 """
 import re
+from urllib.parse import urlsplit, urlunsplit
+from telegram import Message, MessageEntity
+
+URL_ENTITY_TYPES = [MessageEntity.URL, MessageEntity.TEXT_LINK]
 
 def is_valid_url(url: str) -> bool:
     """Check if the provided string is a valid URL."""
@@ -12,4 +16,50 @@ def is_valid_url(url: str) -> bool:
         r'\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3})'  # ...or ip
         r'(?::\d+)?'  # optional port
         r'(?:/?|[/?]\S+)$', re.IGNORECASE)
-    return url_pattern.match(url) is not None
\ No newline at end of file
+    return url_pattern.match(url) is not None
+
+def normalize_url(url: str) -> str:
+    """Normalize a URL for use as a cache key.
+
+    Lowercases the scheme and host, drops default ports and
+    treats an empty path as '/'.
+    """
+    parts = urlsplit(url.strip())
+    scheme = parts.scheme.lower()
+    netloc = parts.hostname or ''
+    if parts.port and (scheme, parts.port) not in (('http', 80), ('https', 443)):
+        netloc = f"{netloc}:{parts.port}"
+    if parts.username:
+        userinfo = parts.username if parts.password is None else f"{parts.username}:{parts.password}"
+        netloc = f"{userinfo}@{netloc}"
+    return urlunsplit((scheme, netloc, parts.path or '/', parts.query, parts.fragment))
+
+
+def extract_urls(message: Message, limit: int = None) -> list:
+    """Collect the distinct URLs in a message, in order of appearance.
+
+    Uses Telegram's url/text_link entities where present and falls back
+    to checking each whitespace-separated word.
+    """
+    candidates = []
+    entities = message.parse_entities(URL_ENTITY_TYPES) if message.entities else {}
+    for entity, text in entities.items():
+        if entity.type == MessageEntity.TEXT_LINK:
+            candidates.append(entity.url)
+        elif text.lower().startswith(('http://', 'https://')):
+            candidates.append(text)
+        else:
+            # Telegram detects bare domains such as example.com/page
+            candidates.append(f"http://{text}")
+    if not candidates and message.text:
+        candidates = message.text.split()
+
+    urls = []
+    seen = set()
+    for candidate in candidates:
+        if candidate not in seen and is_valid_url(candidate):
+            seen.add(candidate)
+            urls.append(candidate)
+            if limit is not None and len(urls) >= limit:
+                break
+    return urls
@@ -0,0 +1,137 @@
+"""
+Embedded web server for the Telegram webhook and auxiliary HTTP routes.
+"""
+import json
+import logging
+import tornado.httpserver
+import tornado.web
+from telegram import Update
+from utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+webhook_duplicates = metrics.counter(
+    'telebot_webhook_duplicates_total', 'Webhook deliveries dropped as redeliveries of a seen update_id'
+)
+
+
+class UpdateIdWindow:
+    """Remembers the last ``size`` update ids as bits of one integer.
+
+    Bit ``n`` of the mask is set when ``high - n`` has been seen, so the
+    window costs ``size`` bits however many updates pass through it.
+    """
+
+    __slots__ = ('size', 'high', 'mask', '_full')
+
+    def __init__(self, size: int = 4096):
+        self.size = size
+        self.high = None
+        self.mask = 0
+        self._full = (1 << size) - 1
+
+    def add(self, update_id: int) -> bool:
+        """Record ``update_id``; return False if it was already seen."""
+        high = self.high
+        if high is None or update_id - high >= self.size:
+            # First update, or a jump ahead: Telegram picks a random next id after a week of silence
+            self.high = update_id
+            self.mask = 1
+            return True
+        if high - update_id >= self.size:
+            # Older than anything remembered: a late redelivery, not a new update
+            return False
+        if update_id > high:
+            self.mask = ((self.mask << (update_id - high)) | 1) & self._full
+            self.high = update_id
+            return True
+        bit = 1 << (high - update_id)
+        if self.mask & bit:
+            return False
+        self.mask |= bit
+        return True
+
+    def discard(self, update_id: int) -> None:
+        """Forget ``update_id`` so a redelivery is accepted (it was not handled)."""
+        if self.high is not None and 0 <= self.high - update_id < self.size:
+            self.mask &= ~(1 << (self.high - update_id))
+
+
+class TelegramWebhookHandler(tornado.web.RequestHandler):
+    """Accepts updates POSTed by Telegram and queues them for the Application."""
+
+    SUPPORTED_METHODS = ("POST",)
+
+    def initialize(
+        self, bot, update_queue, secret_token: str = None, update_processor=None,
+        update_window: UpdateIdWindow = None
+    ) -> None:
+        self.bot = bot
+        self.update_queue = update_queue
+        self.secret_token = secret_token
+        self.update_processor = update_processor
+        self.update_window = update_window
+
+    async def post(self) -> None:
+        if self.secret_token is not None:
+            token = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token")
+            if token != self.secret_token:
+                raise tornado.web.HTTPError(403)
+        try:
+            data = json.loads(self.request.body)
+            if self.update_window is not None and not self.update_window.add(data['update_id']):
+                webhook_duplicates.inc()
+                return
+            update = Update.de_json(data, self.bot)
+        except Exception as e:
+            logger.error(f"Discarding malformed webhook update: {e}")
+            raise tornado.web.HTTPError(400)
+        if update is not None:
+            if self.update_processor is not None:
+                # Hold the response while the bot is saturated so Telegram sends slower
+                await self.update_processor.wait_for_capacity(self.update_queue)
+            await self.update_queue.put(update)
+
+
+class WebServer:
+    """One tornado HTTP server; features add their routes before it starts."""
+
+    def __init__(self):
+        self._routes = []
+        self._server = None
+
+    def add_route(self, pattern: str, handler: type, **kwargs) -> None:
+        """Register a tornado RequestHandler for a URL pattern."""
+        if self._server is not None:
+            raise RuntimeError("Routes must be added before the web server starts")
+        self._routes.append((pattern, handler, kwargs))
+
+    @property
+    def running(self) -> bool:
+        return self._server is not None
+
+    async def start(self, listen: str, port: int) -> None:
+        """Start listening. Called once, after all routes are registered."""
+        if self._server is not None:
+            return
+        application = tornado.web.Application(
+            self._routes,
+            log_function=lambda handler: logger.debug(
+                f"{handler.get_status()} {handler.request.method} {type(handler).__name__}"
+            )
+        )
+        self._server = tornado.httpserver.HTTPServer(application, xheaders=True)
+        self._server.listen(port, address=listen)
+        logger.info(f"Web server listening on {listen}:{port} ({len(self._routes)} routes)")
+
+    async def stop(self) -> None:
+        """Stop accepting requests and close open connections."""
+        if self._server is None:
+            return
+        self._server.stop()
+        await self._server.close_all_connections()
+        self._server = None
+        logger.info("Web server stopped")
+
+# Global web server instance
+web_server = WebServer()
@@ -0,0 +1,280 @@
+"""
+Multi-process webhook mode: one front process and N bot worker processes.
+
+The front process owns the listening socket. It checks the secret token,
+drops Telegram redeliveries by update_id and forwards each update's raw JSON
+to the worker picked by the sender's user id, so a user's updates and the
+conversation state kept for them in memory always stay in one process.
+Workers run the normal Application, so handlers are written as before.
+
+Each worker is forked with two socketpairs to the front: one carries
+updates (a worker that stops reading pushes back on the front, and so on
+Telegram), the other answers /metrics requests.
+"""
+import asyncio
+import json
+import logging
+import multiprocessing
+import socket
+import struct
+import tornado.web
+from telegram import Update
+from utils.metrics import metrics, merge_exposition
+from utils.web_server import UpdateIdWindow, webhook_duplicates
+
+logger = logging.getLogger(__name__)
+
+# Frame: kind (1 byte), payload length (4 bytes), payload
+_FRAME_HEADER = struct.Struct('!cI')
+_SEQUENCE = struct.Struct('!I')
+FRAME_UPDATE = b'U'
+FRAME_METRICS = b'M'
+
+METRICS_TIMEOUT = 5.0  # seconds a worker gets to answer a scrape
+STOP_TIMEOUT = 30.0  # seconds a worker gets to finish its updates on shutdown
+
+worker_updates = metrics.counter(
+    'telebot_worker_updates_total', 'Updates the front process forwarded to each worker', ('worker',)
+)
+
+
+async def write_frame(writer: asyncio.StreamWriter, kind: bytes, payload: bytes = b'') -> None:
+    writer.write(_FRAME_HEADER.pack(kind, len(payload)) + payload)
+    await writer.drain()
+
+
+async def read_frame(reader: asyncio.StreamReader) -> tuple:
+    """Return (kind, payload); raises asyncio.IncompleteReadError when the peer is gone."""
+    kind, size = _FRAME_HEADER.unpack(await reader.readexactly(_FRAME_HEADER.size))
+    return kind, await reader.readexactly(size)
+
+
+def route_key(data: dict) -> int:
+    """The id updates are routed by: the sender's user id, else the chat id, else the update id."""
+    for name, value in data.items():
+        if not isinstance(value, dict):
+            continue
+        user = value.get('from') or value.get('user')
+        if user:
+            return user['id']
+        chat = value.get('chat') or (value.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+    return data.get('update_id', 0)
+
+
+class Worker:
+    """The front process's handle on one worker process."""
+
+    def __init__(self, index: int, process: multiprocessing.Process, updates: socket.socket, control: socket.socket):
+        self.index = index
+        self.label = str(index)
+        self.process = process
+        self._sockets = (updates, control)
+        self._updates = None
+        self._control = None
+        self._control_lock = asyncio.Lock()
+        self._sequence = 0
+
+    async def connect(self) -> None:
+        updates, control = self._sockets
+        self._updates = await asyncio.open_unix_connection(sock=updates)
+        self._control = await asyncio.open_unix_connection(sock=control)
+
+    async def send_update(self, body: bytes) -> None:
+        """Hand one update to the worker; waits while the worker is saturated."""
+        await write_frame(self._updates[1], FRAME_UPDATE, body)
+        worker_updates.inc(self.label)
+
+    async def fetch_metrics(self) -> str:
+        """Return the worker's /metrics text."""
+        reader, writer = self._control
+        async with self._control_lock:
+            self._sequence += 1
+            await write_frame(writer, FRAME_METRICS, _SEQUENCE.pack(self._sequence))
+            while True:
+                _, payload = await read_frame(reader)
+                # Skip answers to earlier requests that timed out
+                if _SEQUENCE.unpack_from(payload)[0] == self._sequence:
+                    return payload[_SEQUENCE.size:].decode()
+
+    def close(self) -> None:
+        """Close both channels; the worker sees EOF and shuts down."""
+        for channel in (self._updates, self._control):
+            if channel is not None:
+                channel[1].close()
+        for sock in self._sockets:
+            sock.close()
+
+
+def _bootstrap(target, index: int, updates: socket.socket, control: socket.socket, inherited: list) -> None:
+    # Drop the front's ends of the channels forked into this process, or a
+    # worker would keep its own channel open and never see the front exit
+    for sock in inherited:
+        sock.close()
+    target(index, updates, control)
+
+
+class WorkerPool:
+    """Forks the workers and routes updates to them by user id."""
+
+    def __init__(self, count: int, target):
+        """``target(index, updates_socket, control_socket)`` runs in each worker."""
+        self.count = count
+        self.target = target
+        self.workers = []
+        self.failed = False  # a worker died before stop()
+        self._stopping = False
+
+    def spawn(self) -> None:
+        """Fork the workers. Call before the front starts its event loop."""
+        context = multiprocessing.get_context('fork')
+        inherited = []
+        for index in range(self.count):
+            front_updates, updates_end = socket.socketpair()
+            front_control, control_end = socket.socketpair()
+            inherited += [front_updates, front_control]
+            process = context.Process(
+                target=_bootstrap, name=f"telebot-worker-{index}",
+                args=(self.target, index, updates_end, control_end, list(inherited))
+            )
+            process.start()
+            updates_end.close()
+            control_end.close()
+            self.workers.append(Worker(index, process, front_updates, front_control))
+        logger.info(f"Started {self.count} webhook workers")
+
+    async def connect(self, on_worker_exit) -> None:
+        """Open the channels; ``on_worker_exit()`` is called if a worker dies unexpectedly."""
+        loop = asyncio.get_running_loop()
+        for worker in self.workers:
+            await worker.connect()
+            loop.add_reader(worker.process.sentinel, self._exited, worker, on_worker_exit)
+
+    def _exited(self, worker: Worker, on_worker_exit) -> None:
+        asyncio.get_running_loop().remove_reader(worker.process.sentinel)
+        if not self._stopping:
+            self.failed = True
+            logger.error(f"Webhook worker {worker.index} exited with code {worker.process.exitcode}")
+            on_worker_exit()
+
+    def route(self, data: dict) -> Worker:
+        return self.workers[route_key(data) % self.count]
+
+    async def forward(self, updates: list) -> None:
+        """Hand updates fetched by the front itself (catch-up mode) to their workers, in order."""
+        for update in updates:
+            data = update.to_dict()
+            await self.route(data).send_update(json.dumps(data).encode())
+
+    async def collect_metrics(self) -> list:
+        """Every responsive worker's /metrics text."""
+        results = await asyncio.gather(
+            *(asyncio.wait_for(worker.fetch_metrics(), METRICS_TIMEOUT) for worker in self.workers),
+            return_exceptions=True
+        )
+        texts = []
+        for worker, result in zip(self.workers, results):
+            if isinstance(result, BaseException):
+                logger.warning(f"No metrics from webhook worker {worker.index}: {result!r}")
+            else:
+                texts.append(result)
+        return texts
+
+    async def stop(self) -> None:
+        """Disconnect the workers and wait for them to shut down."""
+        self._stopping = True
+        loop = asyncio.get_running_loop()
+        for worker in self.workers:
+            loop.remove_reader(worker.process.sentinel)
+            worker.close()
+        for worker in self.workers:
+            await asyncio.to_thread(worker.process.join, STOP_TIMEOUT)
+            if worker.process.exitcode is None:
+                logger.warning(f"Webhook worker {worker.index} did not stop in time; terminating it")
+                worker.process.terminate()
+                await asyncio.to_thread(worker.process.join)
+
+
+class FrontWebhookHandler(tornado.web.RequestHandler):
+    """Receives Telegram's POSTs in the front process and forwards them to a worker."""
+
+    SUPPORTED_METHODS = ("POST",)
+
+    def initialize(self, pool: WorkerPool, secret_token: str = None, update_window: UpdateIdWindow = None) -> None:
+        self.pool = pool
+        self.secret_token = secret_token
+        self.update_window = update_window
+
+    async def post(self) -> None:
+        if self.secret_token is not None:
+            token = self.request.headers.get("X-Telegram-Bot-Api-Secret-Token")
+            if token != self.secret_token:
+                raise tornado.web.HTTPError(403)
+        try:
+            data = json.loads(self.request.body)
+            update_id = data['update_id']
+            worker = self.pool.route(data)
+        except Exception as e:
+            logger.error(f"Discarding malformed webhook update: {e}")
+            raise tornado.web.HTTPError(400)
+        if self.update_window is not None and not self.update_window.add(update_id):
+            webhook_duplicates.inc()
+            return
+        try:
+            await worker.send_update(self.request.body)
+        except (ConnectionError, OSError) as e:
+            logger.error(f"Could not forward update {update_id} to worker {worker.index}: {e}")
+            if self.update_window is not None:
+                # Let Telegram's retry through
+                self.update_window.discard(update_id)
+            raise tornado.web.HTTPError(503)
+
+
+class FrontMetricsHandler(tornado.web.RequestHandler):
+    """Serves the front's and all workers' metrics as one registry."""
+
+    def initialize(self, pool: WorkerPool) -> None:
+        self.pool = pool
+
+    async def get(self) -> None:
+        texts = [metrics.render()] + await self.pool.collect_metrics()
+        self.set_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.write(merge_exposition(texts))
+
+
+async def serve_worker_channels(application, updates: socket.socket, control: socket.socket) -> None:
+    """Feed the front's updates into ``application`` until the front disconnects."""
+    update_reader, update_writer = await asyncio.open_unix_connection(sock=updates)
+    control_reader, control_writer = await asyncio.open_unix_connection(sock=control)
+
+    async def answer_scrapes() -> None:
+        while True:
+            _, payload = await read_frame(control_reader)
+            await write_frame(control_writer, FRAME_METRICS, payload + metrics.render().encode())
+
+    scrapes = asyncio.create_task(answer_scrapes())
+    processor = application.update_processor
+    try:
+        while True:
+            try:
+                _, payload = await read_frame(update_reader)
+            except asyncio.IncompleteReadError:
+                logger.info("Front process disconnected")
+                return
+            try:
+                update = Update.de_json(json.loads(payload), application.bot)
+            except Exception as e:
+                logger.error(f"Discarding malformed update from the front process: {e}")
+                continue
+            # Not reading further while saturated is what slows the front down
+            await processor.wait_for_capacity(application.update_queue)
+            await application.update_queue.put(update)
+    finally:
+        scrapes.cancel()
+        try:
+            await scrapes
+        except (asyncio.CancelledError, asyncio.IncompleteReadError, ConnectionError):
+            pass
+        update_writer.close()
+        control_writer.close()
@@ -1,69 +1,95 @@
 #!/usr/bin/env python3
 """
 Webhook management utility for Telegram bot.
+
+The async functions take an already initialized Bot, so the running
+Application registers its webhook with its own bot from post_init. The
+command line interface is a thin wrapper that opens one Bot for the call.
 """
 import asyncio
-import os
 import sys
-from telegram import Bot
-from config import BOT_TOKEN
-
-async def set_webhook(webhook_url: str, port: int = 8443):
-    """Set webhook for the bot."""
-    bot = Bot(token=BOT_TOKEN)
-    
-    full_webhook_url = f"{webhook_url}/{BOT_TOKEN}"
-    
-    try:
-        result = await bot.set_webhook(
-            url=full_webhook_url,
-            allowed_updates=["message", "callback_query"]
-        )
-        
-        if result:
-            print(f"✅ Webhook set successfully!")
-            print(f"📡 Webhook URL: {full_webhook_url}")
-            print(f"🔌 Port: {port}")
-        else:
-            print("❌ Failed to set webhook")
-            
-    except Exception as e:
-        print(f"❌ Error setting webhook: {e}")
-
-async def delete_webhook():
-    """Delete webhook for the bot."""
-    bot = Bot(token=BOT_TOKEN)
-    
-    try:
-        result = await bot.delete_webhook()
-        
-        if result:
-            print("✅ Webhook deleted successfully!")
-            print("🔄 Bot will now use polling mode")
-        else:
-            print("❌ Failed to delete webhook")
-            
-    except Exception as e:
-        print(f"❌ Error deleting webhook: {e}")
-
-async def get_webhook_info():
-    """Get current webhook information."""
-    bot = Bot(token=BOT_TOKEN)
-    
-    try:
-        webhook_info = await bot.get_webhook_info()
-        
-        print("📊 Current Webhook Info:")
-        print(f"URL: {webhook_info.url or 'Not set'}")
-        print(f"Has custom certificate: {webhook_info.has_custom_certificate}")
-        print(f"Pending update count: {webhook_info.pending_update_count}")
-        print(f"Last error date: {webhook_info.last_error_date or 'None'}")
-        print(f"Last error message: {webhook_info.last_error_message or 'None'}")
-        print(f"Max connections: {webhook_info.max_connections}")
-        print(f"Allowed updates: {webhook_info.allowed_updates}")
-        
-    except Exception as e:
-        print(f"❌ Error getting webhook info: {e}")
+from telegram import Bot, WebhookInfo
+from config import BOT_TOKEN, WEBHOOK_MAX_CONNECTIONS, WEBHOOK_DROP_PENDING_UPDATES, WEBHOOK_SECRET_TOKEN
+
+# Update types the bot has handlers for
+ALLOWED_UPDATES = ["message", "callback_query"]
+
+
+def webhook_endpoint(webhook_url: str) -> str:
+    """Return the full webhook URL (public base URL plus the token path)."""
+    return f"{webhook_url.rstrip('/')}/{BOT_TOKEN}"
+
+
+async def set_webhook(
+    bot: Bot,
+    webhook_url: str,
+    *,
+    max_connections: int = WEBHOOK_MAX_CONNECTIONS,
+    drop_pending_updates: bool = WEBHOOK_DROP_PENDING_UPDATES,
+    secret_token: str = WEBHOOK_SECRET_TOKEN,
+    allowed_updates: list = ALLOWED_UPDATES
+) -> bool:
+    """Point the bot's webhook at ``webhook_url`` (the base URL, without the token path)."""
+    return await bot.set_webhook(
+        url=webhook_endpoint(webhook_url),
+        max_connections=max_connections,
+        drop_pending_updates=drop_pending_updates,
+        secret_token=secret_token,
+        allowed_updates=allowed_updates
+    )
+
+
+async def delete_webhook(bot: Bot, drop_pending_updates: bool = False) -> bool:
+    """Delete the bot's webhook."""
+    return await bot.delete_webhook(drop_pending_updates=drop_pending_updates)
+
+
+async def get_webhook_info(bot: Bot) -> WebhookInfo:
+    """Get the bot's current webhook information."""
+    return await bot.get_webhook_info()
+
+
+async def _cli_set(webhook_url: str, port: int) -> None:
+    async with Bot(token=BOT_TOKEN) as bot:
+        try:
+            if await set_webhook(bot, webhook_url):
+                print(f"✅ Webhook set successfully!")
+                print(f"📡 Webhook URL: {webhook_endpoint(webhook_url)}")
+                print(f"🔌 Port: {port}")
+            else:
+                print("❌ Failed to set webhook")
+        except Exception as e:
+            print(f"❌ Error setting webhook: {e}")
+
+
+async def _cli_delete() -> None:
+    async with Bot(token=BOT_TOKEN) as bot:
+        try:
+            if await delete_webhook(bot):
+                print("✅ Webhook deleted successfully!")
+                print("🔄 Bot will now use polling mode")
+            else:
+                print("❌ Failed to delete webhook")
+        except Exception as e:
+            print(f"❌ Error deleting webhook: {e}")
+
+
+async def _cli_info() -> None:
+    async with Bot(token=BOT_TOKEN) as bot:
+        try:
+            webhook_info = await get_webhook_info(bot)
+
+            print("📊 Current Webhook Info:")
+            print(f"URL: {webhook_info.url or 'Not set'}")
+            print(f"Has custom certificate: {webhook_info.has_custom_certificate}")
+            print(f"Pending update count: {webhook_info.pending_update_count}")
+            print(f"Last error date: {webhook_info.last_error_date or 'None'}")
+            print(f"Last error message: {webhook_info.last_error_message or 'None'}")
+            print(f"Max connections: {webhook_info.max_connections}")
+            print(f"Allowed updates: {webhook_info.allowed_updates}")
+
+        except Exception as e:
+            print(f"❌ Error getting webhook info: {e}")
 
 def main():
     """Main function to handle command line arguments."""
@@ -85,18 +111,18 @@ def main():
         if len(sys.argv) < 3:
             print("❌ Please provide webhook URL")
             return
-        
+
         webhook_url = sys.argv[2].rstrip('/')  # Remove trailing slash
         port = int(sys.argv[3]) if len(sys.argv) > 3 else 8443
-        
-        asyncio.run(set_webhook(webhook_url, port))
-        
+
+        asyncio.run(_cli_set(webhook_url, port))
+
     elif command == "delete":
-        asyncio.run(delete_webhook())
-        
+        asyncio.run(_cli_delete())
+
     elif command == "info":
-        asyncio.run(get_webhook_info())
-        
+        asyncio.run(_cli_info())
+
     else:
         print(f"❌ Unknown command: {command}")
         print("Available commands: set, delete, info")